@@ -0,0 +1,107 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional
+
+API_CACHE_PATH = os.getenv('API_CACHE_PATH', os.path.join(os.path.dirname(__file__), '.cache', 'api_cache.sqlite3'))
+
+# Params that identify the caller rather than the data
+_IGNORED_PARAMS = {'apiKey'}
+
+
+class ResponseCache:
+    """Persistent store of upstream JSON responses, shared across restarts.
+
+    Entries are keyed by endpoint name and request params and carry their own
+    expiry; an expiry of None means the payload never changes (e.g. results of
+    finished matches). sqlite in WAL mode lets several worker processes share
+    one file.
+    """
+
+    def __init__(self, path: str = API_CACHE_PATH, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, payload TEXT NOT NULL,'
+                ' fetched_at REAL NOT NULL, expires_at REAL)'
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(endpoint: str, params: Optional[Dict[str, Any]] = None) -> str:
+        params = {k: v for k, v in (params or {}).items() if k not in _IGNORED_PARAMS}
+        return f"{endpoint}?{json.dumps(params, sort_keys=True, default=str)}"
+
+    def get(self, endpoint: str, params: Optional[Dict[str, Any]] = None, allow_stale: bool = False) -> Optional[Any]:
+        """Cached payload, or None if missing or (unless allow_stale) expired"""
+        entry = self.get_entry(endpoint, params)
+        if entry is None:
+            return None
+        payload, _fetched_at, expires_at = entry
+        if not allow_stale and expires_at is not None and expires_at <= self.clock():
+            return None
+        return payload
+
+    def get_entry(self, endpoint: str, params: Optional[Dict[str, Any]] = None):
+        """(payload, fetched_at, expires_at) regardless of freshness, or None"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT payload, fetched_at, expires_at FROM responses WHERE key = ?',
+                (self.make_key(endpoint, params),),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def set(self, endpoint: str, params: Optional[Dict[str, Any]], payload: Any, ttl: Optional[float]) -> None:
+        """Store a payload; ttl=None keeps it forever"""
+        now = self.clock()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO responses (key, endpoint, payload, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?)',
+                (self.make_key(endpoint, params), endpoint, json.dumps(payload), now,
+                 None if ttl is None else now + ttl),
+            )
+            conn.commit()
+
+    def purge_expired(self) -> int:
+        """Drop expired entries; returns how many were removed"""
+        with self._lock:
+            conn = self._connect()
+            cur = conn.execute('DELETE FROM responses WHERE expires_at IS NOT NULL AND expires_at <= ?',
+                               (self.clock(),))
+            conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+@lru_cache(maxsize=None)
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache; set API_CACHE_PATH='' to disable it"""
+    return ResponseCache(API_CACHE_PATH) if API_CACHE_PATH else None
+
+
+def all_finished(payload: Any) -> bool:
+    """True for a non-empty list of matches that have all been played"""
+    matches = payload.get('matches') if isinstance(payload, dict) else None
+    return bool(matches) and all(m.get('status') == 'FINISHED' for m in matches)
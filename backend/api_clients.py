@@ -1,7 +1,8 @@
 import os
 import requests
+from functools import lru_cache
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -9,26 +10,81 @@ from pathlib import Path
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(env_path)
 
+# Imported after load_dotenv so API_CACHE_PATH can come from .env
+from backend.api_cache import ResponseCache, get_response_cache, all_finished
+from backend.resilience import HEDGE_AFTER, REQUEST_TIMEOUT, call_upstream, mark_degraded
+
+# Seconds each endpoint's responses stay fresh in the persistent cache.
+# Payloads that only contain finished matches never expire.
+FOOTBALL_TTLS = {
+    'competition_matches': 5 * 60,
+    'team': 24 * 3600,
+    'head2head': 12 * 3600,
+    'team_matches': 6 * 3600,
+}
+ODDS_TTLS = {
+    'odds': 60,
+    'events': 5 * 60,
+}
+
+
+def _cached_get_json(cache: Optional[ResponseCache], endpoint: str, url: str, params: Optional[Dict] = None,
+                     headers: Optional[Dict] = None, ttl: Optional[float] = None,
+                     immutable: Optional[Callable[[Any], bool]] = None,
+                     hedge_after: Optional[float] = HEDGE_AFTER) -> Any:
+    """GET a JSON payload, served from and written through the response cache.
+
+    Upstream calls go through the endpoint's circuit breaker with retries
+    (backend.resilience); if they still fail, an expired cache entry is
+    served instead and the response is marked degraded.
+    """
+    key_params = dict(params or {}, url=url)
+    if cache is not None:
+        cached = cache.get(endpoint, key_params)
+        if cached is not None:
+            return cached
+
+    def fetch():
+        resp = requests.get(url, headers=headers, params=params, timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        return resp.json()
+
+    try:
+        data = call_upstream(endpoint, fetch, hedge_after=hedge_after)
+    except Exception as e:
+        stale = cache.get(endpoint, key_params, allow_stale=True) if cache is not None else None
+        if stale is None:
+            raise
+        mark_degraded(f"{endpoint}: stale cached data ({e.__class__.__name__})")
+        return stale
+    if cache is not None:
+        cache.set(endpoint, key_params, data, None if (immutable and immutable(data)) else ttl)
+    return data
+
+
 class FootballDataAPI:
     """Client for football-data.org API - real match fixtures and stats"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.api_key = os.getenv('FOOTBALL_DATA_API_KEY', '')
-        self.base_url = 'https://api.football-data.org/v4'
+        self.base_url = os.getenv('FOOTBALL_DATA_BASE_URL', 'https://api.football-data.org/v4')
         self.headers = {'X-Auth-Token': self.api_key}
+        self.cache = cache if cache is not None else get_response_cache()
+    
+    def _get(self, endpoint: str, path: str, params: Optional[Dict] = None,
+             immutable: Optional[Callable[[Any], bool]] = None) -> Any:
+        return _cached_get_json(self.cache, endpoint, f'{self.base_url}{path}', params=params,
+                                headers=self.headers, ttl=FOOTBALL_TTLS[endpoint], immutable=immutable)
     
     def get_upcoming_matches(self, league='PL', days_ahead=7) -> List[Dict[str, Any]]:
         """Get upcoming matches for a league (PL=Premier League, etc)"""
         date_from = datetime.now().strftime('%Y-%m-%d')
         date_to = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d')
         
-        url = f'{self.base_url}/competitions/{league}/matches'
         params = {'dateFrom': date_from, 'dateTo': date_to}
         
         try:
-            resp = requests.get(url, headers=self.headers, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
+            data = self._get('competition_matches', f'/competitions/{league}/matches', params)
             
             matches = []
             for match in data.get('matches', []):
@@ -42,55 +98,58 @@ class FootballDataAPI:
             return matches
         except Exception as e:
             print(f"Error fetching matches: {e}")
+            mark_degraded(f"competition_matches: unavailable ({e.__class__.__name__})")
             return []
     
     def get_team_stats(self, team_id: int) -> Dict[str, Any]:
         """Get team statistics"""
-        url = f'{self.base_url}/teams/{team_id}'
         try:
-            resp = requests.get(url, headers=self.headers, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
+            return self._get('team', f'/teams/{team_id}')
         except Exception as e:
             print(f"Error fetching team stats: {e}")
+            mark_degraded(f"team: unavailable ({e.__class__.__name__})")
             return {}
     
     def get_head_to_head(self, match_id: int) -> Dict[str, Any]:
         """Get head-to-head stats for a match"""
-        url = f'{self.base_url}/matches/{match_id}/head2head'
         try:
-            resp = requests.get(url, headers=self.headers, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
+            # Past meetings before a given fixture never change once played
+            return self._get('head2head', f'/matches/{match_id}/head2head', immutable=all_finished)
         except Exception as e:
             print(f"Error fetching h2h: {e}")
+            mark_degraded(f"head2head: unavailable ({e.__class__.__name__})")
             return {}
     
     def get_team_matches(self, team_id: int, limit: int = 10) -> List[Dict[str, Any]]:
         """Get recent matches for a team to calculate real statistics"""
-        url = f'{self.base_url}/teams/{team_id}/matches'
         params = {'status': 'FINISHED', 'limit': limit}
         try:
-            resp = requests.get(url, headers=self.headers, params=params, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
+            # Keyed by "last N", so this still expires as new results come in
+            data = self._get('team_matches', f'/teams/{team_id}/matches', params)
             return data.get('matches', [])
         except Exception as e:
             print(f"Error fetching team matches: {e}")
+            mark_degraded(f"team_matches: unavailable ({e.__class__.__name__})")
             return []
     
+    @staticmethod
+    def _default_team_stats() -> Dict[str, Any]:
+        """League-average stand-in when a team has no finished matches to go on"""
+        mark_degraded('team stats: default values')
+        return {
+            'goals_scored_avg': 1.5,
+            'goals_conceded_avg': 1.2,
+            'wins': 0,
+            'draws': 0,
+            'losses': 0,
+            'form_points': 0,
+            'clean_sheets': 0
+        }
+    
     def calculate_team_stats(self, team_name: str, matches: List[Dict]) -> Dict[str, Any]:
         """Calculate REAL statistics from actual match results"""
         if not matches:
-            return {
-                'goals_scored_avg': 1.5,
-                'goals_conceded_avg': 1.2,
-                'wins': 0,
-                'draws': 0,
-                'losses': 0,
-                'form_points': 0,
-                'clean_sheets': 0
-            }
+            return self._default_team_stats()
         
         goals_scored = []
         goals_conceded = []
@@ -135,15 +194,7 @@ class FootballDataAPI:
         
         num_matches = len(goals_scored)
         if num_matches == 0:
-            return {
-                'goals_scored_avg': 1.5,
-                'goals_conceded_avg': 1.2,
-                'wins': 0,
-                'draws': 0,
-                'losses': 0,
-                'form_points': 0,
-                'clean_sheets': 0
-            }
+            return self._default_team_stats()
         
         return {
             'goals_scored_avg': sum(goals_scored) / num_matches,
@@ -160,12 +211,13 @@ class FootballDataAPI:
 class OddsAPI:
     """Client for The Odds API - real betting odds"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None):
         self.api_key = os.getenv('ODDS_API_KEY', '')
-        self.base_url = 'https://api.the-odds-api.com/v4'
+        self.base_url = os.getenv('ODDS_API_BASE_URL', 'https://api.the-odds-api.com/v4')
+        self.cache = cache if cache is not None else get_response_cache()
     
     def get_odds(self, sport='soccer_epl', markets='h2h,spreads,totals') -> List[Dict[str, Any]]:
-        """Get current odds for upcoming matches"""
+        """Get current odds for upcoming matches (not hedged: every request uses quota)"""
         url = f'{self.base_url}/sports/{sport}/odds'
         params = {
             'apiKey': self.api_key,
@@ -175,11 +227,10 @@ class OddsAPI:
         }
         
         try:
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
+            return _cached_get_json(self.cache, 'odds', url, params=params, ttl=ODDS_TTLS['odds'], hedge_after=None)
         except Exception as e:
             print(f"Error fetching odds: {e}")
+            mark_degraded(f"odds: unavailable ({e.__class__.__name__})")
             return []
     
     def get_player_props(self, sport='soccer_epl') -> List[Dict[str, Any]]:
@@ -192,9 +243,21 @@ class OddsAPI:
         }
         
         try:
-            resp = requests.get(url, params=params, timeout=10)
-            resp.raise_for_status()
-            return resp.json()
+            return _cached_get_json(self.cache, 'events', url, params=params, ttl=ODDS_TTLS['events'],
+                                    hedge_after=None)
         except Exception as e:
             print(f"Error fetching player props: {e}")
+            mark_degraded(f"events: unavailable ({e.__class__.__name__})")
             return []
+
+
+@lru_cache(maxsize=None)
+def get_football_api() -> FootballDataAPI:
+    """Process-wide FootballDataAPI client shared by the app and predictors"""
+    return FootballDataAPI()
+
+
+@lru_cache(maxsize=None)
+def get_odds_api() -> OddsAPI:
+    """Process-wide OddsAPI client shared by the app and predictors"""
+    return OddsAPI()
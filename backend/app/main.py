@@ -1,9 +1,23 @@
-from fastapi import FastAPI
+import asyncio
+import hashlib
+import json
+import os
+import time
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from backend.predictor import Predictor
-from backend.api_clients import FootballDataAPI, OddsAPI
-from datetime import datetime, timedelta
+from backend import engines, profiling
+from backend.api_clients import get_football_api, get_odds_api
+from backend.resilience import breaker_states, track_degradation
+from backend.shared_state import WORKER_ID, LeaderLease, get_shared_store
+from datetime import datetime, timedelta, timezone
+
+# Reference point for cold-start timings reported by /ready
+IMPORT_STARTED = time.perf_counter()
 
 app = FastAPI(title="Parlay Predictor API")
 
@@ -14,100 +28,605 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Profile-Id"],
 )
 
-# Cache for matches
+# Compress large JSON payloads; brotli when the optional brotli-asgi package
+# is installed (it falls back to gzip for clients that don't accept br)
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1000)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+# Opt-in stack sampling of single requests, for debugging (PROFILING_ENABLED=1)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+# This worker's copies of the shared match lists (see backend.shared_state)
 matches_cache = {}
 cache_timestamp = {}
 CACHE_DURATION = timedelta(minutes=5)  # Cache for 5 minutes
+DEGRADED_CACHE_DURATION = timedelta(seconds=30)  # ... but only briefly when built from fallback data
+# Serialized response bodies per (cache entry version, page, fields)
+encoded_cache = {}
+ENCODED_CACHE_SIZE = 256
 
 class PredictRequest(BaseModel):
     match_id: str
     home_team: str
     away_team: str
+    league: Optional[str] = None
     context: dict = {}
 
-predictor = Predictor()
-football_api = FootballDataAPI()
-odds_api = OddsAPI()
+class WhatIfRequest(BaseModel):
+    match_id: str
+    overrides: dict = {}
+    sweep: Optional[dict] = None
+
+class MarketsRequest(BaseModel):
+    match_ids: Optional[List[str]] = None  # default: every match this worker has predicted
+    prices: dict = {}                      # match_id -> {market: decimal odds}
+    top_k: int = 20
+    per_match: Optional[int] = None
+
+class LiveStatesRequest(BaseModel):
+    # match_id, minute, home_goals, away_goals; optional home_reds, away_reds,
+    # status (1H/HT/2H/FT), ht_home_goals/ht_away_goals, and home_xg/away_xg
+    # for matches that were never predicted
+    states: List[dict]
+
+class StakeRequest(BaseModel):
+    bankroll: float
+    candidates: List[dict]  # match_id, prob, odds, optional league/market/event
+    # Unset options use the defaults in backend.staking
+    kelly_fraction: Optional[float] = None
+    correlation: Optional[float] = None
+    max_match: Optional[float] = None
+    max_league: Optional[float] = None
+    max_total: Optional[float] = None
+
+# Shared clients are cheap to build; the predictor's models are loaded in the
+# background so the server can answer health checks straight away.
+football_api = get_football_api()
+odds_api = get_odds_api()
+# Football is the primary engine and is loaded eagerly in the background;
+# other sports' engines load on their first request.
+football_engine = engines.FOOTBALL
+predictor = football_engine.predictor
+
+startup_timings = {}
+_models_task = None
+_watch_task = None
+MODEL_POLL_SECONDS = float(os.getenv('MODEL_POLL_SECONDS', '30'))
+
+# Workers are stateless: match lists live in the shared store and one worker,
+# the lease holder, refreshes them ahead of expiry while the others read.
+shared_store = get_shared_store()
+leader = LeaderLease(shared_store, 'refresher', ttl=15.0)
+REFRESH_SECONDS = float(os.getenv('REFRESH_SECONDS', '30'))  # leader loop period; 0 disables it
+REFRESH_LEASE_SECONDS = 15.0
+SNAPSHOT_TTL = 24 * 3600
+WATCH_SECONDS = 3600  # match lists nobody read for this long stop being refreshed
+INPLAY_TTL = 6 * 3600  # live match states kept in the shared store
+_watched = {}
+_refresh_locks = {}
+_leader_task = None
+
+
+def _load_models():
+    started = time.perf_counter()
+    football_engine.ensure_loaded()
+    startup_timings['model_load_seconds'] = round(time.perf_counter() - started, 3)
+    startup_timings['ready_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    print(f"[STARTUP] Models loaded in {startup_timings['model_load_seconds']}s")
+
+
+def _schedule_model_load():
+    global _models_task
+    if _models_task is None:
+        loop = asyncio.get_running_loop()
+        _models_task = loop.run_in_executor(None, _load_models)
+    return _models_task
+
+
+async def wait_until_ready():
+    """Block a request until background model loading has finished"""
+    await asyncio.shield(_schedule_model_load())
+
+
+async def _watch_models():
+    """Poll the model store and hot-swap when a new version is published"""
+    loop = asyncio.get_running_loop()
+    await wait_until_ready()
+    while True:
+        await asyncio.sleep(MODEL_POLL_SECONDS)
+        try:
+            if await loop.run_in_executor(None, predictor.maybe_reload):
+                print(f"[MODELS] Hot-swapped to {predictor.model_versions}")
+        except Exception as e:
+            print(f"[MODELS] Reload check failed: {e}")
+
 
 @app.on_event("startup")
 async def startup_event():
-    # Load models and initialize APIs
-    predictor.load_models()
+    global _watch_task, _leader_task
+    # Kick off model loading without holding up the server start
+    startup_timings['startup_seconds'] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    _schedule_model_load()
+    if MODEL_POLL_SECONDS > 0:
+        _watch_task = asyncio.create_task(_watch_models())
+    if REFRESH_SECONDS > 0:
+        _leader_task = asyncio.create_task(_lead_refreshes())
 
-@app.get("/matches")
-async def get_upcoming_matches(league: str = "ALL", days: int = 14):
-    """Get real upcoming matches from football-data.org
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if _watch_task is not None:
+        _watch_task.cancel()
+    if _leader_task is not None:
+        _leader_task.cancel()
+    from backend.odds_history import get_odds_history
+    history = get_odds_history()
+    if history is not None:
+        # Buffered ticks would otherwise be lost with the process
+        await asyncio.to_thread(history.flush)
+    leader.release()
+
+@app.get("/health")
+async def health():
+    """Liveness probe - answers as soon as the process is serving"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe - 503 until models are loaded"""
+    if _models_task is None or not _models_task.done():
+        return JSONResponse(status_code=503, content={"ready": False, "timings": startup_timings})
+    if _models_task.exception() is not None:
+        return JSONResponse(status_code=503, content={"ready": False, "error": str(_models_task.exception())})
+    return {"ready": True, "models": sorted(predictor.models), "versions": predictor.model_versions,
+            "timings": startup_timings, "upstream": breaker_states(), "worker": WORKER_ID,
+            "leader": leader.is_leader}
+
+@app.post("/models/reload")
+async def reload_models():
+    """Swap to the latest published model versions without a restart"""
+    await wait_until_ready()
+    loop = asyncio.get_running_loop()
+    swapped = await loop.run_in_executor(None, predictor.maybe_reload)
+    return {"swapped": swapped, "versions": predictor.model_versions}
+
+@app.get("/engines")
+async def list_engines():
+    """Registered sport engines with their markets, score models and leagues"""
+    return {"engines": [engine.describe() for engine in engines.ENGINES.values()]}
+
+def _etag(*parts) -> str:
+    digest = hashlib.blake2b('|'.join(str(p) for p in parts).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against the current entry"""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+        return '*' in tags or etag in tags
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _json_bytes(payload) -> bytes:
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+def _select_page(result: dict, offset: int, limit: Optional[int], fields: Optional[str]) -> dict:
+    matches = result['matches'][offset:offset + limit if limit is not None else None]
+    if fields:
+        wanted = [f.strip() for f in fields.split(',') if f.strip()]
+        matches = [{k: m[k] for k in wanted if k in m} for m in matches]
+    page = {"matches": matches, "total": result['total'], "offset": offset, "limit": limit}
+    if 'degraded' in result:
+        page['degraded'] = result['degraded']
+        if result['degraded']:
+            page['degraded_reasons'] = result['degraded_reasons']
+    return page
+
+
+def _in_window(commence_time: str, now: datetime, days: int) -> bool:
+    try:
+        kickoff = datetime.fromisoformat(commence_time.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return False
+    return now <= kickoff <= now + timedelta(days=days)
+
+
+async def _fetch_matches(league: str, days: int, now: datetime) -> dict:
+    print(f"[CACHE MISS] Fetching fresh matches for {league}")
     
-    Supported leagues:
-    - PL: Premier League (England)
-    - PD: La Liga (Spain)  
-    - BL1: Bundesliga (Germany)
-    - SA: Serie A (Italy)
-    - FL1: Ligue 1 (France)
-    - ALL: All top 5 leagues
-    """
+    try:
+        leagues = engines.resolve_leagues(league)
+    except KeyError:
+        # Unregistered code: pass it straight to football-data, without odds
+        leagues = [engines.League(league, league, 'football', '')]
     
-    # Check cache
-    cache_key = f"{league}_{days}"
-    now = datetime.now()
+    # Fixtures for every league and odds for every distinct sport key, concurrently
+    fixture_leagues = [lg for lg in leagues if lg.fixtures == 'football-data']
+    sport_keys = sorted({lg.odds_sport_key for lg in leagues if lg.odds_sport_key})
+    # to_thread carries the request's context, so degradation marks reach the handler;
+    # profiled() puts the worker threads in the request's profile while they run
+    fixture_jobs = [asyncio.to_thread(profiling.profiled(football_api.get_upcoming_matches), lg.code, days)
+                    for lg in fixture_leagues]
+    odds_jobs = [asyncio.to_thread(profiling.profiled(odds_api.get_odds), key) for key in sport_keys]
+    results = await asyncio.gather(*fixture_jobs, *odds_jobs, return_exceptions=True)
+    fixture_results = results[:len(fixture_jobs)]
+    odds_by_key = dict(zip(sport_keys, results[len(fixture_jobs):]))
     
-    if cache_key in matches_cache and cache_key in cache_timestamp:
-        if now - cache_timestamp[cache_key] < CACHE_DURATION:
-            print(f"[CACHE HIT] Returning cached matches for {league}")
-            return matches_cache[cache_key]
+    per_league = {}
+    for lg, matches in zip(fixture_leagues, fixture_results):
+        per_league[lg.code] = matches if isinstance(matches, list) else []
     
-    print(f"[CACHE MISS] Fetching fresh matches for {league}")
+    # Leagues the odds feed is the fixture source for
+    for lg in leagues:
+        if lg.fixtures == 'odds':
+            payload = odds_by_key.get(lg.odds_sport_key)
+            per_league[lg.code] = [{
+                'id': event.get('id'),
+                'home_team': event.get('home_team'),
+                'away_team': event.get('away_team'),
+                'date': event.get('commence_time'),
+                'competition': lg.name,
+            } for event in (payload if isinstance(payload, list) else [])
+                if _in_window(event.get('commence_time'), now, days)]
     
-    # Top 5 European leagues
-    if league == "ALL":
-        leagues = ["PL", "PD", "BL1", "SA", "FL1"]
-        all_matches = []
-        for lg in leagues:
-            matches = football_api.get_upcoming_matches(league=lg, days_ahead=days)
-            all_matches.extend(matches)
+    matches = []
+    for lg in leagues:
+        league_matches = per_league.get(lg.code, [])
+        for match in league_matches:
+            match['league'] = lg.code
+            match['sport'] = engines.get_engine(lg.engine).sport
+        matches.extend(league_matches)
+        if len(leagues) > 1:
             # Cache individual leagues too
-            individual_result = {"matches": matches, "total": len(matches)}
-            individual_cache_key = f"{lg}_{days}"
-            matches_cache[individual_cache_key] = individual_result
-            cache_timestamp[individual_cache_key] = now
-        matches = all_matches
-    else:
-        matches = football_api.get_upcoming_matches(league=league, days_ahead=days)
+            _save_snapshot(f"{lg.code}_{days}", {"matches": league_matches, "total": len(league_matches)}, now)
     
-    # Try to enrich with odds data
+    # Enrich with odds data, using every bookmaker's prices across all feeds in one pass
     try:
-        odds_list = odds_api.get_odds(sport='soccer_epl')
+        from backend.odds import process_odds, to_odds_data, match_prices
+        from backend.odds_history import get_odds_history
+        odds_list = [event for payload in odds_by_key.values() if isinstance(payload, list) for event in payload]
+        summaries = process_odds(odds_list)
+        # Keep every snapshot for line-movement features; whichever worker fetched it
+        # writes it (the store locks across processes)
+        history = get_odds_history()
+        if history is not None:
+            # Change detection, partition writes and downsampling stay off the event loop
+            await asyncio.to_thread(profiling.profiled(history.ingest), odds_list, now)
         # Match odds to fixtures by team names (simple matching)
-        odds_map = {}
-        for game in odds_list:
-            key = f"{game.get('home_team', '')}_{game.get('away_team', '')}"
-            if 'bookmakers' in game and game['bookmakers']:
-                bookmaker = game['bookmakers'][0]
-                if 'markets' in bookmaker and bookmaker['markets']:
-                    market = bookmaker['markets'][0]
-                    if 'outcomes' in market:
-                        outcomes = {o['name']: o['price'] for o in market['outcomes']}
-                        odds_map[key] = outcomes
+        odds_map = {f"{s['home_team']}_{s['away_team']}": (event_id, s) for event_id, s in summaries.items()}
         
         # Enrich matches with odds
         for match in matches:
             key = f"{match['home_team']}_{match['away_team']}"
             if key in odds_map:
-                match['odds'] = odds_map[key]
+                event_id, summary = odds_map[key]
+                match['odds'] = match_prices(summary)
+                match['odds_data'] = dict(to_odds_data(summary), odds_event_id=event_id)
     except Exception as e:
-        print(f"Could not fetch odds: {e}")
+        print(f"Could not process odds: {e}")
     
-    # Store in cache
-    result = {"matches": matches, "total": len(matches)}
+    return {"matches": matches, "total": len(matches)}
+
+def _is_fresh(cache_key: str, stamp: Optional[datetime], now: datetime, max_age: timedelta = CACHE_DURATION) -> bool:
+    return cache_key in matches_cache and stamp is not None and now - stamp < max_age
+
+
+def _save_snapshot(cache_key: str, result: dict, stamp: datetime):
+    """Publish a match list to every worker and keep this worker's copy"""
+    # Round-trip through the stored float so every worker derives the same ETag
+    stamp = datetime.fromtimestamp(stamp.timestamp(), timezone.utc)
+    shared_store.set(f"matches:{cache_key}", result, ttl=SNAPSHOT_TTL, updated_at=stamp.timestamp())
     matches_cache[cache_key] = result
-    cache_timestamp[cache_key] = now
+    cache_timestamp[cache_key] = stamp
+
+
+def _load_snapshot(cache_key: str) -> Optional[datetime]:
+    """Copy the shared snapshot into this worker if it is newer; returns the current stamp"""
+    updated_at = shared_store.updated_at(f"matches:{cache_key}")
+    local = cache_timestamp.get(cache_key)
+    if updated_at is not None:
+        stamp = datetime.fromtimestamp(updated_at, timezone.utc)
+        if local is None or stamp > local or cache_key not in matches_cache:
+            result = shared_store.get(f"matches:{cache_key}")
+            if result is not None:
+                matches_cache[cache_key] = result
+                cache_timestamp[cache_key] = local = stamp
+    return local
+
+
+def _watch(cache_key: str):
+    """Tell the leader this match list is being read, at most once a minute per worker"""
+    now = time.time()
+    if now - _watched.get(cache_key, 0) > 60:
+        _watched[cache_key] = now
+        shared_store.set(f"watch:{cache_key}", now, ttl=WATCH_SECONDS)
+
+
+async def _refresh_snapshot(league: str, days: int, max_age: timedelta):
+    """Refresh a match list unless it is younger than max_age, once across all workers.
+
+    Concurrent requests in this worker share an asyncio lock; other workers
+    are kept out by a store lease. Losers serve the copy they have, or wait
+    for the winner's snapshot (or the lease to lapse) if they have none.
+    """
+    cache_key = f"{league}_{days}"
+    lock = _refresh_locks.setdefault(cache_key, asyncio.Lock())
+    async with lock:
+        lease = f"refresh:{cache_key}"
+        while True:
+            now = datetime.now(timezone.utc)
+            if _is_fresh(cache_key, _load_snapshot(cache_key), now, max_age):
+                return
+            if shared_store.acquire_lease(lease, WORKER_ID, REFRESH_LEASE_SECONDS):
+                break
+            if cache_key in matches_cache:
+                return
+            await asyncio.sleep(0.05)
+        try:
+            with track_degradation() as degraded:
+                result = await _fetch_matches(league, days, now)
+            result['degraded'] = bool(degraded)
+            if degraded:
+                result['degraded_reasons'] = degraded
+            # Fallback data is only kept briefly so a recovered upstream shows up soon
+            _save_snapshot(cache_key, result, now - CACHE_DURATION + DEGRADED_CACHE_DURATION if degraded else now)
+        finally:
+            shared_store.release_lease(lease, WORKER_ID)
+
+
+async def _refresh_due():
+    """Leader: refresh every watched match list shortly before it goes stale"""
+    max_age = max(CACHE_DURATION - timedelta(seconds=2 * REFRESH_SECONDS), CACHE_DURATION / 2)
+    for key in shared_store.keys('watch:'):
+        cache_key = key[len('watch:'):]
+        league, _, days = cache_key.rpartition('_')
+        try:
+            await _refresh_snapshot(league, int(days), max_age)
+        except Exception as e:
+            print(f"[LEADER] Refresh of {cache_key} failed: {e}")
+
+
+async def _lead_refreshes():
+    """Hold or contend for the refresher lease; the holder runs the scheduled refreshes"""
+    while True:
+        was_leader = leader.is_leader
+        if await asyncio.to_thread(leader.renew):
+            if not was_leader:
+                print(f"[LEADER] {WORKER_ID} is now the refresher")
+            await _refresh_due()
+        await asyncio.sleep(min(REFRESH_SECONDS, leader.ttl / 3))
+
+@app.get("/matches")
+async def get_upcoming_matches(request: Request, league: str = "ALL", days: int = 14,
+                               offset: int = 0, limit: Optional[int] = None, fields: Optional[str] = None):
+    """Get real upcoming matches from football-data.org
     
-    return result
+    `league` is any code registered in backend.engines (see /engines), e.g.
+    - PL: Premier League (England)
+    - PD: La Liga (Spain)  
+    - BL1: Bundesliga (Germany)
+    - SA: Serie A (Italy)
+    - FL1: Ligue 1 (France)
+    - NBA: NBA (fixtures from the odds feed)
+    - football / basketball: every league of that engine
+    - ALL: All top 5 football leagues
+    
+    `offset`/`limit` page through the list and `fields` (comma separated)
+    trims each match to the given keys. Responses carry an ETag derived from
+    the cache entry's version, so polling clients get 304s until it refreshes.
+    """
+    
+    # Check cache: this worker's copy, then the shared snapshot, then refresh
+    cache_key = f"{league}_{days}"
+    now = datetime.now(timezone.utc)
+    _watch(cache_key)
+    
+    stamp = cache_timestamp.get(cache_key)
+    if not _is_fresh(cache_key, stamp, now):
+        stamp = _load_snapshot(cache_key)
+        if not _is_fresh(cache_key, stamp, now):
+            await _refresh_snapshot(league, days, CACHE_DURATION)
+            stamp = cache_timestamp[cache_key]
+            now = datetime.now(timezone.utc)
+    
+    variant = (cache_key, stamp.timestamp(), offset, limit, fields)
+    etag = _etag(*variant)
+    max_age = max(0, int((CACHE_DURATION - (now - stamp)).total_seconds()))
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(stamp, usegmt=True),
+        "Cache-Control": f"public, max-age={max_age}",
+    }
+    if _not_modified(request, etag, stamp):
+        return Response(status_code=304, headers=headers)
+    
+    body = encoded_cache.get(variant)
+    if body is None:
+        body = _json_bytes(_select_page(matches_cache[cache_key], offset, limit, fields))
+        if len(encoded_cache) >= ENCODED_CACHE_SIZE:
+            encoded_cache.clear()
+        encoded_cache[variant] = body
+    return Response(body, media_type="application/json", headers=headers)
 
 @app.post("/predict")
-async def predict(req: PredictRequest):
+async def predict(req: PredictRequest, request: Request):
+    engine = engines.engine_for_league(req.league or req.context.get('league'))
+    if engine is football_engine:
+        await wait_until_ready()
+    elif not engine.loaded:
+        await asyncio.get_running_loop().run_in_executor(None, profiling.profiled(engine.ensure_loaded))
     # Return top candidate events with probability and implied payout
-    results = predictor.predict_events(req.match_id, req.home_team, req.away_team, req.context)
-    return {"match_id": req.match_id, "candidates": results}
+    with track_degradation() as degraded:
+        results = engine.predictor.predict_events(req.match_id, req.home_team, req.away_team, req.context)
+    payload = {"match_id": req.match_id, "candidates": results, "degraded": bool(degraded)}
+    if degraded:
+        payload["degraded_reasons"] = degraded
+    body = _json_bytes(payload)
+    # Content-addressed ETag: repeat polls with an unchanged answer get a 304
+    etag = _etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag, None):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+@app.post("/predict/whatif")
+async def predict_whatif(req: WhatIfRequest):
+    """Re-price a predicted match's markets under overrides, optionally over a parameter sweep"""
+    await wait_until_ready()
+    try:
+        result = predictor.what_if(req.match_id, req.overrides, req.sweep)
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="No cached features for this match; call /predict first")
+    return Response(_json_bytes(result), media_type="application/json")
+
+@app.post("/predict/markets")
+async def predict_markets(req: MarketsRequest):
+    """Best-EV correct score, HT/FT, handicap, team total, margin and double chance bets of predicted matches"""
+    await wait_until_ready()
+    try:
+        result = predictor.market_board(req.match_ids, req.prices, req.top_k, req.per_match)
+    except (ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(_json_bytes(result), media_type="application/json")
+
+@app.post("/stakes")
+async def stakes(req: StakeRequest):
+    """Simultaneous fractional-Kelly stakes for a slate of positive-EV candidates"""
+    from backend.staking import stake_candidates
+    if req.bankroll <= 0 or (req.kelly_fraction is not None and not 0 < req.kelly_fraction <= 1):
+        raise HTTPException(status_code=400, detail="bankroll must be positive and kelly_fraction in (0, 1]")
+    if any(cap is not None and cap <= 0 for cap in (req.max_match, req.max_league, req.max_total)):
+        raise HTTPException(status_code=400, detail="max_match, max_league and max_total must be positive")
+    if req.correlation is not None and not 0 <= req.correlation < 1:
+        raise HTTPException(status_code=400, detail="correlation must be in [0, 1)")
+    options = {'fraction': req.kelly_fraction, 'correlation': req.correlation, 'max_match': req.max_match,
+               'max_league': req.max_league, 'max_total': req.max_total}
+    try:
+        bets = stake_candidates(req.candidates, req.bankroll, **{k: v for k, v in options.items() if v is not None})
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid candidate: {e}")
+    return {"bankroll": req.bankroll, "total_stake": round(sum(b['stake'] for b in bets), 2), "bets": bets}
+
+@app.get("/odds/history/{event_id}")
+async def odds_history(event_id: str, market: str = "h2h"):
+    """Line movement of one odds event: opening vs current consensus, velocity and steam moves"""
+    from backend.odds_history import get_odds_history
+    history = get_odds_history()
+    if history is None:
+        raise HTTPException(status_code=404, detail="Odds history is disabled")
+    movement = await asyncio.to_thread(profiling.profiled(history.line_movement), event_id, market)
+    if not movement['outcomes']:
+        raise HTTPException(status_code=404, detail="No odds history for this event and market")
+    return movement
+
+def _live_matches(engine, match_ids, states=()) -> List[str]:
+    """Bring this worker's in-play engine up to date for match_ids; returns the ones it cannot price.
+
+    Live states are shared: a match another worker has been fed is picked
+    up from the store (pre-match xG and latest state), a new one starts
+    from its cached prediction or the xG sent with its first state.
+    """
+    from backend.inplay import STATUSES
+    sent = {s.get('match_id'): s for s in states}
+    missing = []
+    for match_id in dict.fromkeys(match_ids):
+        stored = shared_store.get(f"inplay:{match_id}")
+        if match_id not in engine:
+            xg = stored['xg'] if stored else None
+            state = sent.get(match_id, {})
+            if xg is None and (state.get('home_xg') is not None or state.get('away_xg') is not None):
+                try:
+                    xg = [float(state['home_xg']), float(state['away_xg'])]
+                except (KeyError, TypeError, ValueError):
+                    raise HTTPException(status_code=400, detail=f"{match_id}: home_xg and away_xg must both be numbers")
+            if xg is None:
+                cached = predictor.cached_features([match_id])
+                if cached:
+                    features = cached[0][1]['features']
+                    xg = [features['home_xg'], features['away_xg']]
+            if xg is None:
+                missing.append(match_id)
+                continue
+            engine.add_match(match_id, *xg)
+        if stored and stored.get('state'):
+            local = engine.state(match_id)
+            state = stored['state']
+            if (STATUSES.index(state['status']), state['minute']) >= (STATUSES.index(local['status']), local['minute']):
+                engine.apply([state])
+    return missing
+
+@app.post("/inplay/states")
+async def inplay_states(req: LiveStatesRequest):
+    """Feed live match states (minute, score, red cards); re-prices the affected markets"""
+    from backend.inplay import get_inplay_engine
+    engine = get_inplay_engine()
+    match_ids = [s.get('match_id') for s in req.states]
+    if not all(isinstance(m, str) for m in match_ids):
+        raise HTTPException(status_code=400, detail="Every state needs a match_id")
+    missing = _live_matches(engine, match_ids, req.states)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"No pre-match xG for {missing}; call /predict or send home_xg/away_xg")
+    try:
+        engine.apply(req.states)
+    except (KeyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    recomputed = engine.recompute()
+    # Matches over for as long as their shared state lives are dropped from this worker
+    engine.evict(INPLAY_TTL)
+    for match_id in dict.fromkeys(match_ids):
+        if match_id not in engine:
+            continue
+        row = engine.index[match_id]
+        shared_store.set(f"inplay:{match_id}", {'xg': engine.xg[row].tolist(), 'state': engine.state(match_id)},
+                         ttl=INPLAY_TTL)
+    return {"updated": len(req.states), "recomputed": recomputed}
+
+@app.get("/inplay/{match_id}")
+async def inplay_markets(match_id: str):
+    """Live state, remaining xG and every in-play market of one match (settled ones frozen)"""
+    from backend.inplay import get_inplay_engine
+    engine = get_inplay_engine()
+    if match_id not in engine and shared_store.get(f"inplay:{match_id}") is None:
+        raise HTTPException(status_code=404, detail="Match is not live")
+    _live_matches(engine, [match_id])
+    engine.recompute()
+    return Response(_json_bytes(engine.snapshot(match_id)), media_type="application/json")
+
+@app.get("/debug/profiles")
+async def list_profiles():
+    """Recently sampled requests (debug mode only)"""
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    return {"profiles": profiling.profile_store.summaries()}
+
+@app.get("/debug/profiles/{profile_id}")
+async def get_profile(profile_id: str, format: str = "speedscope"):
+    """One request's samples as a speedscope document or collapsed stacks"""
+    if not profiling.PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    profile = profiling.profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if format == "collapsed":
+        return Response(profiling.to_collapsed(profile['samples']), media_type="text/plain")
+    if format != "speedscope":
+        raise HTTPException(status_code=400, detail="format must be speedscope or collapsed")
+    name = f"{profile['method']} {profile['path']}"
+    return profiling.to_speedscope(profile['samples'], profile['interval'], name)
@@ -0,0 +1,82 @@
+from statistics import NormalDist
+from typing import List, Dict, Any
+
+HOME_ADVANTAGE = 2.5   # points
+MARGIN_SD = 12.0       # spread of the final points margin
+TOTAL_SD = 18.0        # spread of the combined points total
+DEFAULT_TOTAL = 225.0
+
+
+class BasketballPredictor:
+    """Predictor for basketball leagues.
+
+    Final margin and total points are modelled as normal distributions. The
+    expected margin comes from team net ratings when the caller supplies them
+    (context home_net_rating / away_net_rating), otherwise from the market's
+    consensus moneyline; the expected total from context or the main line.
+
+    Same contract as backend.predictor.Predictor.
+    """
+
+    def __init__(self):
+        self.models = {}
+
+    def load_models(self):
+        """Nothing to load yet; kept for the engine contract"""
+        pass
+
+    def predict_events(self, match_id: str, home: str, away: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
+        odds_data = context.get('odds_data', {})
+        margin_mu, source = self._expected_margin(context, odds_data)
+        total_mu = context.get('expected_total') or odds_data.get('total_line') or DEFAULT_TOTAL
+        margin = NormalDist(margin_mu, MARGIN_SD)
+        total = NormalDist(total_mu, TOTAL_SD)
+
+        events = []
+        prob_home = 1.0 - margin.cdf(0.0)
+        events.append(self._candidate(f'{home} Win', 'home_win', prob_home, odds_data.get('home_odds'),
+                                      f'Expected margin {margin_mu:+.1f} pts ({source})'))
+        events.append(self._candidate(f'{away} Win', 'away_win', 1.0 - prob_home, odds_data.get('away_odds'),
+                                      f'Expected margin {-margin_mu:+.1f} pts ({source})'))
+
+        spread = odds_data.get('home_spread_line')
+        if spread is not None:
+            prob_cover = 1.0 - margin.cdf(-spread)
+            events.append(self._candidate(f'{home} {spread:+g}', 'home_spread', prob_cover,
+                                          odds_data.get('home_spread_odds'),
+                                          f'{prob_cover*100:.0f}% to cover with expected margin {margin_mu:+.1f}'))
+            events.append(self._candidate(f'{away} {-spread:+g}', 'away_spread', 1.0 - prob_cover,
+                                          odds_data.get('away_spread_odds'),
+                                          f'{(1-prob_cover)*100:.0f}% to cover with expected margin {-margin_mu:+.1f}'))
+
+        line = odds_data.get('total_line', round(total_mu) + 0.5)
+        prob_over = 1.0 - total.cdf(line)
+        events.append(self._candidate(f'Over {line:g} Points', 'over_total', prob_over, odds_data.get('over_total_odds'),
+                                      f'Projected total {total_mu:.1f} points'))
+        events.append(self._candidate(f'Under {line:g} Points', 'under_total', 1.0 - prob_over,
+                                      odds_data.get('under_total_odds'), f'Projected total {total_mu:.1f} points'))
+
+        events.sort(key=lambda e: (e['prob'], e['ev']), reverse=True)
+        return events
+
+    def _expected_margin(self, context: Dict, odds_data: Dict):
+        if 'home_net_rating' in context and 'away_net_rating' in context:
+            return HOME_ADVANTAGE + context['home_net_rating'] - context['away_net_rating'], 'net ratings'
+        market_prob = odds_data.get('market_prob_home')
+        if market_prob and 0.0 < market_prob < 1.0:
+            return NormalDist(0.0, MARGIN_SD).inv_cdf(market_prob), 'market consensus'
+        if odds_data.get('home_spread_line') is not None:
+            return -odds_data['home_spread_line'], 'spread line'
+        return HOME_ADVANTAGE, 'home advantage'
+
+    def _candidate(self, event: str, market: str, prob: float, odds: float, reasoning: str) -> Dict[str, Any]:
+        prob = min(max(prob, 0.001), 0.999)
+        odds = odds or (1.0 / prob) * 1.05
+        return {
+            'event': event,
+            'market': market,
+            'prob': round(prob, 3),
+            'odds': round(odds, 2),
+            'ev': round(prob * odds - 1.0, 3),
+            'reasoning': reasoning,
+        }
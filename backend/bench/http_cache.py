@@ -0,0 +1,70 @@
+"""Load test /matches polling with and without conditional requests/compression.
+
+Seeds the matches cache with a realistic ALL-leagues payload and replays a
+dashboard's polling pattern in-process, reporting bytes on the wire and
+throughput per scenario.
+
+    python -m backend.bench.http_cache --matches 400 --requests 500
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from backend.app import main
+
+
+def seed(n_matches: int):
+    matches = []
+    for i in range(n_matches):
+        matches.append({
+            'id': 400000 + i, 'home_team': f'Home Team {i} FC', 'away_team': f'Away Team {i} FC',
+            'date': '2026-10-24T14:00:00Z', 'competition': 'Premier League',
+            'odds': {'Home': 2.15, 'Draw': 3.4, 'Away': 3.6},
+            'odds_data': {'home_odds': 2.15, 'draw_odds': 3.4, 'away_odds': 3.6, 'market_prob_home': 0.4512,
+                          'market_prob_draw': 0.2811, 'market_prob_away': 0.2677, 'over_2.5_goals': 1.91,
+                          'under_2.5_goals': 1.98, 'market_prob_over_2.5': 0.5072, 'market_prob_under_2.5': 0.4928},
+        })
+    main.matches_cache['ALL_14'] = {'matches': matches, 'total': n_matches}
+    main.cache_timestamp['ALL_14'] = datetime.now(timezone.utc)
+    main.encoded_cache.clear()
+
+
+def run(client: TestClient, n: int, params: dict, headers: dict, conditional: bool) -> dict:
+    sent = 0
+    etag = None
+    started = time.perf_counter()
+    for _ in range(n):
+        h = dict(headers)
+        if conditional and etag:
+            h['If-None-Match'] = etag
+        resp = client.get('/matches', params=params, headers=h)
+        etag = resp.headers.get('etag')
+        sent += resp.num_bytes_downloaded
+    elapsed = time.perf_counter() - started
+    return {'bytes_per_request': round(sent / n), 'requests_per_s': round(n / elapsed)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--matches', type=int, default=400)
+    parser.add_argument('--requests', type=int, default=500)
+    args = parser.parse_args()
+
+    seed(args.matches)
+    client = TestClient(main.app)
+    params = {'league': 'ALL', 'days': 14}
+    identity = {'Accept-Encoding': 'identity'}
+    gzip = {'Accept-Encoding': 'gzip'}
+    results = {
+        'full_uncompressed': run(client, args.requests, params, identity, conditional=False),
+        'full_gzip': run(client, args.requests, params, gzip, conditional=False),
+        'conditional_304': run(client, args.requests, params, gzip, conditional=True),
+        'fields_gzip': run(client, args.requests, dict(params, fields='id,home_team,away_team,date,odds'), gzip,
+                           conditional=False),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main_cli()
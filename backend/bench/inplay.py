@@ -0,0 +1,58 @@
+"""Replay simulated full matches through the in-play engine and report update throughput.
+
+    python -m backend.bench.inplay --matches 2000
+"""
+import argparse
+import json
+import time
+import numpy as np
+from backend.inplay import InPlayEngine, SimulatedFeed
+
+
+def replay(n_matches: int, seed: int = 7, messages: bool = False) -> dict:
+    """Play every match through to full time, one feed poll per minute; returns timings"""
+    rng = np.random.RandomState(seed)
+    ids = [f'm{i}' for i in range(n_matches)]
+    home_xg, away_xg = rng.uniform(0.6, 2.4, n_matches), rng.uniform(0.4, 2.0, n_matches)
+    engine = InPlayEngine(capacity=n_matches)
+    for match_id, h, a in zip(ids, home_xg, away_xg):
+        engine.add_match(match_id, h, a)
+    engine.recompute()
+    rows = engine.rows(ids)
+
+    feed = SimulatedFeed(ids, home_xg, away_xg, seed=seed)
+    updates = recomputed = 0
+    busy = 0.0
+    while not feed.finished:
+        if messages:
+            batch = feed.poll()
+            started = time.perf_counter()
+            engine.apply(batch)
+        else:
+            batch = feed.step()
+            started = time.perf_counter()
+            engine.update(rows, batch['minute'], batch['goals'], batch['reds'], batch['status'])
+        recomputed += engine.recompute()
+        busy += time.perf_counter() - started
+        updates += n_matches
+    return {
+        'matches': n_matches,
+        'input': 'dicts' if messages else 'arrays',
+        'updates': updates,
+        'rows_recomputed': recomputed,
+        'seconds': round(busy, 3),
+        'updates_per_second': int(updates / busy),
+        'all_settled': bool(engine.settled[:n_matches].all()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--matches', type=int, default=2000)
+    args = parser.parse_args()
+    for messages in (False, True):
+        print(json.dumps(replay(args.matches, messages=messages)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Time odds processing over a synthetic multi-league OddsAPI dump.
+
+    python -m backend.bench.odds --events 400 --bookmakers 25
+"""
+import argparse
+import json
+import time
+import numpy as np
+from backend.odds import process_odds
+
+
+def make_payload(n_events: int, n_bookmakers: int, seed: int = 3):
+    rng = np.random.RandomState(seed)
+    payload = []
+    for e in range(n_events):
+        fair = rng.dirichlet([4, 2.5, 3])
+        home, away = f'Home {e}', f'Away {e}'
+        books = []
+        for b in range(n_bookmakers):
+            margin = 1 + rng.uniform(0.02, 0.08)
+            h2h = [round(1 / (p * margin), 2) for p in fair]
+            over = rng.uniform(0.4, 0.6)
+            books.append({'key': f'book{b}', 'markets': [
+                {'key': 'h2h', 'outcomes': [
+                    {'name': home, 'price': h2h[0]}, {'name': 'Draw', 'price': h2h[1]}, {'name': away, 'price': h2h[2]},
+                ]},
+                {'key': 'totals', 'outcomes': [
+                    {'name': 'Over', 'price': round(1 / (over * margin), 2), 'point': 2.5},
+                    {'name': 'Under', 'price': round(1 / ((1 - over) * margin), 2), 'point': 2.5},
+                ]},
+                {'key': 'spreads', 'outcomes': [
+                    {'name': home, 'price': round(1 / (0.5 * margin), 2), 'point': -0.5},
+                    {'name': away, 'price': round(1 / (0.5 * margin), 2), 'point': 0.5},
+                ]},
+            ]})
+        payload.append({'id': f'e{e}', 'home_team': home, 'away_team': away, 'bookmakers': books})
+    return payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=400)
+    parser.add_argument('--bookmakers', type=int, default=25)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payload = make_payload(args.events, args.bookmakers)
+    results = {}
+    for method in ('multiplicative', 'shin'):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            process_odds(payload, method=method)
+            timings.append(time.perf_counter() - started)
+        results[method] = round(min(timings) * 1000, 1)
+    print(json.dumps({'events': args.events, 'bookmakers': args.bookmakers,
+                      'prices': args.events * args.bookmakers * 7, 'best_ms': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Multi-process load test: upstream calls must not grow with the worker count.
+
+Starts a fake football-data/odds upstream that counts requests, then for
+each worker count runs `uvicorn --workers N` against it with a fresh shared
+store, fires concurrent /matches requests spread over all workers, and
+reports how many upstream calls were made.
+
+    python -m backend.bench.scaling --workers 1 2 4 --requests 200
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class FakeUpstream:
+    """Serves canned fixtures and odds, counting calls per path"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = []
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                with upstream._lock:
+                    upstream.calls.append(path)
+                time.sleep(upstream.latency)
+                body = json.dumps(upstream.payload(path)).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def payload(self, path: str):
+        kickoff = (datetime.now(timezone.utc) + timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        if path.endswith('/matches'):
+            code = path.split('/')[-2]
+            return {'matches': [{'id': i, 'homeTeam': {'name': f'{code} Home {i}'},
+                                 'awayTeam': {'name': f'{code} Away {i}'}, 'utcDate': kickoff,
+                                 'competition': {'name': code}} for i in range(10)]}
+        if path.endswith('/odds'):
+            sport = path.split('/')[-2]
+            return [{'id': f'{sport}-{i}', 'home_team': f'Home {i}', 'away_team': f'Away {i}',
+                     'commence_time': kickoff, 'bookmakers': [{'key': f'b{b}', 'markets': [
+                         {'key': 'h2h', 'outcomes': [{'name': f'Home {i}', 'price': 2.1 + b / 100},
+                                                     {'name': 'Draw', 'price': 3.4},
+                                                     {'name': f'Away {i}', 'price': 3.6}]}]}
+                         for b in range(10)]} for i in range(10)]
+        return {}
+
+    def reset(self):
+        with self._lock:
+            self.calls = []
+
+    def close(self):
+        self.server.shutdown()
+
+
+def _wait_for(url: str, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(url)
+
+
+def _get(url: str) -> int:
+    with urllib.request.urlopen(url, timeout=30) as resp:
+        resp.read()
+        return resp.status
+
+
+def measure(upstream: FakeUpstream, workers: int, n_requests: int, concurrency: int = 32) -> dict:
+    port = _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ,
+                   FOOTBALL_DATA_BASE_URL=f'{upstream.url}/v4', ODDS_API_BASE_URL=f'{upstream.url}/v4',
+                   SHARED_STATE_URL=os.path.join(tmp, 'shared.sqlite3'), API_CACHE_PATH='',
+                   ODDS_HISTORY_DIR=os.path.join(tmp, 'odds_history'), MODEL_POLL_SECONDS='0')
+        proc = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'backend.app.main:app', '--port', str(port),
+             '--workers', str(workers), '--log-level', 'warning'],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            base = f'http://127.0.0.1:{port}'
+            _wait_for(f'{base}/health')
+            time.sleep(0.5 * workers)  # let every worker finish starting
+            upstream.reset()
+            urls = [f'{base}/matches?league={"ALL" if i % 2 else "PL"}&days=7' for i in range(n_requests)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(concurrency) as pool:
+                statuses = list(pool.map(_get, urls))
+            elapsed = time.perf_counter() - started
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+    return {
+        'workers': workers,
+        'requests': n_requests,
+        'ok': sum(s == 200 for s in statuses),
+        'upstream_calls': len(upstream.calls),
+        'requests_per_second': round(n_requests / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    upstream = FakeUpstream()
+    try:
+        for workers in args.workers:
+            print(json.dumps(measure(upstream, workers, args.requests)))
+    finally:
+        upstream.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Measure cold-start time of the API server.
+
+Launches uvicorn in a fresh process and polls until /health and /ready
+answer, repeating a few times and reporting the median.
+
+    python -m backend.bench.startup --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def _wait_for(url: str, deadline: float) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.005)
+    raise TimeoutError(f"{url} did not become available")
+
+
+def measure_once(port: int, timeout: float = 60.0) -> dict:
+    base = f'http://127.0.0.1:{port}'
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.app.main:app', '--port', str(port), '--log-level', 'warning'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        health = _wait_for(f'{base}/health', deadline)
+        ready = _wait_for(f'{base}/ready', deadline)
+        return {'first_request_s': health - started, 'ready_s': ready - started}
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    runs = [measure_once(args.port) for _ in range(args.runs)]
+    summary = {
+        key: round(statistics.median(r[key] for r in runs), 3)
+        for key in ('first_request_s', 'ready_s')
+    }
+    print(json.dumps({'runs': args.runs, 'median': summary}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Probability calibration for the predictor's markets.
+
+Offline, `fit_calibration` replays the predictor's statistical model over
+historical matches and fits one monotone map per market (isotonic or Platt).
+Each map is exported as a short sorted (x, y) array pair. At serving time all
+maps live in one flat array, with market m shifted onto [2m, 2m + 1], so every
+candidate of a request is calibrated with a single `np.interp` call.
+
+    python -m backend.calibration --matches data/matches.csv
+"""
+import argparse
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from backend.markets import core_market_probs
+from backend.model_store import CALIBRATION_PATH
+
+RESULT_MARKETS = ('home_win', 'draw', 'away_win')
+
+
+def _exclusive_group(market: str) -> Optional[Tuple[str, int]]:
+    """(group, number of outcomes) of a market whose outcomes are exhaustive and exclusive"""
+    if market in RESULT_MARKETS:
+        return '1x2', len(RESULT_MARKETS)
+    for prefix in ('over_', 'under_'):
+        if market.startswith(prefix):
+            return 'total_' + market[len(prefix):], 2
+    if market in ('btts_yes', 'btts_no'):
+        return 'btts', 2
+    return None
+
+
+class Calibrator:
+    """Vectorized lookup over per-market calibration maps"""
+
+    def __init__(self, maps: Dict[str, Tuple[Sequence[float], Sequence[float]]], metadata: Optional[Dict] = None):
+        self.maps = {}
+        self.metadata = metadata or {}
+        xs, ys = [], []
+        for i, (market, (x, y)) in enumerate(sorted(maps.items())):
+            x = np.asarray(x, dtype=float)
+            y = np.asarray(y, dtype=float)
+            # Pin both ends so a query never interpolates into a neighbouring market
+            x = np.concatenate([[0.0], np.clip(x, 0.0, 1.0), [1.0]])
+            y = np.concatenate([[y[0]], y, [y[-1]]])
+            self.maps[market] = (x[1:-1], y[1:-1])
+            xs.append(x + 2 * i)
+            ys.append(y)
+        self._index = {market: i for i, market in enumerate(sorted(maps))}
+        self._x = np.concatenate(xs) if xs else np.zeros(0)
+        self._y = np.concatenate(ys) if ys else np.zeros(0)
+
+    def __contains__(self, market: str) -> bool:
+        return market in self._index
+
+    def apply(self, markets: Sequence[str], probs: Sequence[float]) -> np.ndarray:
+        """Calibrate many probabilities at once; markets without a map pass through"""
+        probs = np.asarray(probs, dtype=float)
+        idx = np.fromiter((self._index.get(m, -1) for m in markets), dtype=np.int64, count=len(probs))
+        known = idx >= 0
+        if not known.any():
+            return probs
+        out = probs.copy()
+        out[known] = np.interp(np.clip(probs[known], 0.0, 1.0) + 2 * idx[known], self._x, self._y)
+        return out
+
+    def calibrate_events(self, events: List[Dict]) -> List[Dict]:
+        """Replace each candidate's prob/ev with calibrated values, in place"""
+        if not events:
+            return events
+        markets = [e.get('market', '') for e in events]
+        calibrated = self.apply(markets, [e['prob'] for e in events])
+
+        # Markets are calibrated one by one; keep every complete group of exclusive
+        # outcomes (1X2, over/under a line, BTTS yes/no) a proper distribution
+        groups: Dict[Tuple[str, int], List[int]] = {}
+        for i, market in enumerate(markets):
+            group = _exclusive_group(market)
+            if group is not None:
+                groups.setdefault(group, []).append(i)
+        for (_name, size), idx in groups.items():
+            if len(set(markets[i] for i in idx)) == size and calibrated[idx].sum() > 0:
+                calibrated[idx] /= calibrated[idx].sum()
+
+        for event, prob in zip(events, calibrated.tolist()):
+            event['prob'] = round(prob, 3)
+            event['ev'] = round(prob * event['odds'] - 1.0, 3)
+        return events
+
+    def to_dict(self) -> Dict:
+        return {
+            'metadata': self.metadata,
+            'maps': {m: {'x': np.round(x, 5).tolist(), 'y': np.round(y, 5).tolist()} for m, (x, y) in self.maps.items()},
+        }
+
+    def save(self, path: str = CALIBRATION_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = CALIBRATION_PATH) -> 'Calibrator':
+        with open(path) as f:
+            data = json.load(f)
+        maps = {m: (v['x'], v['y']) for m, v in data['maps'].items()}
+        return cls(maps, data.get('metadata'))
+
+
+def fit_isotonic(probs: np.ndarray, outcomes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Isotonic map as its (already compact) breakpoint arrays"""
+    from sklearn.isotonic import IsotonicRegression
+    iso = IsotonicRegression(y_min=0.0, y_max=1.0, out_of_bounds='clip')
+    iso.fit(probs, outcomes)
+    return iso.X_thresholds_, iso.y_thresholds_
+
+
+def fit_platt(probs: np.ndarray, outcomes: np.ndarray, grid_size: int = 51) -> Tuple[np.ndarray, np.ndarray]:
+    """Platt scaling on the logit of the raw probability, tabulated on a grid"""
+    from sklearn.linear_model import LogisticRegression
+    logit = lambda p: np.log(np.clip(p, 1e-4, 1 - 1e-4) / (1 - np.clip(p, 1e-4, 1 - 1e-4)))
+    lr = LogisticRegression()
+    lr.fit(logit(probs).reshape(-1, 1), outcomes)
+    x = np.linspace(probs.min(), probs.max(), grid_size)
+    return x, lr.predict_proba(logit(x).reshape(-1, 1))[:, 1]
+
+
+def historical_market_probs(frame) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """Uncalibrated predictor probabilities and realised outcomes per market.
+
+    Replays the predictor's xG model over a feature frame from
+    backend.train.build_match_features and prices it with backend.markets,
+    plus the linear corners rule where corners are available.
+    """
+    home_xg = (frame['home_gf'].to_numpy() / 1.5) * (frame['away_ga'].to_numpy() / 1.2) * 1.5
+    away_xg = (frame['away_gf'].to_numpy() / 1.3) * (frame['home_ga'].to_numpy() / 1.0) * 1.3
+    probs = core_market_probs(home_xg, away_xg, frame['home_cs'].to_numpy(), frame['away_cs'].to_numpy())
+    hg = frame['home_goals'].to_numpy()
+    ag = frame['away_goals'].to_numpy()
+
+    outcomes = {
+        'home_win': hg > ag,
+        'draw': hg == ag,
+        'away_win': hg < ag,
+        'over_1.5': hg + ag > 1.5,
+        'over_2.5': hg + ag > 2.5,
+        'under_2.5': hg + ag < 2.5,
+        'over_3.5': hg + ag > 3.5,
+        'btts_yes': (hg > 0) & (ag > 0),
+        'btts_no': (hg == 0) | (ag == 0),
+    }
+    out = {market: (probs[market], hit.astype(float)) for market, hit in outcomes.items()}
+    if 'home_corners' in frame and 'home_corners_ft' in frame:
+        total_corners = frame['home_corners'].to_numpy() + frame['away_corners'].to_numpy()
+        shown = total_corners > 9.0  # the predictor only offers the line above this
+        corners_prob = np.minimum(0.55 + (total_corners - 9.0) * 0.08, 0.85)
+        corners_hit = (frame['home_corners_ft'].to_numpy() + frame['away_corners_ft'].to_numpy()) > 9.5
+        out['over_9.5_corners'] = (corners_prob[shown], corners_hit[shown].astype(float))
+    return out
+
+
+def fit_calibration(csv_path: str, method: str = 'isotonic', min_samples: int = 200) -> Calibrator:
+    """Fit one calibration map per market from a historical matches CSV"""
+    from backend.data.ingest import load_historical_matches
+    from backend.train import build_match_features
+    frame = build_match_features(load_historical_matches(csv_path))
+    fit = fit_isotonic if method == 'isotonic' else fit_platt
+
+    maps = {}
+    counts = {}
+    for market, (probs, outcomes) in historical_market_probs(frame).items():
+        if len(probs) < min_samples:
+            print(f"Skipping {market}: only {len(probs)} samples")
+            continue
+        maps[market] = fit(probs, outcomes)
+        counts[market] = int(len(probs))
+    return Calibrator(maps, {'method': method, 'samples': counts,
+                             'trained_through': frame['date'].max().isoformat()})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--matches', required=True, help='historical matches CSV')
+    parser.add_argument('--method', choices=['isotonic', 'platt'], default='isotonic')
+    parser.add_argument('--out', '-o', default=CALIBRATION_PATH)
+    args = parser.parse_args()
+    calibrator = fit_calibration(args.matches, method=args.method)
+    calibrator.save(args.out)
+    print(f"Saved calibration for {len(calibrator.maps)} markets to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,16 @@
-import pandas as pd
-from typing import List
+from typing import List, TYPE_CHECKING
 
-def load_historical_matches(csv_path: str) -> pd.DataFrame:
+if TYPE_CHECKING:
+    import pandas as pd
+
+def load_historical_matches(csv_path: str) -> "pd.DataFrame":
     """Load historical match data from CSV. Expects columns like date, home, away, home_goals, away_goals."""
+    import pandas as pd
     df = pd.read_csv(csv_path, parse_dates=['date'])
     return df
 
 
-def load_player_stats(csv_path: str) -> pd.DataFrame:
+def load_player_stats(csv_path: str) -> "pd.DataFrame":
+    import pandas as pd
     df = pd.read_csv(csv_path)
     return df
@@ -0,0 +1,146 @@
+"""Registry of sport engines and the leagues they cover.
+
+Each engine declares its sport, the markets it prices, the score
+distribution model behind them and, per league, the odds feed sport key and
+where fixtures come from. Predictors are imported, built and loaded the first
+time a league of that engine is used, each behind its own lock, so adding a
+sport or league never adds work to the others.
+"""
+import importlib
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class League:
+    code: str
+    name: str
+    engine: str
+    odds_sport_key: str
+    fixtures: str = 'football-data'  # or 'odds' when only the odds feed lists the games
+    default: bool = False            # part of league=ALL
+
+
+class SportEngine:
+    """A sport's predictor plus the leagues and markets it serves"""
+
+    def __init__(self, key: str, sport: str, score_model: str, markets: List[str], predictor: str,
+                 leagues: List[League]):
+        self.key = key
+        self.sport = sport
+        self.score_model = score_model
+        self.markets = markets
+        self.predictor_path = predictor  # "module:attribute", imported on first use
+        self.leagues = {league.code: league for league in leagues}
+        self._predictor = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _build(self) -> Any:
+        module_name, _, attr = self.predictor_path.partition(':')
+        factory: Callable[[], Any] = getattr(importlib.import_module(module_name), attr)
+        return factory()
+
+    @property
+    def predictor(self) -> Any:
+        """The engine's predictor, constructed (but not loaded) on first access"""
+        if self._predictor is None:
+            with self._lock:
+                if self._predictor is None:
+                    self._predictor = self._build()
+        return self._predictor
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def ensure_loaded(self) -> Any:
+        """Load the predictor's models once; safe to call from many threads"""
+        predictor = self.predictor
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    predictor.load_models()
+                    self._loaded = True
+        return predictor
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            'engine': self.key,
+            'sport': self.sport,
+            'score_model': self.score_model,
+            'markets': self.markets,
+            'leagues': sorted(self.leagues),
+            'loaded': self._loaded,
+        }
+
+
+FOOTBALL = SportEngine(
+    key='football',
+    sport='football',
+    score_model='independent Poisson goals',
+    markets=['h2h', 'totals', 'btts', 'corners', 'player_to_score', 'correct_score', 'htft', 'asian_handicap',
+             'team_totals', 'winning_margin', 'double_chance'],
+    predictor='backend.predictor:Predictor',
+    leagues=[
+        League('PL', 'Premier League', 'football', 'soccer_epl', default=True),
+        League('PD', 'La Liga', 'football', 'soccer_spain_la_liga', default=True),
+        League('BL1', 'Bundesliga', 'football', 'soccer_germany_bundesliga', default=True),
+        League('SA', 'Serie A', 'football', 'soccer_italy_serie_a', default=True),
+        League('FL1', 'Ligue 1', 'football', 'soccer_france_ligue_one', default=True),
+        League('ELC', 'Championship', 'football', 'soccer_efl_champ'),
+        League('DED', 'Eredivisie', 'football', 'soccer_netherlands_eredivisie'),
+        League('PPL', 'Primeira Liga', 'football', 'soccer_portugal_primeira_liga'),
+        League('CL', 'UEFA Champions League', 'football', 'soccer_uefa_champs_league'),
+    ],
+)
+
+BASKETBALL = SportEngine(
+    key='basketball',
+    sport='basketball',
+    score_model='normal points margin and total',
+    markets=['h2h', 'spreads', 'totals'],
+    predictor='backend.basketball:BasketballPredictor',
+    leagues=[
+        League('NBA', 'NBA', 'basketball', 'basketball_nba', fixtures='odds'),
+    ],
+)
+
+ENGINES: Dict[str, SportEngine] = {}
+LEAGUES: Dict[str, League] = {}
+
+
+def register_engine(engine: SportEngine) -> SportEngine:
+    """Add an engine (and its leagues) to the registry"""
+    for code in engine.leagues:
+        if code in LEAGUES and LEAGUES[code].engine != engine.key:
+            raise ValueError(f"League {code} already belongs to engine {LEAGUES[code].engine}")
+    ENGINES[engine.key] = engine
+    LEAGUES.update(engine.leagues)
+    return engine
+
+
+def get_engine(key: str) -> SportEngine:
+    return ENGINES[key]
+
+
+def engine_for_league(code: Optional[str]) -> SportEngine:
+    """Engine serving a league code; unknown or missing codes fall back to football"""
+    league = LEAGUES.get(code or '')
+    return ENGINES[league.engine] if league else FOOTBALL
+
+
+def resolve_leagues(league: str) -> List[League]:
+    """League codes for a /matches query: a code, a sport key, or ALL"""
+    if league == 'ALL':
+        return [lg for lg in LEAGUES.values() if lg.default]
+    if league in ENGINES:
+        return list(ENGINES[league].leagues.values())
+    if league in LEAGUES:
+        return [LEAGUES[league]]
+    raise KeyError(league)
+
+
+register_engine(FOOTBALL)
+register_engine(BASKETBALL)
@@ -5,8 +5,9 @@ from collections import defaultdict
 class FeatureEngine:
     """Build predictive features from real match and team data"""
     
-    def __init__(self):
+    def __init__(self, odds_history=None):
         self.team_cache = {}
+        self.odds_history = odds_history  # backend.odds_history.OddsHistory, optional
         
     def compute_team_form(self, recent_matches: List[Dict], team_name: str, n=5) -> float:
         """Compute team form from last N matches (points per game)"""
@@ -91,13 +92,34 @@ class FeatureEngine:
         h2h = self.compute_head_to_head(h2h_data)
         features.update(h2h)
         
-        # Odds-implied probabilities if available
+        # Odds-implied probabilities if available; prefer the margin-free
+        # consensus from backend.odds over inverting a single price
         if odds_data:
-            features['market_prob_home'] = self._odds_to_prob(odds_data.get('home_odds', 2.0))
-            features['market_prob_away'] = self._odds_to_prob(odds_data.get('away_odds', 3.0))
+            features['market_prob_home'] = odds_data.get('market_prob_home') or self._odds_to_prob(odds_data.get('home_odds', 2.0))
+            features['market_prob_away'] = odds_data.get('market_prob_away') or self._odds_to_prob(odds_data.get('away_odds', 3.0))
+            if 'market_prob_draw' in odds_data:
+                features['market_prob_draw'] = odds_data['market_prob_draw']
+            if odds_data.get('odds_event_id'):
+                features.update(self.compute_line_movement(odds_data['odds_event_id'], home_team, away_team))
         
         return features
     
+    def compute_line_movement(self, event_id: str, home_team: str, away_team: str) -> Dict[str, float]:
+        """1X2 line movement from the odds history: consensus change since opening,
+        velocity per hour and net steam moves (+1 shortening, -1 drifting)"""
+        if self.odds_history is None:
+            return {}
+        movement = self.odds_history.line_movement(event_id, 'h2h')
+        features = {}
+        for side, name in (('home', home_team), ('draw', 'Draw'), ('away', away_team)):
+            outcome = movement['outcomes'].get(name)
+            if outcome:
+                features[f'line_move_{side}'] = outcome['change']
+                features[f'line_velocity_{side}'] = outcome['velocity']
+                features[f'steam_{side}'] = sum(1 if m['direction'] == 'shortening' else -1
+                                                for m in movement['steam_moves'] if m['outcome'] == name)
+        return features
+    
     def _odds_to_prob(self, odds: float) -> float:
         """Convert decimal odds to implied probability"""
         return 1.0 / max(odds, 1.01)
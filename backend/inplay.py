@@ -0,0 +1,465 @@
+"""In-play market probabilities from live match state.
+
+Every live match keeps its pre-match expected goals. A state update
+(minute, score, red cards) scales what is left of them to the remaining
+time, adjusts both sides for red cards, and re-prices the match's markets
+from the distribution of goals still to come shifted by the current score.
+
+Updates are applied to arrays of matches at once and recompute() only
+touches matches whose state changed, and only their markets that are still
+open. A market whose outcome can no longer change (over 1.5 once two goals
+are in, a correct score the score has passed, everything at full time) is
+settled: its probability is frozen and never recomputed.
+
+A side with more than FINAL_GOALS - REMAINING_GOALS goals is off the
+final-score grid: its match's open markets are marked unavailable the same
+way until full time settles them.
+
+HT/FT needs the half-time score: it comes with the state, from the state
+sent at half time, or from the last first-half state seen. A match first
+seen after the break without it has its HT/FT markets marked unavailable
+(probability NaN, frozen) until a state carries the half-time score.
+
+Finished matches are dropped by evict() once they have been over for a while.
+
+Feeds send absolute states rather than deltas, so applying the same update
+twice, or on another worker, is harmless. SimulatedFeed stands in for a
+real provider:
+
+    python -m backend.bench.inplay --matches 2000
+"""
+import time
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from backend import markets
+
+MATCH_MINUTES = 90
+HALF_MINUTES = 45
+RED_CARD_OWN = 0.67    # scoring-rate multiplier for a side, per red card it has
+RED_CARD_OPP = 1.25    # and for its opponent
+REMAINING_GOALS = 10   # grid of goals still to come
+FINAL_GOALS = 16       # grid of final scores; beyond FINAL_GOALS - REMAINING_GOALS goals open markets are unavailable
+TOTAL_LINES = (0.5, 1.5, 2.5, 3.5, 4.5)
+STATUSES = ('1H', 'HT', '2H', 'FT')
+FIRST_HALF, HALF_TIME, SECOND_HALF, FULL_TIME = range(len(STATUSES))
+
+
+@lru_cache(maxsize=None)
+def market_table(final_goals: int = FINAL_GOALS):
+    """In-play market names, their win/push weights over final scores (G*G, M) and
+    which markets are decided at each current score, shape (G, G, M).
+
+    A market is decided when its weights are the same at every score still
+    reachable (no fewer goals on either side): no future goal changes how it pays.
+    """
+    home, away = np.divmod(np.arange(final_goals * final_goals), final_goals)
+    diff, total = home - away, home + away
+    core = [('home_win', diff > 0), ('draw', diff == 0), ('away_win', diff < 0)]
+    for line in TOTAL_LINES:
+        core += [(f'over_{line:g}', total > line), (f'under_{line:g}', total < line)]
+    core += [('btts_yes', (home > 0) & (away > 0)), ('btts_no', (home == 0) | (away == 0))]
+
+    names, win, push = markets.full_time_table(final_goals)
+    names = [c[0] for c in core] + list(names)
+    win = np.hstack([np.stack([c[1] for c in core], axis=1).astype(float), win])
+    push = np.hstack([np.zeros((len(home), len(core))), push])
+
+    def reachable(weights, reduce):
+        # Fold over scores with at least as many goals on both sides
+        grid = weights.reshape(final_goals, final_goals, -1)[::-1, ::-1]
+        return reduce.accumulate(reduce.accumulate(grid, axis=0), axis=1)[::-1, ::-1]
+    fixed = ((reachable(win, np.minimum) == reachable(win, np.maximum))
+             & (reachable(push, np.minimum) == reachable(push, np.maximum)))
+    return names, win, push, fixed
+
+
+def htft_names() -> List[str]:
+    return [f'htft_{ht}/{ft}' for ht in markets.RESULTS for ft in markets.RESULTS]
+
+
+def _result(diff: np.ndarray) -> np.ndarray:
+    """0 = home ahead, 1 = level, 2 = away ahead"""
+    return 1 - np.sign(diff)
+
+
+class InPlayEngine:
+    """Live states and market probabilities of many matches, stored as arrays.
+
+    add_match() registers a match with its pre-match xG, update() / apply()
+    take live states and recompute() re-prices what changed since the last
+    call. snapshot() reads one match.
+    """
+
+    def __init__(self, capacity: int = 256, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self.names, self._win_weights, self._push_weights, self._fixed = market_table()
+        self.n_full_time = len(self.names)
+        self.names = self.names + htft_names()
+        self._can_push = np.flatnonzero(self._push_weights.any(axis=0))
+        self.index: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        n_markets = len(self.names)
+        fields = {
+            'xg': ((capacity, 2), float, 0.0),
+            'minute': ((capacity,), float, 0.0),
+            'status': ((capacity,), np.int8, FIRST_HALF),
+            'goals': ((capacity, 2), np.int64, 0),
+            'reds': ((capacity, 2), np.int64, 0),
+            'ht_goals': ((capacity, 2), np.int64, 0),
+            'ht_known': ((capacity,), bool, False),
+            'seen_first_half': ((capacity,), bool, False),
+            'finished_at': ((capacity,), float, 0.0),
+            'dirty': ((capacity,), bool, False),
+            'win': ((capacity, n_markets), float, 0.0),
+            'push': ((capacity, n_markets), float, 0.0),
+            'settled': ((capacity, n_markets), bool, False),
+        }
+        self._fills = {name: fill for name, (_shape, _dtype, fill) in fields.items()}
+        for name, (shape, dtype, fill) in fields.items():
+            array = np.full(shape, fill, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                array[:len(old)] = old
+            setattr(self, name, array)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, match_id: str) -> bool:
+        return match_id in self.index
+
+    def add_match(self, match_id: str, home_xg: float, away_xg: float) -> int:
+        """Start tracking a match at kick-off; its pre-match xG drives every later price"""
+        row = self.index.get(match_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.minute):
+                self._allocate(2 * row)
+            self.index[match_id] = row
+            self.ids.append(match_id)
+        self.xg[row] = (max(float(home_xg), 0.01), max(float(away_xg), 0.01))
+        self.dirty[row] = True
+        return row
+
+    def rows(self, match_ids: List[str]) -> np.ndarray:
+        try:
+            return np.fromiter((self.index[m] for m in match_ids), dtype=np.int64, count=len(match_ids))
+        except KeyError as e:
+            raise KeyError(f"Match not live: {e.args[0]}")
+
+    def update(self, rows: np.ndarray, minute: np.ndarray, goals: np.ndarray, reds: Optional[np.ndarray] = None,
+               status: Optional[np.ndarray] = None, ht_goals: Optional[np.ndarray] = None) -> None:
+        """Apply live states to many matches at once.
+
+        goals/reds/ht_goals have shape (k, 2); status indexes STATUSES and
+        defaults from the minute. Without ht_goals the half-time score is the
+        score at the HT update, or the last first-half one seen; a match first
+        seen after the break has none and its HT/FT markets are unavailable.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        minute = np.asarray(minute, dtype=float)
+        goals = np.asarray(goals, dtype=np.int64).reshape(-1, 2)
+        reds = self.reds[rows] if reds is None else np.asarray(reds, dtype=np.int64).reshape(-1, 2)
+        if status is None:
+            status = np.where(minute > HALF_MINUTES, SECOND_HALF, FIRST_HALF)
+        status = np.asarray(status, dtype=np.int8)
+        if (goals < 0).any() or (reds < 0).any() or (minute < 0).any():
+            raise ValueError("Minute, goals and red cards must be non-negative")
+
+        # The half-time score, once the first half is over, if it was observed
+        new_ht = ~self.ht_known[rows] & ((status == HALF_TIME)
+                                         | ((status > HALF_TIME) & self.seen_first_half[rows]))
+        reopen = np.zeros(len(rows), dtype=bool)
+        if ht_goals is not None:
+            ht_goals = np.asarray(ht_goals, dtype=np.int64).reshape(-1, 2)
+            given = ht_goals[:, 0] >= 0
+            # HT/FT marked unavailable gets priced again once the half-time score arrives
+            reopen = given & ~self.ht_known[rows]
+            self.ht_goals[rows[given]] = ht_goals[given]
+            self.ht_known[rows[given]] = True
+            new_ht &= ~given
+        ht_source = np.where((status == HALF_TIME)[:, None], goals, self.goals[rows])
+        self.ht_goals[rows[new_ht]] = ht_source[new_ht]
+        self.ht_known[rows[new_ht]] = True
+        self.seen_first_half[rows[status == FIRST_HALF]] = True
+
+        # A reversed goal (VAR) can reopen markets the score had settled
+        reverted = (goals < self.goals[rows]).any(axis=1)
+        self.settled[rows[reverted]] = False
+        self.settled[rows[reopen], self.n_full_time:] = False
+        ended = (status == FULL_TIME) & (self.status[rows] != FULL_TIME)
+        self.finished_at[rows[ended]] = self.clock()
+        scored = (goals != self.goals[rows]).any(axis=1) | (status != self.status[rows]) | new_ht | reopen
+        changed = scored | (minute != self.minute[rows]) | (reds != self.reds[rows]).any(axis=1)
+        self.minute[rows] = minute
+        self.status[rows] = status
+        self.goals[rows] = goals
+        self.reds[rows] = reds
+        self.dirty[rows[changed]] = True
+        if scored.any():
+            self._settle(np.unique(rows[scored]))
+
+    def apply(self, states: List[Dict[str, Any]]) -> None:
+        """Apply live-state dicts: match_id, minute, home_goals, away_goals and optionally
+        home_reds, away_reds, status (1H/HT/2H/FT), ht_home_goals, ht_away_goals"""
+        if not states:
+            return
+        rows = self.rows([s['match_id'] for s in states])
+        try:
+            minute = [float(s['minute']) for s in states]
+            goals = [(int(s['home_goals']), int(s['away_goals'])) for s in states]
+            reds = [(int(s.get('home_reds') or 0), int(s.get('away_reds') or 0)) for s in states]
+            status = [STATUSES.index(s['status']) if s.get('status') else
+                      (SECOND_HALF if float(s['minute']) > HALF_MINUTES else FIRST_HALF) for s in states]
+            ht_goals = [(int(s['ht_home_goals']), int(s['ht_away_goals'])) if s.get('ht_home_goals') is not None
+                        else (-1, -1) for s in states]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Invalid live state: {e}")
+        self.update(rows, minute, goals, reds, status, ht_goals)
+
+    def _settle(self, rows: np.ndarray) -> None:
+        """Freeze markets whose outcome the score (or the final whistle) has decided"""
+        n = self.n_full_time
+        cap = FINAL_GOALS - 1
+        home, away = np.minimum(self.goals[rows, 0], cap), np.minimum(self.goals[rows, 1], cap)
+        cells = home * FINAL_GOALS + away
+        finished = self.status[rows] == FULL_TIME
+        decided = self._fixed[home, away] | finished[:, None]
+        # Markets frozen as unavailable (NaN) are settled for real at full time
+        fresh = decided & (~self.settled[rows, :n] | np.isnan(self.win[rows, :n]))
+        r, c = np.nonzero(fresh)
+        self.win[rows[r], c] = self._win_weights[cells[r], c]
+        self.push[rows[r], c] = self._push_weights[cells[r], c]
+        self.settled[rows[r], c] = True
+
+        # A score past the grid's offset cannot be placed on the final-score grid:
+        # whatever is still open cannot be priced until full time
+        beyond = (self.goals[rows] > FINAL_GOALS - REMAINING_GOALS).any(axis=1) & ~finished
+        r, c = np.nonzero(beyond[:, None] & ~self.settled[rows])
+        self.win[rows[r], c] = np.nan
+        self.settled[rows[r], c] = True
+
+        # HT/FT: wrong half-time results are lost once it is known; all settle at full time.
+        # Past half time without the half-time score they cannot be priced or settled
+        known = self.ht_known[rows]
+        unknown = ~known & (self.status[rows] > HALF_TIME)
+        r, c = np.nonzero(unknown[:, None] & ~self.settled[rows, n:])
+        self.win[rows[r], n + c] = np.nan
+        self.settled[rows[r], n + c] = True
+        ht_result = _result(self.ht_goals[rows, 0] - self.ht_goals[rows, 1])
+        ft_result = _result(self.goals[rows, 0] - self.goals[rows, 1])
+        combo = np.arange(len(markets.RESULTS) ** 2)
+        lost = known[:, None] & (combo[None, :] // len(markets.RESULTS) != ht_result[:, None])
+        won = finished[:, None] & ~lost & (combo[None, :] % len(markets.RESULTS) == ft_result[:, None])
+        decided = (lost | finished[:, None]) & ~unknown[:, None]
+        fresh = decided & (~self.settled[rows, n:] | np.isnan(self.win[rows, n:]))
+        r, c = np.nonzero(fresh)
+        self.win[rows[r], n + c] = won[r, c]
+        self.settled[rows[r], n + c] = True
+
+    def evict(self, max_age: float) -> List[str]:
+        """Drop matches that finished more than max_age seconds ago; returns their ids"""
+        n = len(self.ids)
+        done = ((self.status[:n] == FULL_TIME) & self.settled[:n].all(axis=1)
+                & (self.finished_at[:n] <= self.clock() - max_age))
+        if not done.any():
+            return []
+        keep = np.flatnonzero(~done)
+        for name, fill in self._fills.items():
+            array = getattr(self, name)
+            array[:len(keep)] = array[keep]
+            array[len(keep):n] = fill
+        evicted = [self.ids[i] for i in np.flatnonzero(done).tolist()]
+        self.ids = [self.ids[i] for i in keep.tolist()]
+        self.index = {m: i for i, m in enumerate(self.ids)}
+        return evicted
+
+    def remaining_xg(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Expected goals still to come in each half, shape (k, 2) each: [home, away].
+
+        Each half gets its share of the pre-match xG (markets.FIRST_HALF_SHARE),
+        spread evenly over its minutes, then scaled for red cards.
+        """
+        minute, status = self.minute[rows], self.status[rows]
+        half = MATCH_MINUTES - HALF_MINUTES
+        first = np.where(status == FIRST_HALF, np.clip(HALF_MINUTES - minute, 0, HALF_MINUTES) / HALF_MINUTES, 0.0)
+        second = np.where(status <= HALF_TIME, 1.0,
+                          np.where(status == FULL_TIME, 0.0, np.clip(MATCH_MINUTES - minute, 0, half) / half))
+        reds = self.reds[rows]
+        xg = self.xg[rows] * RED_CARD_OWN ** reds * RED_CARD_OPP ** reds[:, ::-1]
+        return (xg * (markets.FIRST_HALF_SHARE * first)[:, None],
+                xg * ((1 - markets.FIRST_HALF_SHARE) * second)[:, None])
+
+    def recompute(self) -> int:
+        """Re-price the open markets of every match updated since the last call; returns how many"""
+        rows = np.flatnonzero(self.dirty[:len(self.ids)])
+        self.dirty[rows] = False
+        rows = rows[~self.settled[rows].all(axis=1)]
+        if not len(rows):
+            return 0
+        first, second = self.remaining_xg(rows)
+        left = first + second
+        grid = markets.score_matrix(left[:, 0], left[:, 1], REMAINING_GOALS)
+        grid /= grid.sum(axis=(1, 2), keepdims=True)
+
+        # Shift the goals still to come by the current score onto the final-score grid
+        k = len(rows)
+        offset = FINAL_GOALS - REMAINING_GOALS
+        home = np.minimum(self.goals[rows, 0], offset)
+        away = np.minimum(self.goals[rows, 1], offset)
+        goals = np.arange(REMAINING_GOALS)
+        final = np.zeros((k, FINAL_GOALS, FINAL_GOALS))
+        final[np.arange(k)[:, None, None], home[:, None, None] + goals[None, :, None],
+              away[:, None, None] + goals[None, None, :]] = grid
+        final = final.reshape(k, -1)
+
+        n = self.n_full_time
+        open_ = ~self.settled[rows]
+        cols = np.flatnonzero(open_[:, :n].any(axis=0))
+        if len(cols):
+            block = np.ix_(rows, cols)
+            self.win[block] = np.where(open_[:, cols], final @ self._win_weights[:, cols], self.win[block])
+            pcols = np.intersect1d(cols, self._can_push)
+            if len(pcols):
+                block = np.ix_(rows, pcols)
+                self.push[block] = np.where(open_[:, pcols], final @ self._push_weights[:, pcols], self.push[block])
+
+        htft = open_[:, n:].any(axis=1)
+        if htft.any():
+            self._recompute_htft(rows[htft], first[htft], second[htft], final[htft], open_[htft, n:])
+        return k
+
+    def _recompute_htft(self, rows, first, second, final, open_):
+        n = self.n_full_time
+        results = len(markets.RESULTS)
+        probs = np.zeros((len(rows), results ** 2))
+        known = self.ht_known[rows]
+
+        # Half-time result known: it fixes the first label, the full-time result the second
+        if known.any():
+            full_time = final[known] @ self._win_weights[:, :results]
+            ht = _result(self.ht_goals[rows[known], 0] - self.ht_goals[rows[known], 1])
+            probs[np.flatnonzero(known)[:, None], ht[:, None] * results + np.arange(results)] = full_time
+
+        # Still in the first half: combine what is left of each half's goal margin
+        todo = np.flatnonzero(~known)
+        if len(todo):
+            to_diff, _ = markets.htft_table(REMAINING_GOALS)
+            _, outcome = markets.htft_table(FINAL_GOALS)
+            size, small = outcome.shape[0], to_diff.shape[1]
+            margins = []
+            for lam, shift in ((first[todo], self.goals[rows[todo], 0] - self.goals[rows[todo], 1]),
+                               (second[todo], np.zeros(len(todo), dtype=np.int64))):
+                half = markets.score_matrix(lam[:, 0], lam[:, 1], REMAINING_GOALS).reshape(len(todo), -1) @ to_diff
+                half /= half.sum(axis=1, keepdims=True)
+                placed = np.zeros((len(todo), size))
+                start = (size - small) // 2 + np.clip(shift, -(size - small) // 2, (size - small) // 2)
+                placed[np.arange(len(todo))[:, None], start[:, None] + np.arange(small)] = half
+                margins.append(placed)
+            by_second = (margins[0] @ outcome.reshape(size, -1)).reshape(len(todo), size, -1)
+            probs[todo] = np.einsum('nj,njk->nk', margins[1], by_second)
+
+        block = np.ix_(rows, np.arange(n, n + results ** 2))
+        self.win[block] = np.where(open_, probs, self.win[block])
+
+    def state(self, match_id: str) -> Dict[str, Any]:
+        row = self.index[match_id]
+        state = {
+            'match_id': match_id,
+            'minute': float(self.minute[row]),
+            'status': STATUSES[self.status[row]],
+            'home_goals': int(self.goals[row, 0]),
+            'away_goals': int(self.goals[row, 1]),
+            'home_reds': int(self.reds[row, 0]),
+            'away_reds': int(self.reds[row, 1]),
+        }
+        if self.ht_known[row]:
+            state['ht_home_goals'], state['ht_away_goals'] = (int(g) for g in self.ht_goals[row])
+        return state
+
+    def snapshot(self, match_id: str) -> Optional[Dict[str, Any]]:
+        """Live state, xG still to come and every market's probability for one match"""
+        row = self.index.get(match_id)
+        if row is None:
+            return None
+        first, second = self.remaining_xg(np.array([row]))
+        left = (first + second)[0]
+        book = {}
+        for c, name in enumerate(self.names):
+            if np.isnan(self.win[row, c]):
+                book[name] = {'prob': None, 'settled': True, 'available': False}
+                continue
+            entry = {'prob': round(float(self.win[row, c]), 4), 'settled': bool(self.settled[row, c])}
+            if c in self._can_push:
+                entry['push'] = round(float(self.push[row, c]), 4)
+            book[name] = entry
+        return dict(self.state(match_id), home_xg_left=round(float(left[0]), 3),
+                    away_xg_left=round(float(left[1]), 3), markets=book)
+
+
+class SimulatedFeed:
+    """Local stand-in for a live-score provider: each poll plays one more minute of every match.
+
+    Goals arrive as Poisson events at each side's pre-match rate, adjusted
+    for red cards like InPlayEngine does; polls return absolute states.
+    """
+
+    def __init__(self, match_ids: List[str], home_xg, away_xg, red_cards_per_match: float = 0.15,
+                 seed: Optional[int] = None):
+        self.match_ids = list(match_ids)
+        self.xg = np.stack([np.asarray(home_xg, dtype=float), np.asarray(away_xg, dtype=float)], axis=1)
+        self.red_rate = red_cards_per_match / 2 / MATCH_MINUTES
+        self.rng = np.random.default_rng(seed)
+        self.minute = 0
+        self.goals = np.zeros((len(self.match_ids), 2), dtype=np.int64)
+        self.reds = np.zeros((len(self.match_ids), 2), dtype=np.int64)
+        self.ht_goals = None
+        self.status = FIRST_HALF
+
+    @property
+    def finished(self) -> bool:
+        return self.status == FULL_TIME
+
+    def step(self) -> Dict[str, np.ndarray]:
+        """Advance one minute (or through the break); returns the states as arrays"""
+        if self.status == FIRST_HALF and self.minute == HALF_MINUTES:
+            self.status = HALF_TIME
+            self.ht_goals = self.goals.copy()
+        elif self.status == HALF_TIME:
+            self.status = SECOND_HALF
+        elif self.status == SECOND_HALF and self.minute == MATCH_MINUTES:
+            self.status = FULL_TIME
+        elif not self.finished:
+            self.minute += 1
+            share = markets.FIRST_HALF_SHARE if self.minute <= HALF_MINUTES else 1 - markets.FIRST_HALF_SHARE
+            rate = self.xg * share / HALF_MINUTES * RED_CARD_OWN ** self.reds * RED_CARD_OPP ** self.reds[:, ::-1]
+            self.goals += self.rng.poisson(rate)
+            self.reds += self.rng.random(self.reds.shape) < self.red_rate
+        return {'minute': np.full(len(self.match_ids), float(self.minute)),
+                'status': np.full(len(self.match_ids), self.status, dtype=np.int8),
+                'goals': self.goals.copy(), 'reds': self.reds.copy()}
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """The next minute's states as feed messages (empty once every match is over)"""
+        if self.finished:
+            return []
+        arrays = self.step()
+        status = STATUSES[self.status]
+        return [{'match_id': m, 'minute': self.minute, 'status': status,
+                 'home_goals': int(g[0]), 'away_goals': int(g[1]), 'home_reds': int(r[0]), 'away_reds': int(r[1])}
+                for m, g, r in zip(self.match_ids, arrays['goals'].tolist(), arrays['reds'].tolist())]
+
+
+_engine = None
+
+
+def get_inplay_engine() -> InPlayEngine:
+    """Process-wide engine used by the API"""
+    global _engine
+    if _engine is None:
+        _engine = InPlayEngine()
+    return _engine
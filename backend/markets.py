@@ -0,0 +1,286 @@
+"""Vectorized market probabilities from expected goals.
+
+Every function takes arrays of home/away expected goals (one entry per
+match or per scenario) and evaluates all of them in one pass, using the same
+formulas as Predictor's scalar helpers.
+
+generate_markets() prices a full book of exotic markets (correct score,
+HT/FT, Asian handicap, team totals, winning margin, double chance) for many
+fixtures at once from each one's score distribution; top_k() picks the best
+of them by EV without sorting the whole book.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+MAX_GOALS = 10
+FIRST_HALF_SHARE = 0.45   # share of a team's expected goals scored before half time
+CORRECT_SCORE_MAX = 5     # correct scores up to 5-5 are quoted, the rest is "other"
+AH_LINES = np.arange(-3.0, 3.01, 0.25)
+TEAM_TOTAL_LINES = (0.5, 1.5, 2.5, 3.5)
+RESULTS = ('H', 'D', 'A')
+
+
+def poisson_pmf(lam: np.ndarray, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """P(k goals) for k < max_goals, shape (n, max_goals)"""
+    lam = np.maximum(np.asarray(lam, dtype=float), 1e-9)
+    k = np.arange(max_goals)
+    log_fact = np.cumsum(np.log(np.maximum(k, 1)))
+    return np.exp(k * np.log(lam[:, None]) - lam[:, None] - log_fact)
+
+
+def score_matrix(home_xg: np.ndarray, away_xg: np.ndarray, max_goals: int = MAX_GOALS) -> np.ndarray:
+    """Independent-Poisson scoreline probabilities, shape (n, home goals, away goals)"""
+    return poisson_pmf(home_xg, max_goals)[:, :, None] * poisson_pmf(away_xg, max_goals)[:, None, :]
+
+
+def core_market_probs(home_xg, away_xg, home_cs=0.3, away_cs=0.3) -> Dict[str, np.ndarray]:
+    """Uncalibrated 1X2, total goals and BTTS probabilities.
+
+    Matches Predictor: the 1X2 outcomes are clamped to [0.01, 0.95] and
+    renormalized, totals use a Poisson on the combined xG, and BTTS is
+    damped by each side's clean-sheet rate.
+    """
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    grid = score_matrix(home_xg, away_xg)
+    home_win = np.tril(grid, -1).sum(axis=(1, 2))
+    away_win = np.triu(grid, 1).sum(axis=(1, 2))
+    draw = np.trace(grid, axis1=1, axis2=2)
+    result = np.clip(np.stack([home_win, draw, away_win]), 0.01, 0.95)
+    result /= result.sum(axis=0)
+
+    totals_cdf = poisson_pmf(home_xg + away_xg, 4).cumsum(axis=1)
+    btts = (1 - np.exp(-home_xg)) * (1 - np.exp(-away_xg))
+    btts = btts * (1 - np.asarray(home_cs, dtype=float) * 0.3) * (1 - np.asarray(away_cs, dtype=float) * 0.3)
+
+    return {
+        'home_win': result[0],
+        'draw': result[1],
+        'away_win': result[2],
+        'over_1.5': 1.0 - totals_cdf[:, 1],
+        'over_2.5': 1.0 - totals_cdf[:, 2],
+        'under_2.5': totals_cdf[:, 2],
+        'over_3.5': 1.0 - totals_cdf[:, 3],
+        'btts_yes': btts,
+        'btts_no': 1.0 - btts,
+    }
+
+
+@dataclass(frozen=True)
+class MarketBook:
+    """Every exotic market of n fixtures.
+
+    `win` and `push` have shape (n, len(names)): the probability a bet wins
+    and the probability its stake is returned (Asian handicaps on whole and
+    quarter lines). A quarter line is half the stake on each neighbouring
+    line, so both hold the stake-weighted average of the two.
+    """
+    names: List[str]
+    win: np.ndarray
+    push: np.ndarray
+
+    def index(self, name: str) -> int:
+        return _market_index(tuple(self.names))[name]
+
+    def fair_odds(self) -> np.ndarray:
+        """Decimal price at which each bet has zero EV"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (1.0 - self.push) / self.win
+
+    def expected_value(self, odds: np.ndarray) -> np.ndarray:
+        """EV per unit staked at the given prices; NaN where there is no price"""
+        return self.win * odds + self.push - 1.0
+
+
+@lru_cache(maxsize=None)
+def _market_index(names: Tuple[str, ...]) -> Dict[str, int]:
+    return {name: i for i, name in enumerate(names)}
+
+
+def _handicap(margin: np.ndarray, line: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Win/push weights of a handicap bet given the backed side's goal margin"""
+    parts = (line - 0.25, line + 0.25) if (line * 4) % 2 else (line,)
+    win = sum((margin + p > 0) for p in parts) / len(parts)
+    push = sum((margin + p == 0) for p in parts) / len(parts)
+    return win, push
+
+
+@lru_cache(maxsize=None)
+def full_time_table(max_goals: int) -> Tuple[Tuple[str, ...], np.ndarray, np.ndarray]:
+    """Market names and their win/push weights over the flattened score grid, shape (G*G, M)"""
+    home, away = np.divmod(np.arange(max_goals * max_goals), max_goals)
+    diff = home - away
+    columns = []
+
+    quoted = (home <= CORRECT_SCORE_MAX) & (away <= CORRECT_SCORE_MAX)
+    for h in range(CORRECT_SCORE_MAX + 1):
+        for a in range(CORRECT_SCORE_MAX + 1):
+            columns.append((f'cs_{h}-{a}', (home == h) & (away == a), None))
+    columns.append(('cs_other', ~quoted, None))
+
+    for line in AH_LINES:
+        columns.append((f'ah_home_{line:+g}',) + _handicap(diff, line))
+    for line in AH_LINES:
+        columns.append((f'ah_away_{line:+g}',) + _handicap(-diff, line))
+
+    for side, goals in (('home', home), ('away', away)):
+        for line in TEAM_TOTAL_LINES:
+            columns.append((f'{side}_over_{line:g}', goals > line, None))
+            columns.append((f'{side}_under_{line:g}', goals < line, None))
+
+    for side, sign in (('home', 1), ('away', -1)):
+        for margin in (1, 2):
+            columns.append((f'margin_{side}_{margin}', sign * diff == margin, None))
+        columns.append((f'margin_{side}_3+', sign * diff >= 3, None))
+    columns.append(('margin_draw', diff == 0, None))
+
+    columns.append(('dc_1X', diff >= 0, None))
+    columns.append(('dc_X2', diff <= 0, None))
+    columns.append(('dc_12', diff != 0, None))
+
+    names = tuple(c[0] for c in columns)
+    win = np.stack([c[1] for c in columns], axis=1).astype(float)
+    push = np.stack([np.zeros(len(diff)) if c[2] is None else c[2] for c in columns], axis=1).astype(float)
+    return names, win, push
+
+
+@lru_cache(maxsize=None)
+def htft_table(max_goals: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Score grid -> goal-difference map, and (half-time diff, second-half diff) -> HT/FT outcome"""
+    size = 2 * max_goals - 1
+    home, away = np.divmod(np.arange(max_goals * max_goals), max_goals)
+    to_diff = np.zeros((max_goals * max_goals, size))
+    to_diff[np.arange(max_goals * max_goals), home - away + max_goals - 1] = 1.0
+
+    diffs = np.arange(size) - (max_goals - 1)
+    half_time = 1 - np.sign(diffs)                            # 0 = H, 1 = D, 2 = A
+    full_time = 1 - np.sign(diffs[:, None] + diffs[None, :])
+    outcome = np.zeros((size, size, len(RESULTS) ** 2))
+    i, j = np.indices((size, size))
+    outcome[i, j, half_time[i] * len(RESULTS) + full_time] = 1.0
+    return to_diff, outcome
+
+
+def htft_probs(home_xg, away_xg, first_half_share: float = FIRST_HALF_SHARE,
+               max_goals: int = MAX_GOALS) -> np.ndarray:
+    """Half-time/full-time probabilities, shape (n, 9) ordered H/H, H/D, ..., A/A.
+
+    Each half is an independent Poisson on its share of the expected goals,
+    so the two halves add up to the full-time distribution.
+    """
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    to_diff, outcome = htft_table(max_goals)
+    halves = []
+    for share in (first_half_share, 1.0 - first_half_share):
+        grid = score_matrix(home_xg * share, away_xg * share, max_goals)
+        halves.append(grid.reshape(len(grid), -1) @ to_diff)
+    first, second = halves
+    size = first.shape[1]
+    # Contract the first half's margin, then the second's: (n, D) @ (D, D*9) -> (n, D, 9)
+    by_second = (first @ outcome.reshape(size, -1)).reshape(len(first), size, -1)
+    return np.einsum('nj,njk->nk', second, by_second)
+
+
+def generate_markets(home_xg, away_xg, first_half_share: float = FIRST_HALF_SHARE,
+                     max_goals: int = MAX_GOALS) -> MarketBook:
+    """Price every exotic market of every fixture in one pass over their score grids"""
+    home_xg = np.atleast_1d(np.asarray(home_xg, dtype=float))
+    away_xg = np.atleast_1d(np.asarray(away_xg, dtype=float))
+    names, win_weights, push_weights = full_time_table(max_goals)
+    grid = score_matrix(home_xg, away_xg, max_goals).reshape(len(home_xg), -1)
+    # Mass beyond the grid is negligible at realistic xG; renormalize so books sum to 1
+    grid /= grid.sum(axis=1, keepdims=True)
+    htft = htft_probs(home_xg, away_xg, first_half_share, max_goals)
+    htft /= htft.sum(axis=1, keepdims=True)
+    return MarketBook(
+        names=list(names) + [f'htft_{ht}/{ft}' for ht in RESULTS for ft in RESULTS],
+        win=np.hstack([grid @ win_weights, htft]),
+        push=np.hstack([grid @ push_weights, np.zeros_like(htft)]),
+    )
+
+
+def market_label(name: str, home: str = 'Home', away: str = 'Away') -> str:
+    """Readable description of a generate_markets market name"""
+    team = {'home': home, 'away': away, 'H': home, 'D': 'Draw', 'A': away}
+    kind, _, rest = name.partition('_')
+    if kind == 'cs':
+        return 'Correct score: other' if rest == 'other' else f'Correct score {rest}'
+    if kind == 'ah':
+        side, line = rest.split('_')
+        return f'{team[side]} {line} (Asian handicap)'
+    if kind in ('home', 'away'):
+        direction, line = rest.split('_')
+        return f'{team[kind]} {direction.capitalize()} {line} Goals'
+    if kind == 'margin':
+        if rest == 'draw':
+            return 'Draw (winning margin)'
+        side, goals = rest.split('_')
+        return f'{team[side]} to win by {goals}'
+    if kind == 'dc':
+        return 'Double chance ' + {'1X': f'{home} or Draw', 'X2': f'Draw or {away}', '12': f'{home} or {away}'}[rest]
+    if kind == 'htft':
+        ht, ft = rest.split('/')
+        return f'HT/FT {team[ht]} / {team[ft]}'
+    return name
+
+
+def top_k(values: np.ndarray, k: int) -> Tuple[np.ndarray, ...]:
+    """Indices of the k largest entries, largest first; NaN ranks last.
+
+    np.argpartition finds them in linear time and only those k are sorted,
+    so picking the best bets of a whole slate never sorts the full book.
+    """
+    values = np.where(np.isnan(values), -np.inf, values)
+    flat = values.ravel()
+    k = min(k, flat.size)
+    if k <= 0:
+        return np.unravel_index(np.array([], dtype=np.int64), values.shape)
+    best = np.argpartition(-flat, k - 1)[:k]
+    best = best[np.argsort(-flat[best], kind='stable')]
+    return np.unravel_index(best, values.shape)
+
+
+def top_k_per_row(values: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest entries of each row, largest first; NaN ranks last"""
+    values = np.where(np.isnan(values), -np.inf, values)
+    k = min(k, values.shape[1])
+    if k <= 0:
+        return np.zeros((len(values), 0), dtype=np.int64)
+    best = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(values, best, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(best, order, axis=1)
+
+
+def odds_data_prices(odds_data: Dict, book: Optional[MarketBook] = None) -> Dict[str, float]:
+    """Prices in an odds_data dict (backend.odds.to_odds_data) for generate_markets names.
+
+    With a book, prices for markets it does not carry (a spread line beyond
+    AH_LINES) are dropped rather than left for price_matrix to reject.
+    """
+    prices = {}
+    line = odds_data.get('home_spread_line')
+    if line is not None and (line * 4) == int(line * 4):
+        if odds_data.get('home_spread_odds'):
+            prices[f'ah_home_{line:+g}'] = odds_data['home_spread_odds']
+        if odds_data.get('away_spread_odds'):
+            prices[f'ah_away_{-line:+g}'] = odds_data['away_spread_odds']
+    if book is not None:
+        index = _market_index(tuple(book.names))
+        prices = {market: price for market, price in prices.items() if market in index}
+    return prices
+
+
+def price_matrix(book: MarketBook, prices: List[Optional[Dict[str, float]]]) -> np.ndarray:
+    """(n, markets) decimal odds from one {market: price} dict per fixture, NaN where unpriced"""
+    odds = np.full(book.win.shape, np.nan)
+    index = _market_index(tuple(book.names))
+    for row, fixture_prices in enumerate(prices):
+        for market, price in (fixture_prices or {}).items():
+            if market not in index:
+                raise ValueError(f"Unknown market: {market}")
+            if price and price > 1.0:
+                odds[row, index[market]] = float(price)
+    return odds
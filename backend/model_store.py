@@ -0,0 +1,87 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
+MATCH_MODEL = 'match_result'  # 1X2 classifier produced by backend.train
+CALIBRATION_PATH = os.path.join(MODEL_DIR, 'calibration.json')  # written by backend.calibration
+
+
+class ModelStore:
+    """Versioned on-disk model artifacts.
+
+    Layout: <root>/<name>/v0001.joblib + v0001.json (metadata), and a LATEST
+    file holding the current version number. Artifacts are written to a temp
+    file and renamed into place, and LATEST is only advanced afterwards, so a
+    reader never sees a half-written model.
+    """
+
+    def __init__(self, root: str = MODEL_DIR):
+        self.root = root
+
+    def _dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _artifact(self, name: str, version: int, ext: str) -> str:
+        return os.path.join(self._dir(name), f'v{version:04d}.{ext}')
+
+    def versions(self, name: str) -> List[int]:
+        """All saved versions of a model, oldest first"""
+        if not os.path.isdir(self._dir(name)):
+            return []
+        found = []
+        for fname in os.listdir(self._dir(name)):
+            if fname.startswith('v') and fname.endswith('.joblib'):
+                try:
+                    found.append(int(fname[1:-len('.joblib')]))
+                except ValueError:
+                    continue
+        return sorted(found)
+
+    def latest_version(self, name: str) -> Optional[int]:
+        """Version the LATEST pointer refers to, or None if nothing is saved"""
+        try:
+            with open(os.path.join(self._dir(name), 'LATEST')) as f:
+                return int(f.read().strip())
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name: str, model: Any, metadata: Dict[str, Any]) -> int:
+        """Persist a new version and make it the latest one"""
+        import joblib
+        os.makedirs(self._dir(name), exist_ok=True)
+        existing = self.versions(name)
+        version = (existing[-1] + 1) if existing else 1
+
+        metadata = dict(metadata, version=version)
+        self._write_atomic(self._artifact(name, version, 'joblib'), lambda path: joblib.dump(model, path))
+        self._write_atomic(self._artifact(name, version, 'json'),
+                           lambda path: _write_text(path, json.dumps(metadata, indent=2, default=str)))
+        self._write_atomic(os.path.join(self._dir(name), 'LATEST'), lambda path: _write_text(path, str(version)))
+        return version
+
+    def load(self, name: str, version: Optional[int] = None) -> Tuple[Any, Dict[str, Any]]:
+        """Load (model, metadata) for a version, defaulting to the latest"""
+        import joblib
+        if version is None:
+            version = self.latest_version(name)
+        if version is None:
+            raise FileNotFoundError(f"No saved versions of model '{name}' in {self.root}")
+        model = joblib.load(self._artifact(name, version, 'joblib'))
+        metadata = {}
+        meta_path = self._artifact(name, version, 'json')
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                metadata = json.load(f)
+        return model, metadata
+
+    @staticmethod
+    def _write_atomic(path: str, write) -> None:
+        tmp_path = f'{path}.tmp-{os.getpid()}'
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _write_text(path: str, text: str) -> None:
+    with open(path, 'w') as f:
+        f.write(text)
@@ -0,0 +1,201 @@
+"""Market-implied probabilities from a full OddsAPI.get_odds payload.
+
+Every price of every bookmaker, event and market is flattened into one set of
+arrays. The bookmaker margin is removed per (event, bookmaker, market, line)
+book, either multiplicatively or with Shin's method, and the fair
+probabilities are averaged across bookmakers into a consensus price. The best
+available price per outcome is tracked alongside, which is what EV should be
+computed against.
+"""
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+METHODS = ('multiplicative', 'shin')
+
+
+def _flatten(payload: List[Dict[str, Any]]):
+    # dict.setdefault(key, len(d)) interns a key to a consecutive id in one call
+    books, outcomes, bookmaker_names = {}, {}, {}
+    book_id, outcome_id, bookmaker_id = books.setdefault, outcomes.setdefault, bookmaker_names.setdefault
+    book_ids, outcome_ids, bookmaker_ids, prices = [], [], [], []
+    add_book, add_outcome, add_bookmaker, add_price = (
+        book_ids.append, outcome_ids.append, bookmaker_ids.append, prices.append)
+
+    for event_idx, event in enumerate(payload):
+        for bookmaker in event.get('bookmakers') or ():
+            bm = bookmaker_id(bookmaker.get('key') or bookmaker.get('title', ''), len(bookmaker_names))
+            for market in bookmaker.get('markets') or ():
+                mkey = market.get('key')
+                spreads = mkey == 'spreads'
+                for o in market.get('outcomes') or ():
+                    price = o.get('price')
+                    if not price or price <= 1.0:
+                        continue
+                    point = o.get('point')
+                    # Spread outcomes carry +/-x of the same line
+                    line = abs(point) if (spreads and point is not None) else point
+                    add_book(book_id((event_idx, bm, mkey, line), len(books)))
+                    add_outcome(outcome_id((event_idx, mkey, line, o.get('name'), point), len(outcomes)))
+                    add_bookmaker(bm)
+                    add_price(price)
+
+    return (
+        np.asarray(book_ids, dtype=np.int64),
+        np.asarray(outcome_ids, dtype=np.int64),
+        np.asarray(bookmaker_ids, dtype=np.int64),
+        np.asarray(prices, dtype=float),
+        list(outcomes),
+        list(bookmaker_names),
+        len(books),
+    )
+
+
+def remove_margin(implied: np.ndarray, book_ids: np.ndarray, n_books: int, method: str = 'multiplicative',
+                  iterations: int = 30) -> np.ndarray:
+    """Fair probabilities for many books at once.
+
+    `implied` holds 1/price for every outcome and `book_ids` says which book
+    (a set of mutually exclusive outcomes from one bookmaker) it belongs to.
+    Shin's insider-trading model is solved for every book simultaneously by
+    bisection on z, which shifts more margin onto longshots than the
+    multiplicative method does.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown margin method: {method}")
+    booksum = np.bincount(book_ids, weights=implied, minlength=n_books)
+    if method == 'multiplicative':
+        return implied / booksum[book_ids]
+
+    q2 = implied ** 2 / booksum[book_ids]
+    lo = np.zeros(n_books)
+    hi = np.full(n_books, 0.5)
+    for _ in range(iterations):
+        z = (lo + hi) / 2
+        zb = z[book_ids]
+        probs = (np.sqrt(zb ** 2 + 4 * (1 - zb) * q2) - zb) / (2 * (1 - zb))
+        too_big = np.bincount(book_ids, weights=probs, minlength=n_books) > 1.0
+        lo = np.where(too_big, z, lo)
+        hi = np.where(too_big, hi, z)
+    zb = ((lo + hi) / 2)[book_ids]
+    probs = (np.sqrt(zb ** 2 + 4 * (1 - zb) * q2) - zb) / (2 * (1 - zb))
+    # Books priced at or under 100% have nothing to remove
+    return np.where(booksum[book_ids] > 1.0, probs, implied / booksum[book_ids])
+
+
+def process_odds(payload: List[Dict[str, Any]], method: str = 'multiplicative') -> Dict[str, Dict[str, Any]]:
+    """Consensus fair prices and best available prices for every event.
+
+    Returns {event_id: {home_team, away_team, sport_key, commence_time,
+    markets: {market_key: [outcome dicts]}}} where each outcome dict has name,
+    point, fair_prob, fair_price, best_price, best_bookmaker, margin and
+    n_books.
+    """
+    book_ids, outcome_ids, bookmaker_ids, prices, outcome_keys, bookmaker_names, n_books = _flatten(payload)
+    summaries = {}
+    for event in payload:
+        summaries[str(event.get('id'))] = {
+            'home_team': event.get('home_team'),
+            'away_team': event.get('away_team'),
+            'sport_key': event.get('sport_key'),
+            'commence_time': event.get('commence_time'),
+            'markets': {},
+        }
+    if prices.size == 0:
+        return summaries
+
+    implied = 1.0 / prices
+    fair = remove_margin(implied, book_ids, n_books, method)
+    margin = np.bincount(book_ids, weights=implied, minlength=n_books) - 1.0
+
+    n_outcomes = len(outcome_keys)
+    counts = np.bincount(outcome_ids, minlength=n_outcomes)
+    fair_prob = np.bincount(outcome_ids, weights=fair, minlength=n_outcomes) / counts
+    avg_margin = np.bincount(outcome_ids, weights=margin[book_ids], minlength=n_outcomes) / counts
+
+    # Best price per outcome: sort by (outcome, price) and take each group's last row
+    order = np.lexsort((prices, outcome_ids))
+    last = np.r_[outcome_ids[order][1:] != outcome_ids[order][:-1], True]
+    best_rows = order[last]
+    best_price = np.empty(n_outcomes)
+    best_price[outcome_ids[best_rows]] = prices[best_rows]
+    best_book = np.empty(n_outcomes, dtype=np.int64)
+    best_book[outcome_ids[best_rows]] = bookmaker_ids[best_rows]
+
+    for i, (event_idx, mkey, _line, name, point) in enumerate(outcome_keys):
+        event_id = str(payload[event_idx].get('id'))
+        summaries[event_id]['markets'].setdefault(mkey, []).append({
+            'name': name,
+            'point': point,
+            'fair_prob': round(float(fair_prob[i]), 4),
+            'fair_price': round(float(1.0 / fair_prob[i]), 3),
+            'best_price': float(best_price[i]),
+            'best_bookmaker': bookmaker_names[best_book[i]],
+            'margin': round(float(avg_margin[i]), 4),
+            'n_books': int(counts[i]),
+        })
+    return summaries
+
+
+def _find(outcomes: List[Dict], name: str, point: Optional[float] = None) -> Optional[Dict]:
+    for o in outcomes:
+        if o['name'] == name and (point is None or o['point'] == point):
+            return o
+    return None
+
+
+def to_odds_data(summary: Dict[str, Any]) -> Dict[str, float]:
+    """Flatten one event summary into the odds_data keys Predictor understands.
+
+    Prices are the best available ones (what a bettor can actually take);
+    consensus fair probabilities are included as market_prob_* features.
+    """
+    odds_data = {}
+    h2h = summary['markets'].get('h2h', [])
+    for label, name in (('home', summary.get('home_team')), ('away', summary.get('away_team')), ('draw', 'Draw')):
+        o = _find(h2h, name)
+        if o:
+            odds_data[f'{label}_odds'] = o['best_price']
+            odds_data[f'market_prob_{label}'] = o['fair_prob']
+
+    totals = summary['markets'].get('totals', [])
+    for line in (1.5, 2.5, 3.5):
+        for side in ('Over', 'Under'):
+            o = _find(totals, side, line)
+            if o:
+                odds_data[f'{side.lower()}_{line}_goals'] = o['best_price']
+                odds_data[f'market_prob_{side.lower()}_{line}'] = o['fair_prob']
+
+    # Most widely offered total and home spread, for sports with moving lines
+    overs = [o for o in totals if o['name'] == 'Over' and o['point'] is not None]
+    if overs:
+        main = max(overs, key=lambda o: o['n_books'])
+        under = _find(totals, 'Under', main['point'])
+        odds_data['total_line'] = main['point']
+        odds_data['over_total_odds'] = main['best_price']
+        odds_data['market_prob_over_total'] = main['fair_prob']
+        if under:
+            odds_data['under_total_odds'] = under['best_price']
+            odds_data['market_prob_under_total'] = under['fair_prob']
+
+    spreads = summary['markets'].get('spreads', [])
+    home_spreads = [o for o in spreads if o['name'] == summary.get('home_team') and o['point'] is not None]
+    if home_spreads:
+        main = max(home_spreads, key=lambda o: o['n_books'])
+        away = _find(spreads, summary.get('away_team'), -main['point'])
+        odds_data['home_spread_line'] = main['point']
+        odds_data['home_spread_odds'] = main['best_price']
+        odds_data['market_prob_home_spread'] = main['fair_prob']
+        if away:
+            odds_data['away_spread_odds'] = away['best_price']
+            odds_data['market_prob_away_spread'] = away['fair_prob']
+    return odds_data
+
+
+def match_prices(summary: Dict[str, Any]) -> Dict[str, float]:
+    """Best 1X2 prices keyed Home/Draw/Away, as shown in the match list"""
+    odds_data = to_odds_data(summary)
+    prices = {}
+    for label, key in (('Home', 'home_odds'), ('Draw', 'draw_odds'), ('Away', 'away_odds')):
+        if key in odds_data:
+            prices[label] = odds_data[key]
+    return prices
@@ -0,0 +1,397 @@
+"""Append-only store of every odds snapshot, for line-movement features.
+
+Each price becomes an 18-byte tick (time, event, outcome, bookmaker, price)
+appended to a per-UTC-day partition file, so a season is a few hundred small
+binary files that numpy reads straight into arrays. Only price changes are
+written: the last price of every (event, outcome, bookmaker) is tracked in
+sorted arrays and unchanged quotes from repeated polling are dropped. Ticks
+are buffered and flushed in blocks, and partitions older than a few days
+are downsampled to one tick per key per hour, so neither memory nor disk
+grows with polling frequency.
+
+Events, outcomes and bookmakers are interned to integer ids kept, together
+with the partitions each event appears in, in symbols.json next to the
+partitions. Several processes may write and read one store: writes hold an
+exclusive lock on the directory's lock file, pick up symbols other writers
+added (symbols.json changed on disk) before interning, and save new symbols
+before letting go, so ids never collide. Readers reload symbols.json
+whenever it changed. Each process tracks last prices on its own, so a quote
+another writer already stored may at worst be written once more.
+"""
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from backend.odds import _flatten
+
+ODDS_HISTORY_DIR = os.getenv('ODDS_HISTORY_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'odds_history'))
+
+TICK_DTYPE = np.dtype([('ts', '<u4'), ('event', '<u4'), ('outcome', '<u4'), ('bookmaker', '<u2'), ('price', '<f4')])
+FLUSH_ROWS = 50_000           # buffered ticks before writing to disk
+FLUSH_SECONDS = 300           # ... or seconds since the last flush
+MAX_TRACKED_KEYS = 2_000_000  # last-price entries kept for change detection
+DOWNSAMPLE_AFTER_DAYS = 3     # older partitions keep one tick per key per bucket
+DOWNSAMPLE_SECONDS = 3600
+
+VELOCITY_WINDOW = 6 * 3600    # seconds over which velocity is measured
+STEAM_WINDOW = 600            # bookmakers moving together within this many seconds ...
+STEAM_MIN_BOOKS = 3           # ... at least this many of them ...
+STEAM_MIN_MOVE = 0.015        # ... each by this much implied probability, is a steam move
+
+
+def _day(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime('%Y-%m-%d')
+
+
+def _timestamp(now) -> float:
+    if now is None:
+        return time.time()
+    return now.timestamp() if isinstance(now, datetime) else float(now)
+
+
+def _last_per_group(group: np.ndarray, ts: np.ndarray) -> np.ndarray:
+    """Row index of the latest tick of every group present"""
+    order = np.lexsort((ts, group))
+    last = np.r_[group[order][1:] != group[order][:-1], True]
+    return order[last]
+
+
+class OddsHistory:
+    """Time-partitioned tick store for odds snapshots"""
+
+    def __init__(self, root: str = ODDS_HISTORY_DIR, flush_rows: int = FLUSH_ROWS,
+                 flush_seconds: float = FLUSH_SECONDS, max_tracked_keys: int = MAX_TRACKED_KEYS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.max_tracked_keys = max_tracked_keys
+        self._lock = threading.RLock()
+        self._buffer: List[np.ndarray] = []
+        self._buffered = 0
+        self._last_flush = time.time()
+        # Sorted packed (event, outcome, bookmaker) keys with their last price and time
+        self._last_keys = np.zeros(0, dtype=np.int64)
+        self._last_prices = np.zeros(0, dtype=np.float32)
+        self._last_ts = np.zeros(0, dtype=np.uint32)
+        self._symbols_version = None
+        self._lock_file = None
+        self._lock_depth = 0
+        self._load_symbols()
+
+    # -- symbols -------------------------------------------------------------
+
+    def _symbols_path(self) -> str:
+        return os.path.join(self.root, 'symbols.json')
+
+    def _disk_version(self):
+        try:
+            st = os.stat(self._symbols_path())
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _load_symbols(self):
+        data = {}
+        version = self._disk_version()
+        if version is not None:
+            with open(self._symbols_path()) as f:
+                data = json.load(f)
+        self._symbols_version = version
+        self.events: List[str] = data.get('events', [])
+        self.outcomes: List[list] = data.get('outcomes', [])  # [market, name, point]
+        self.bookmakers: List[str] = data.get('bookmakers', [])
+        self.event_partitions: Dict[str, List[str]] = data.get('event_partitions', {})
+        self.downsampled: Dict[str, int] = data.get('downsampled', {})
+        self._event_ids = {e: i for i, e in enumerate(self.events)}
+        self._outcome_ids = {tuple(o): i for i, o in enumerate(self.outcomes)}
+        self._bookmaker_ids = {b: i for i, b in enumerate(self.bookmakers)}
+
+    def _save_symbols(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self._symbols_path() + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'events': self.events, 'outcomes': self.outcomes, 'bookmakers': self.bookmakers,
+                       'event_partitions': self.event_partitions, 'downsampled': self.downsampled}, f)
+        os.replace(tmp, self._symbols_path())
+        self._symbols_version = self._disk_version()
+
+    def _refresh_symbols(self):
+        """Reload symbols.json if another process rewrote it"""
+        with self._lock:
+            if self._disk_version() != self._symbols_version:
+                self._load_symbols()
+
+    @contextmanager
+    def _writing(self):
+        """Exclusive access to the store across threads and processes, with current symbols"""
+        with self._lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.root, exist_ok=True)
+                self._lock_file = open(os.path.join(self.root, '.lock'), 'w')
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+                self._refresh_symbols()
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def _intern(self, table: list, ids: dict, key) -> int:
+        i = ids.get(key)
+        if i is None:
+            i = ids[key] = len(table)
+            table.append(list(key) if isinstance(key, tuple) else key)
+        return i
+
+    # -- ingestion -----------------------------------------------------------
+
+    def ingest(self, payload: List[Dict[str, Any]], now=None) -> int:
+        """Record one OddsAPI.get_odds snapshot; returns how many ticks changed"""
+        ts = _timestamp(now)
+        _book_ids, outcome_idx, bookmaker_idx, prices, outcome_keys, bookmaker_names, _n = _flatten(payload)
+        if prices.size == 0:
+            return 0
+        with self._writing():
+            # Map the payload's local ids onto the store's symbols
+            n_symbols = len(self.events) + len(self.outcomes) + len(self.bookmakers)
+            event_of = np.empty(len(outcome_keys), dtype=np.int64)
+            outcome_of = np.empty(len(outcome_keys), dtype=np.int64)
+            for i, (event_idx, mkey, _line, name, point) in enumerate(outcome_keys):
+                event_of[i] = self._intern(self.events, self._event_ids, str(payload[event_idx].get('id')))
+                outcome_of[i] = self._intern(self.outcomes, self._outcome_ids, (mkey, name, point))
+            bookmaker_of = np.array([self._intern(self.bookmakers, self._bookmaker_ids, b) for b in bookmaker_names],
+                                    dtype=np.int64)
+
+            ticks = np.empty(prices.size, dtype=TICK_DTYPE)
+            ticks['ts'] = int(ts)
+            ticks['event'] = event_of[outcome_idx]
+            ticks['outcome'] = outcome_of[outcome_idx]
+            ticks['bookmaker'] = bookmaker_of[bookmaker_idx]
+            ticks['price'] = prices
+            ticks = ticks[self._changed(ticks)]
+            if ticks.size:
+                self._buffer.append(ticks)
+                self._buffered += ticks.size
+            if self._buffered >= self.flush_rows or ts - self._last_flush >= self.flush_seconds:
+                self.flush(now=ts)
+            elif len(self.events) + len(self.outcomes) + len(self.bookmakers) > n_symbols:
+                # Buffered ticks refer to these ids: claim them before other writers intern theirs
+                self._save_symbols()
+            return int(ticks.size)
+
+    def _changed(self, ticks: np.ndarray) -> np.ndarray:
+        """Mask of ticks whose price differs from the last one seen, updating the tracker"""
+        keys = (ticks['event'].astype(np.int64) << 40) | (ticks['outcome'].astype(np.int64) << 16) | ticks['bookmaker']
+        # The same key twice in one snapshot: keep its last quote
+        keys, first = np.unique(keys[::-1], return_index=True)
+        rows = ticks.size - 1 - first
+        prices = ticks['price'][rows]
+
+        pos = np.searchsorted(self._last_keys, keys)
+        pos_clipped = np.minimum(pos, max(self._last_keys.size - 1, 0))
+        known = (pos < self._last_keys.size) & (self._last_keys[pos_clipped] == keys) if self._last_keys.size \
+            else np.zeros(keys.size, dtype=bool)
+        changed = ~known
+        changed[known] = self._last_prices[pos_clipped[known]] != prices[known]
+
+        # Update known keys in place and merge new ones, keeping the arrays sorted
+        self._last_prices[pos_clipped[known]] = prices[known]
+        self._last_ts[pos_clipped[known]] = ticks['ts'][0]
+        if (~known).any():
+            all_keys = np.concatenate([self._last_keys, keys[~known]])
+            order = np.argsort(all_keys, kind='stable')
+            self._last_keys = all_keys[order]
+            self._last_prices = np.concatenate([self._last_prices, prices[~known]])[order]
+            self._last_ts = np.concatenate([self._last_ts, np.full((~known).sum(), ticks['ts'][0], np.uint32)])[order]
+        if self._last_keys.size > self.max_tracked_keys:
+            # Forget the keys quoted longest ago; at worst they are written once more
+            keep = np.sort(np.argsort(self._last_ts, kind='stable')[-self.max_tracked_keys:])
+            self._last_keys, self._last_prices, self._last_ts = (
+                self._last_keys[keep], self._last_prices[keep], self._last_ts[keep])
+
+        mask = np.zeros(ticks.size, dtype=bool)
+        mask[rows[changed]] = True
+        return mask
+
+    def flush(self, now=None) -> None:
+        """Append buffered ticks to their day partitions"""
+        with self._writing():
+            self._last_flush = _timestamp(now)
+            if not self._buffer:
+                return
+            ticks = np.concatenate(self._buffer)
+            self._buffer, self._buffered = [], 0
+            os.makedirs(self.root, exist_ok=True)
+            unique_ts, ts_idx = np.unique(ticks['ts'], return_inverse=True)
+            tick_days = np.array([_day(t) for t in unique_ts.tolist()])[ts_idx.ravel()]
+            for day in np.unique(tick_days):
+                part = ticks[tick_days == day]
+                with open(os.path.join(self.root, f'{day}.ticks'), 'ab') as f:
+                    f.write(part.tobytes())
+                for event in np.unique(part['event']).tolist():
+                    days_seen = self.event_partitions.setdefault(self.events[event], [])
+                    if day not in days_seen:
+                        days_seen.append(str(day))
+            self.downsample(before=self._last_flush - DOWNSAMPLE_AFTER_DAYS * 86400, save=False)
+            self._save_symbols()
+
+    def downsample(self, before: float, bucket: int = DOWNSAMPLE_SECONDS, save: bool = True) -> int:
+        """Keep one tick per key per bucket in partitions of days before `before`.
+
+        Returns the number of ticks dropped. Each partition is rewritten
+        atomically and only once per bucket size.
+        """
+        dropped = 0
+        with self._writing():
+            cutoff = _day(before)
+            for name in sorted(os.listdir(self.root)) if os.path.isdir(self.root) else []:
+                day = name[:-len('.ticks')]
+                if not name.endswith('.ticks') or day >= cutoff or self.downsampled.get(day, 0) >= bucket:
+                    continue
+                path = os.path.join(self.root, name)
+                ticks = np.fromfile(path, dtype=TICK_DTYPE)
+                key = (ticks['event'].astype(np.int64) << 40) | (ticks['outcome'].astype(np.int64) << 16) \
+                    | ticks['bookmaker']
+                slot = ticks['ts'] // bucket
+                order = np.lexsort((ticks['ts'], slot, key))
+                last = np.r_[(key[order][1:] != key[order][:-1]) | (slot[order][1:] != slot[order][:-1]), True]
+                kept = ticks[np.sort(order[last])]
+                tmp = path + '.tmp'
+                kept.tofile(tmp)
+                os.replace(tmp, path)
+                self.downsampled[day] = bucket
+                dropped += ticks.size - kept.size
+            if save:
+                self._save_symbols()
+        return dropped
+
+    # -- queries -------------------------------------------------------------
+
+    def ticks(self, event_id: str, market: Optional[str] = None) -> np.ndarray:
+        """All stored ticks of an event (flushed and buffered), oldest first"""
+        self._refresh_symbols()
+        with self._lock:
+            event = self._event_ids.get(str(event_id))
+            if event is None:
+                return np.zeros(0, dtype=TICK_DTYPE)
+            parts = []
+            for day in self.event_partitions.get(str(event_id), []):
+                path = os.path.join(self.root, f'{day}.ticks')
+                if os.path.exists(path) and os.path.getsize(path):
+                    data = np.memmap(path, dtype=TICK_DTYPE, mode='r')
+                    parts.append(np.asarray(data[data['event'] == event]))
+            parts.extend(b[b['event'] == event] for b in self._buffer)
+            outcomes = self.outcomes
+        result = np.concatenate(parts) if parts else np.zeros(0, dtype=TICK_DTYPE)
+        if market is not None and result.size:
+            in_market = np.array([o[0] == market for o in outcomes])
+            result = result[in_market[result['outcome']]]
+        return result[np.argsort(result['ts'], kind='stable')]
+
+    def _label(self, outcome: int) -> str:
+        _market, name, point = self.outcomes[outcome]
+        return name if point is None else f'{name} {point:g}'
+
+    def line_movement(self, event_id: str, market: str = 'h2h', now=None,
+                      velocity_window: float = VELOCITY_WINDOW) -> Dict[str, Any]:
+        """Opening vs current consensus, velocity and steam moves for one market.
+
+        Consensus is the average implied probability across bookmakers,
+        normalized over the outcomes of each line. Velocity is the consensus
+        change per hour over the last velocity_window seconds.
+        """
+        ticks = self.ticks(event_id, market)
+        if ticks.size == 0:
+            return {'event_id': str(event_id), 'market': market, 'outcomes': {}, 'steam_moves': []}
+        t_now = _timestamp(now) if now is not None else float(ticks['ts'].max())
+        outcome = ticks['outcome'].astype(np.int64)
+        book = ticks['bookmaker'].astype(np.int64)
+        ts = ticks['ts'].astype(np.int64)
+        implied = 1.0 / ticks['price'].astype(float)
+        ids, local = np.unique(outcome, return_inverse=True)
+        key = local * (book.max() + 1) + book
+        # Outcomes of the same line (totals/spreads at one point) are normalized together
+        lines = [(self.outcomes[o][0], abs(self.outcomes[o][2]) if self.outcomes[o][2] is not None else None)
+                 for o in ids.tolist()]
+        line_ids = {}
+        line_of = np.array([line_ids.setdefault(line, len(line_ids)) for line in lines], dtype=np.int64)
+
+        def consensus(rows):
+            per_outcome = np.bincount(local[rows], weights=implied[rows], minlength=ids.size)
+            counts = np.bincount(local[rows], minlength=ids.size)
+            mean = np.divide(per_outcome, counts, out=np.full(ids.size, np.nan), where=counts > 0)
+            totals = np.bincount(line_of, weights=np.nan_to_num(mean))
+            return mean / totals[line_of]
+
+        first = _last_per_group(key, -ts)
+        current = consensus(_last_per_group(key, ts))
+        past_mask = ts <= t_now - velocity_window
+        if past_mask.any():
+            past_rows = np.flatnonzero(past_mask)[_last_per_group(key[past_mask], ts[past_mask])]
+            past = consensus(past_rows)
+        else:
+            past = consensus(first)
+        opening = consensus(first)
+        hours = velocity_window / 3600.0
+
+        outcomes = {}
+        for i, o in enumerate(ids.tolist()):
+            outcomes[self._label(o)] = {
+                'opening': round(float(opening[i]), 4),
+                'current': round(float(current[i]), 4),
+                'change': round(float(current[i] - opening[i]), 4),
+                'velocity': round(float((current[i] - past[i]) / hours), 5) if not np.isnan(past[i]) else 0.0,
+                'n_ticks': int((local == i).sum()),
+            }
+        return {'event_id': str(event_id), 'market': market, 'outcomes': outcomes,
+                'steam_moves': self._steam_moves(ids, local, book, key, ts, implied)}
+
+    def _steam_moves(self, ids, local, book, key, ts, implied) -> List[Dict[str, Any]]:
+        # Each tick's move against the same bookmaker's previous quote
+        order = np.lexsort((ts, key))
+        same = np.r_[False, key[order][1:] == key[order][:-1]]
+        move = np.zeros(ts.size)
+        move[order[1:]] = np.where(same[1:], np.diff(implied[order]), 0.0)
+        big = np.abs(move) >= STEAM_MIN_MOVE
+        if not big.any():
+            return []
+        # One cell per (outcome, window, direction), packed into an int64
+        cell = ((local[big] << 32) + ts[big] // STEAM_WINDOW) * 2 + (move[big] > 0)
+        cells, inverse = np.unique(cell, return_inverse=True)
+        inverse = inverse.ravel()
+        mean_move = np.bincount(inverse, weights=move[big]) / np.bincount(inverse)
+        # A bookmaker moving twice in one window counts once
+        n_books = int(book.max()) + 1
+        counts = np.bincount(np.unique(inverse * n_books + book[big]) // n_books, minlength=cells.size)
+        moves = []
+        for j in np.flatnonzero(counts >= STEAM_MIN_BOOKS).tolist():
+            c = int(cells[j])
+            moves.append({
+                'outcome': self._label(int(ids[c >> 33])),
+                'time': datetime.fromtimestamp(((c >> 1) & 0xFFFFFFFF) * STEAM_WINDOW, timezone.utc).isoformat(),
+                'direction': 'shortening' if c & 1 else 'drifting',
+                'books': int(counts[j]),
+                'move': round(float(mean_move[j]), 4),
+            })
+        return moves
+
+
+@lru_cache(maxsize=None)
+def get_odds_history() -> Optional[OddsHistory]:
+    """Process-wide odds history; set ODDS_HISTORY_DIR='' to disable it.
+
+    Every API worker writes the store and reads the others' ticks, so each
+    snapshot with a change is flushed straight away rather than buffered.
+    """
+    return OddsHistory(ODDS_HISTORY_DIR, flush_rows=1) if ODDS_HISTORY_DIR else None
@@ -1,8 +1,51 @@
+import math
 import os
-from typing import List, Dict, Any
-import numpy as np
-from backend.api_clients import FootballDataAPI, OddsAPI
-from backend.features import FeatureEngine
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from backend.api_clients import FootballDataAPI, OddsAPI, get_football_api, get_odds_api
+from backend.model_store import ModelStore, MODEL_DIR, MATCH_MODEL, CALIBRATION_PATH
+from backend.resilience import mark_degraded
+
+PLAYER_MODEL_PATH = os.path.join(MODEL_DIR, 'player_score_model.joblib')
+PLAYER_FEATURES = ['recent_goals', 'shots_on_target', 'starts_last5', 'xg']
+MATCH_MODEL_BLEND = 0.5  # weight of the trained model vs the Poisson 1X2 estimate
+
+# Candidate market -> consensus fair probability key produced by backend.odds.to_odds_data
+MARKET_PROB_KEYS = {
+    'home_win': 'market_prob_home',
+    'draw': 'market_prob_draw',
+    'away_win': 'market_prob_away',
+    'over_1.5': 'market_prob_over_1.5',
+    'over_2.5': 'market_prob_over_2.5',
+    'under_2.5': 'market_prob_under_2.5',
+    'over_3.5': 'market_prob_over_3.5',
+}
+
+RESULT_MARKETS = ('home_win', 'draw', 'away_win')
+
+# Candidate market -> consensus change since the opening line
+LINE_MOVE_KEYS = {'home_win': 'line_move_home', 'draw': 'line_move_draw', 'away_win': 'line_move_away'}
+
+# Candidate market -> price key in odds_data
+MARKET_ODDS_KEYS = {
+    'home_win': 'home_odds',
+    'draw': 'draw_odds',
+    'away_win': 'away_odds',
+    'over_1.5': 'over_1.5_goals',
+    'over_2.5': 'over_2.5_goals',
+    'under_2.5': 'under_2.5_goals',
+    'over_3.5': 'over_3.5_goals',
+    'btts_yes': 'btts_yes',
+    'btts_no': 'btts_no',
+}
+
+FEATURE_CACHE_SIZE = 512  # matches whose features are kept for what-if requests
+FEATURE_TTL = 6 * 3600    # seconds they stay in the shared store for other workers
+FORM_XG_FACTOR = 0.1      # relative xG change per point-per-game of form adjustment
+WHATIF_PARAMS = ('home_xg', 'away_xg', 'home_xg_delta', 'away_xg_delta', 'home_form_delta', 'away_form_delta')
+MAX_SWEEP_STEPS = 1000
+MAX_BOARD_SIZE = 500      # candidates returned by market_board
 
 
 class Predictor:
@@ -15,20 +58,83 @@ class Predictor:
     Each candidate dict: {"event": str, "prob": float, "odds": float, "ev": float}
     """
 
-    def __init__(self):
+    def __init__(self, football_api: Optional[FootballDataAPI] = None, odds_api: Optional[OddsAPI] = None,
+                 model_store: Optional[ModelStore] = None, shared_store=None):
         self.models = {}
-        self.football_api = FootballDataAPI()
-        self.odds_api = OddsAPI()
-        self.feature_engine = FeatureEngine()
+        self.model_versions = {}
+        self.model_store = model_store or ModelStore()
+        # Share the process-wide clients unless explicit ones are injected
+        self.football_api = football_api or get_football_api()
+        self.odds_api = odds_api or get_odds_api()
+        self._feature_engine = None
+        self.feature_cache = OrderedDict()
+        self._feature_cache_lock = threading.Lock()
+        self._shared_store = shared_store
+
+    @property
+    def feature_engine(self):
+        """FeatureEngine, built on first use so numpy stays off the import path"""
+        if self._feature_engine is None:
+            from backend.features import FeatureEngine
+            from backend.odds_history import get_odds_history
+            self._feature_engine = FeatureEngine(get_odds_history())
+        return self._feature_engine
+
+    @property
+    def shared_store(self):
+        """Store shared with the other API workers (backend.shared_state)"""
+        if self._shared_store is None:
+            from backend.shared_state import get_shared_store
+            self._shared_store = get_shared_store()
+        return self._shared_store
 
-    
     def load_models(self):
-        """Load any pre-trained models"""
-        pass
+        """Load any pre-trained models.
+
+        joblib/sklearn are imported here rather than at module level so that
+        importing the predictor stays cheap; callers decide when to pay for it.
+        """
+        models = {}
+        versions = {}
+        if os.path.exists(PLAYER_MODEL_PATH):
+            try:
+                import joblib
+                models['player_score'] = joblib.load(PLAYER_MODEL_PATH)
+            except Exception as e:
+                print(f"Could not load player model: {e}")
+
+        latest = self.model_store.latest_version(MATCH_MODEL)
+        if latest is not None:
+            try:
+                models[MATCH_MODEL], _ = self.model_store.load(MATCH_MODEL, latest)
+                versions[MATCH_MODEL] = latest
+            except Exception as e:
+                print(f"Could not load {MATCH_MODEL} v{latest}: {e}")
+
+        if os.path.exists(CALIBRATION_PATH):
+            try:
+                from backend.calibration import Calibrator
+                models['calibration'] = Calibrator.load(CALIBRATION_PATH)
+            except Exception as e:
+                print(f"Could not load calibration maps: {e}")
+
+        # Swap in one assignment so concurrent readers never see a partial dict;
+        # requests already running keep the snapshot they started with.
+        self.models = models
+        self.model_versions = versions
+
+    def maybe_reload(self) -> bool:
+        """Hot-swap to newer model versions if the store has any; True if swapped"""
+        latest = self.model_store.latest_version(MATCH_MODEL)
+        if latest is None or latest == self.model_versions.get(MATCH_MODEL):
+            return False
+        self.load_models()
+        return self.model_versions.get(MATCH_MODEL) == latest
 
     def predict_events(self, match_id: str, home: str, away: str, context: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate data-driven betting predictions with real statistical analysis"""
         events = []
+        models = self.models  # one snapshot for the whole request
         
         # Get real match data
         real_match_id = context.get('real_match_id')
@@ -44,19 +150,208 @@ class Predictor:
         
         # Build comprehensive features
         features = self._analyze_match_statistics(home, away, h2h_data, odds_data)
+        if odds_data.get('odds_event_id'):
+            features.update(self.feature_engine.compute_line_movement(odds_data['odds_event_id'], home, away))
         
         # Generate high-value betting opportunities based on statistical analysis
-        events.extend(self._analyze_match_result(features, odds_data, home, away))
+        events.extend(self._analyze_match_result(features, odds_data, home, away, models))
         events.extend(self._analyze_goals_markets(features, odds_data))
         events.extend(self._analyze_btts(features, odds_data))
         events.extend(self._analyze_corners_cards(features, odds_data))
+        events.extend(self._analyze_player_props(context, odds_data, models))
+        
+        # Map raw model probabilities onto observed frequencies, all markets in one pass
+        # (1X2 was calibrated before the match-model blend, see _result_probs)
+        calibrator = models.get('calibration')
+        if calibrator is not None:
+            calibrator.calibrate_events([e for e in events if e.get('market') not in RESULT_MARKETS])
+        
+        # Attach the margin-free bookmaker consensus so the edge is visible
+        for e in events:
+            market_prob = odds_data.get(MARKET_PROB_KEYS.get(e.get('market'), ''))
+            if market_prob:
+                e['market_prob'] = round(market_prob, 3)
+            line_move = features.get(LINE_MOVE_KEYS.get(e.get('market'), ''))
+            if line_move:
+                e['line_move'] = round(line_move, 3)
         
         # Sort by PROBABILITY first (most likely outcomes), then by EV
         events.sort(key=lambda e: (e['prob'], e['ev']), reverse=True)
         
+        self._remember_features(match_id, home, away, features, odds_data, events)
+        
         # Return top 12 predictions
         return events[:12]
     
+    def _remember_features(self, match_id: str, home: str, away: str, features: Dict, odds_data: Dict,
+                           events: List[Dict]):
+        """Keep the match's features and prices so what-if and market requests skip the fetches"""
+        entry = {
+            'teams': [home, away],
+            'features': features,
+            'odds_data': dict(odds_data),
+            'event_odds': {e['market']: e['odds'] for e in events if 'market' in e},
+        }
+        with self._feature_cache_lock:
+            self.feature_cache[match_id] = entry
+            self.feature_cache.move_to_end(match_id)
+            while len(self.feature_cache) > FEATURE_CACHE_SIZE:
+                self.feature_cache.popitem(last=False)
+        # Other workers answer what-if requests for this match too
+        try:
+            self.shared_store.set(f'features:{match_id}', entry, ttl=FEATURE_TTL)
+        except Exception as e:
+            print(f"Could not share features of {match_id}: {e}")
+    
+    def what_if(self, match_id: str, overrides: Optional[Dict[str, Any]] = None,
+                sweep: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Re-price the core markets of a previously predicted match under new assumptions.
+
+        Reuses the cached features of the last predict_events call for match_id
+        and only recomputes the market layer. `overrides` may set home_xg /
+        away_xg, shift them (home_xg_delta / away_xg_delta), adjust form in
+        points per game (home_form_delta / away_form_delta) or replace prices
+        (odds: {market: decimal odds}). `sweep` = {"param", "values"} or
+        {"param", "start", "stop", "steps"} evaluates a whole range of one
+        parameter in a single vectorized pass. Returns None for unknown matches.
+        """
+        models = self.models  # one snapshot for the whole request
+        with self._feature_cache_lock:
+            cached = self.feature_cache.get(match_id)
+        if cached is None:
+            cached = self.shared_store.get(f'features:{match_id}')
+        if cached is None:
+            return None
+
+        import numpy as np
+        from backend.markets import core_market_probs
+        overrides = dict(overrides or {})
+        odds_overrides = overrides.pop('odds', None) or {}
+        unknown = set(overrides) - set(WHATIF_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown what-if parameters: {sorted(unknown)}")
+
+        values = None
+        if sweep:
+            param = sweep.get('param')
+            if param not in WHATIF_PARAMS:
+                raise ValueError(f"Cannot sweep '{param}'")
+            if 'values' in sweep:
+                values = np.asarray(sweep['values'], dtype=float)
+            else:
+                values = np.linspace(float(sweep['start']), float(sweep['stop']), int(sweep.get('steps', 11)))
+            if not 0 < values.size <= MAX_SWEEP_STEPS:
+                raise ValueError(f"Sweep must have between 1 and {MAX_SWEEP_STEPS} values")
+            overrides[param] = values
+        n = 1 if values is None else values.size
+
+        features = cached['features']
+        param = lambda name, default: np.broadcast_to(np.asarray(overrides.get(name, default), dtype=float), (n,))
+        home_xg = param('home_xg', features['home_xg']) + param('home_xg_delta', 0.0)
+        away_xg = param('away_xg', features['away_xg']) + param('away_xg_delta', 0.0)
+        home_xg = np.maximum(home_xg * (1 + FORM_XG_FACTOR * param('home_form_delta', 0.0)), 0.01)
+        away_xg = np.maximum(away_xg * (1 + FORM_XG_FACTOR * param('away_form_delta', 0.0)), 0.01)
+
+        probs = core_market_probs(home_xg, away_xg, features['home_clean_sheet_pct'], features['away_clean_sheet_pct'])
+        # Same model layer as predict_events: calibration, and the match-model blend for 1X2
+        calibrator = models.get('calibration')
+        if calibrator is not None:
+            probs.update({m: calibrator.apply([m] * n, p) for m, p in probs.items() if m not in RESULT_MARKETS})
+        probs.update(self._result_probs(probs, features, models))
+
+        markets = {}
+        for market, prob in probs.items():
+            odds = (odds_overrides.get(market)
+                    or cached['odds_data'].get(MARKET_ODDS_KEYS.get(market, ''))
+                    or cached['event_odds'].get(market))
+            if not odds:
+                # No price seen for this market: hold the baseline fallback price fixed
+                baseline = core_market_probs([features['home_xg']], [features['away_xg']],
+                                             features['home_clean_sheet_pct'], features['away_clean_sheet_pct'])
+                odds = round(1.0 / max(float(baseline[market][0]), 0.01) * 1.1, 2)
+            markets[market] = {
+                'prob': np.round(prob, 4).tolist(),
+                'odds': float(odds),
+                'ev': np.round(prob * odds - 1.0, 4).tolist(),
+            }
+
+        return {
+            'match_id': match_id,
+            'param': sweep.get('param') if sweep else None,
+            'values': values.tolist() if values is not None else None,
+            'home_xg': np.round(home_xg, 3).tolist(),
+            'away_xg': np.round(away_xg, 3).tolist(),
+            'markets': markets,
+        }
+    
+    def cached_features(self, match_ids: Optional[List[str]]) -> List[tuple]:
+        """(match_id, cache entry) of every known match among match_ids, or of every one any worker cached"""
+        if match_ids is None:
+            with self._feature_cache_lock:
+                local = list(self.feature_cache)
+            known = set(local)
+            shared = [key[len('features:'):] for key in self.shared_store.keys('features:')]
+            match_ids = local + [m for m in shared if m not in known]
+        with self._feature_cache_lock:
+            found = [(m, self.feature_cache.get(m)) for m in match_ids]
+        found = [(m, entry if entry is not None else self.shared_store.get(f'features:{m}')) for m, entry in found]
+        return [(m, entry) for m, entry in found if entry is not None]
+
+    def market_board(self, match_ids: Optional[List[str]] = None, prices: Optional[Dict[str, Dict]] = None,
+                     top_k: int = 20, per_match: Optional[int] = None) -> Dict[str, Any]:
+        """Best-EV exotic bets across many predicted matches, priced in one batch.
+
+        Builds the correct score, HT/FT, Asian handicap, team total, winning
+        margin and double chance book of every match from its cached xG (see
+        backend.markets.generate_markets). Only priced markets can have an
+        EV: prices come from the cached odds_data (handicap main line) and
+        `prices` ({match_id: {market: decimal odds}}). Returns the top_k bets
+        overall, or the best per_match of each match when that is given.
+        """
+        import numpy as np
+        from backend import markets
+        for k in (top_k, per_match):
+            if k is not None and not 0 < k <= MAX_BOARD_SIZE:
+                raise ValueError(f"top_k and per_match must be between 1 and {MAX_BOARD_SIZE}")
+        prices = prices or {}
+
+        entries = self.cached_features(match_ids)
+        if not entries:
+            return {'n_matches': 0, 'n_markets': 0, 'n_priced': 0, 'candidates': []}
+        book = markets.generate_markets([e['features']['home_xg'] for _, e in entries],
+                                        [e['features']['away_xg'] for _, e in entries])
+        # Feed lines the book does not carry are skipped; explicit prices must all exist
+        feed = [markets.odds_data_prices(e['odds_data'], book) for _, e in entries]
+        odds = markets.price_matrix(book, [dict(f, **prices.get(m, {})) for f, (m, _) in zip(feed, entries)])
+        ev = book.expected_value(odds)
+        fair = book.fair_odds()
+
+        if per_match:
+            cols = markets.top_k_per_row(ev, per_match)
+            rows = np.repeat(np.arange(len(entries)), cols.shape[1])
+            cols = cols.ravel()
+        else:
+            rows, cols = markets.top_k(ev, top_k)
+        candidates = []
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            if np.isnan(ev[r, c]):
+                continue  # fewer priced markets than requested
+            match_id, entry = entries[r]
+            home, away = entry.get('teams') or ['Home', 'Away']
+            market = book.names[c]
+            candidates.append({
+                'match_id': match_id,
+                'event': markets.market_label(market, home, away),
+                'market': market,
+                'prob': round(float(book.win[r, c]), 4),
+                'push': round(float(book.push[r, c]), 4),
+                'odds': float(odds[r, c]),
+                'fair_odds': round(float(fair[r, c]), 3),
+                'ev': round(float(ev[r, c]), 4),
+            })
+        return {'n_matches': len(entries), 'n_markets': len(book.names), 'n_priced': int(np.isfinite(ev).sum()),
+                'candidates': candidates}
+    
     def _analyze_match_statistics(self, home: str, away: str, h2h_data: Any, odds_data: Dict) -> Dict:
         """Deep statistical analysis using REAL match data"""
         
@@ -80,11 +375,13 @@ class Predictor:
         home_stats = {'goals_scored_avg': 1.5, 'goals_conceded_avg': 1.2, 'form_points': 7, 'clean_sheet_pct': 0.3}
         away_stats = {'goals_scored_avg': 1.3, 'goals_conceded_avg': 1.1, 'form_points': 6, 'clean_sheet_pct': 0.3}
         
+        home_found = away_found = False
         if home_team_id:
             try:
                 home_matches = self.football_api.get_team_matches(home_team_id, limit=10)
                 if home_matches:
                     home_stats = self.football_api.calculate_team_stats(home, home_matches)
+                    home_found = True
                     print(f"  {home}: {home_stats['goals_scored_avg']:.1f} goals/game, {home_stats['form_points']} pts from last 10")
             except Exception as e:
                 print(f"  Could not fetch {home} stats: {e}")
@@ -94,10 +391,14 @@ class Predictor:
                 away_matches = self.football_api.get_team_matches(away_team_id, limit=10)
                 if away_matches:
                     away_stats = self.football_api.calculate_team_stats(away, away_matches)
+                    away_found = True
                     print(f"  {away}: {away_stats['goals_scored_avg']:.1f} goals/game, {away_stats['form_points']} pts from last 10")
             except Exception as e:
                 print(f"  Could not fetch {away} stats: {e}")
         
+        if not (home_found and away_found):
+            mark_degraded('team stats: default values')
+        
         # Build features from REAL data
         features = {
             'home_team': home,
@@ -160,6 +461,7 @@ class Predictor:
         if prob_over_25 >= 0.45:  # If reasonable chance
             predictions.append({
                 'event': 'Over 2.5 Goals',
+                'market': 'over_2.5',
                 'prob': round(prob_over_25, 3),
                 'odds': round(market_odds_over_25, 2),
                 'ev': round(ev_over_25, 3),
@@ -169,6 +471,7 @@ class Predictor:
         if prob_under_25 >= 0.45:
             predictions.append({
                 'event': 'Under 2.5 Goals',
+                'market': 'under_2.5',
                 'prob': round(prob_under_25, 3),
                 'odds': round(market_odds_under_25, 2),
                 'ev': round(ev_under_25, 3),
@@ -184,6 +487,7 @@ class Predictor:
             
             predictions.append({
                 'event': 'Over 1.5 Goals',
+                'market': 'over_1.5',
                 'prob': round(prob_over_15, 3),
                 'odds': round(market_odds_over_15, 2),
                 'ev': round(ev_over_15, 3),
@@ -200,6 +504,7 @@ class Predictor:
                 
                 predictions.append({
                     'event': 'Over 3.5 Goals',
+                    'market': 'over_3.5',
                     'prob': round(prob_over_35, 3),
                     'odds': round(market_odds_over_35, 2),
                     'ev': round(ev_over_35, 3),
@@ -213,8 +518,8 @@ class Predictor:
         predictions = []
         
         # Calculate BTTS probability using team scoring rates
-        home_scores_prob = 1 - np.exp(-features['home_xg'])
-        away_scores_prob = 1 - np.exp(-features['away_xg'])
+        home_scores_prob = 1 - math.exp(-features['home_xg'])
+        away_scores_prob = 1 - math.exp(-features['away_xg'])
         
         btts_yes_prob = home_scores_prob * away_scores_prob
         
@@ -237,6 +542,7 @@ class Predictor:
         if btts_yes_prob > 0.40:
             predictions.append({
                 'event': 'Both Teams To Score - Yes',
+                'market': 'btts_yes',
                 'prob': round(btts_yes_prob, 3),
                 'odds': round(market_odds_btts_yes, 2),
                 'ev': round(ev_btts_yes, 3),
@@ -247,6 +553,7 @@ class Predictor:
         if btts_no_prob > 0.40:
             predictions.append({
                 'event': 'Both Teams To Score - No',
+                'market': 'btts_no',
                 'prob': round(btts_no_prob, 3),
                 'odds': round(market_odds_btts_no, 2),
                 'ev': round(ev_btts_no, 3),
@@ -274,6 +581,7 @@ class Predictor:
             if ev > 0.04:
                 predictions.append({
                     'event': 'Over 9.5 Corners',
+                    'market': 'over_9.5_corners',
                     'prob': round(prob_over_corners, 3),
                     'odds': round(market_odds, 2),
                     'ev': round(ev, 3),
@@ -282,7 +590,77 @@ class Predictor:
         
         return predictions
     
-    def _analyze_match_result(self, features: Dict, odds_data: Dict, home: str, away: str) -> List[Dict]:
+    def _analyze_player_props(self, context: Dict, odds_data: Dict, models: Optional[Dict] = None) -> List[Dict]:
+        """Anytime scorer market for the star player, if a model is loaded"""
+        model = (self.models if models is None else models).get('player_score')
+        player = context.get('star_player')
+        if model is None or not player:
+            return []
+
+        import pandas as pd
+        defaults = {'recent_goals': 0, 'shots_on_target': 0.8, 'starts_last5': 3, 'xg': 0.1}
+        row = {k: context.get(k, defaults[k]) for k in PLAYER_FEATURES}
+        try:
+            prob = float(model.predict_proba(pd.DataFrame([row], columns=PLAYER_FEATURES))[0][1])
+        except Exception as e:
+            print(f"Could not score player {player}: {e}")
+            return []
+
+        fair_odds = 1.0 / prob if prob > 0.01 else 50.0
+        market_odds = odds_data.get('player_to_score', fair_odds * 1.1)
+        ev = prob * market_odds - 1.0
+        return [{
+            'event': f'{player} to score',
+            'market': 'player_to_score',
+            'prob': round(prob, 3),
+            'odds': round(market_odds, 2),
+            'ev': round(ev, 3),
+            'reasoning': f'Player model: {row["recent_goals"]} recent goals, {row["xg"]:.2f} xG/90'
+        }]
+
+    def _match_model_probs(self, model: Any, features: Dict) -> Optional[Dict[str, float]]:
+        """1X2 probabilities from the trained match-result model"""
+        import pandas as pd
+        row = {
+            'home_gf': features['home_goals_avg'],
+            'home_ga': features['home_conceded_avg'],
+            'home_pts': features['home_form_points'] / 10.0,
+            'away_gf': features['away_goals_avg'],
+            'away_ga': features['away_conceded_avg'],
+            'away_pts': features['away_form_points'] / 10.0,
+        }
+        columns = list(getattr(model, 'feature_names_in_', row.keys()))
+        try:
+            probs = model.predict_proba(pd.DataFrame([row], columns=columns))[0]
+        except Exception as e:
+            print(f"Could not score {MATCH_MODEL}: {e}")
+            return None
+        return dict(zip(model.classes_, (float(p) for p in probs)))
+
+    def _result_probs(self, probs: Dict[str, Any], features: Dict, models: Dict) -> Dict[str, Any]:
+        """Final 1X2 probabilities (scalars or arrays) from the Poisson ones.
+
+        The calibrator is fitted on raw Poisson probabilities, so it maps
+        them first; the match-result model is blended in afterwards.
+        """
+        import numpy as np
+        probs = {m: np.atleast_1d(np.asarray(probs[m], dtype=float)) for m in RESULT_MARKETS}
+        calibrator = models.get('calibration')
+        if calibrator is not None:
+            probs = {m: calibrator.apply([m] * p.size, p) for m, p in probs.items()}
+            total = sum(probs.values())
+            probs = {m: p / total for m, p in probs.items()}
+        model = models.get(MATCH_MODEL)
+        model_probs = self._match_model_probs(model, features) if model is not None else None
+        if model_probs:
+            w = MATCH_MODEL_BLEND
+            for market, label in zip(RESULT_MARKETS, ('H', 'D', 'A')):
+                if label in model_probs:
+                    probs[market] = (1 - w) * probs[market] + w * model_probs[label]
+        return probs
+
+    def _analyze_match_result(self, features: Dict, odds_data: Dict, home: str, away: str,
+                              models: Optional[Dict] = None) -> List[Dict]:
         """Analyze match result markets - ALWAYS show all three outcomes"""
         predictions = []
         
@@ -301,6 +679,11 @@ class Predictor:
         prob_away_win /= total_prob
         prob_draw /= total_prob
         
+        # Calibrate the Poisson leg, then blend in the trained match-result model
+        probs = self._result_probs({'home_win': prob_home_win, 'draw': prob_draw, 'away_win': prob_away_win},
+                                   features, self.models if models is None else models)
+        prob_home_win, prob_draw, prob_away_win = (float(probs[m][0]) for m in RESULT_MARKETS)
+        
         # Get market odds
         home_odds = odds_data.get('home_odds', 1.0 / prob_home_win * 1.1)
         away_odds = odds_data.get('away_odds', 1.0 / prob_away_win * 1.1)
@@ -314,6 +697,7 @@ class Predictor:
         # ALWAYS add all three outcomes - user decides what to bet
         predictions.append({
             'event': f'{home} Win',
+            'market': 'home_win',
             'prob': round(prob_home_win, 3),
             'odds': round(home_odds, 2),
             'ev': round(ev_home, 3),
@@ -322,6 +706,7 @@ class Predictor:
         
         predictions.append({
             'event': f'{away} Win',
+            'market': 'away_win',
             'prob': round(prob_away_win, 3),
             'odds': round(away_odds, 2),
             'ev': round(ev_away, 3),
@@ -330,6 +715,7 @@ class Predictor:
         
         predictions.append({
             'event': 'Draw',
+            'market': 'draw',
             'prob': round(prob_draw, 3),
             'odds': round(draw_odds, 2),
             'ev': round(ev_draw, 3),
@@ -340,22 +726,21 @@ class Predictor:
     
     def _poisson_over(self, lambda_total: float, threshold: float) -> float:
         """Calculate probability of over X goals using Poisson distribution"""
-        import math
         prob_under = 0.0
         for k in range(int(threshold) + 1):
-            prob_under += (lambda_total ** k) * np.exp(-lambda_total) / math.factorial(k)
+            prob_under += (lambda_total ** k) * math.exp(-lambda_total) / math.factorial(k)
         return 1.0 - prob_under
     
     def _poisson_win_prob(self, home_lambda: float, away_lambda: float, outcome: str) -> float:
         """Calculate win probability using bivariate Poisson"""
-        import math
         prob = 0.0
         max_goals = 10
+        home_pmf = [math.exp(-home_lambda) * (home_lambda ** i) / math.factorial(i) for i in range(max_goals)]
+        away_pmf = [math.exp(-away_lambda) * (away_lambda ** j) / math.factorial(j) for j in range(max_goals)]
         
         for i in range(max_goals):
             for j in range(max_goals):
-                prob_score = (np.exp(-home_lambda) * (home_lambda ** i) / math.factorial(i)) * \
-                           (np.exp(-away_lambda) * (away_lambda ** j) / math.factorial(j))
+                prob_score = home_pmf[i] * away_pmf[j]
                 
                 if outcome == 'home' and i > j:
                     prob += prob_score
@@ -379,8 +764,10 @@ class Predictor:
 
     def optimize_parlay(self, candidates: List[Dict[str, Any]], bankroll: float = 100.0, max_legs: int = 4) -> Dict[str, Any]:
         """A simple heuristic optimizer that picks top EV picks while capping legs.
-        Returns a parlay dict with chosen legs and estimated parlay payout.
+        Returns a parlay dict with chosen legs, estimated parlay payout and a
+        fractional-Kelly stake out of bankroll (capped like a single match).
         """
+        from backend.staking import KELLY_FRACTION, MAX_MATCH_EXPOSURE, kelly_fraction
         chosen = sorted(candidates, key=lambda c: c['ev'], reverse=True)[:max_legs]
         # compute combined odds and theoretical probability assuming independence
         combined_odds = 1.0
@@ -389,4 +776,5 @@ class Predictor:
             combined_odds *= c['odds']
             combined_prob *= c['prob']
         expected_return = combined_prob * (combined_odds - 1) - (1 - combined_prob)
-        return {"legs": chosen, "combined_odds": round(combined_odds,2), "prob": round(combined_prob,4), "expected_return": round(expected_return,3)}
+        stake = bankroll * min(KELLY_FRACTION * kelly_fraction(combined_prob, combined_odds), MAX_MATCH_EXPOSURE)
+        return {"legs": chosen, "combined_odds": round(combined_odds,2), "prob": round(combined_prob,4), "expected_return": round(expected_return,3), "stake": round(stake,2)}
@@ -0,0 +1,285 @@
+"""Low-overhead stack sampling for requests and offline prediction batches.
+
+A StackSampler thread wakes every few milliseconds, grabs the current frame
+of the threads it watches (sys._current_frames) and counts each distinct
+stack. Nothing is traced in between, so the profiled code runs at close to
+full speed. Profiles export as collapsed stacks (flamegraph.pl, speedscope,
+inferno) or as a speedscope JSON document.
+
+A profile covers the thread that started it plus the threads its work was
+handed to: callables wrapped with profiled() at submit time (asyncio.to_thread,
+run_in_executor, the hedge pool) add the thread running them to every profile
+active in the submitting context, for as long as they run. Other requests'
+work on the same pools stays out of the profile.
+
+The app turns this on per request in debug mode (see backend.app.main);
+offline, profile a batch of run_predict.py fixtures with
+
+    python -m backend.profiling --fixtures fixtures.json --repeat 20 --output predict.speedscope.json
+"""
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '') == '1'     # debug only: adds the middleware and endpoints
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))  # share of requests profiled without a header
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', '0.002'))   # seconds between samples
+PROFILE_HISTORY = 32             # finished profiles kept for the debug endpoints
+MAX_CONCURRENT_PROFILES = 4
+MAX_STACK_DEPTH = 128
+
+_ids = itertools.count(1)
+
+Frame = Tuple[str, str, int]  # function, file, first line
+
+_active: ContextVar[Tuple['StackSampler', ...]] = ContextVar('active_profiles', default=())
+
+
+class StackSampler:
+    """Counts the stacks of some threads at a fixed interval on a background thread.
+
+    Watches the given thread ids; profiled() work adds its worker thread
+    while it runs. Entering the sampler as a context manager makes it
+    active for work submitted from the current context. Given an asyncio
+    task (created on the calling thread's loop), the loop thread is only
+    sampled while that task is the one running, so other requests' handlers
+    on the same loop stay out of the profile.
+    """
+
+    def __init__(self, thread_ids: Optional[Iterable[int]] = None, interval: float = PROFILE_INTERVAL,
+                 task: Optional[asyncio.Task] = None):
+        self.thread_ids = set(thread_ids or [threading.get_ident()])
+        self.interval = interval
+        self.task = task
+        self._task_thread = threading.get_ident() if task is not None else None
+        self._token = None
+        self.samples: Counter = Counter()
+        self.started = self.stopped = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self) -> 'StackSampler':
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self) -> 'StackSampler':
+        self._stop.set()
+        self._thread.join()
+        self.stopped = time.perf_counter()
+        return self
+
+    def __enter__(self):
+        self._token = _active.set(_active.get() + (self,))
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        _active.reset(self._token)
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            for tid, frame in sys._current_frames().items():
+                if tid not in self.thread_ids:
+                    continue
+                if tid == self._task_thread and asyncio.current_task(self.task.get_loop()) is not self.task:
+                    continue  # the loop is idle or running another task
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                name = names.get(tid, str(tid))
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                self.samples[(name,) + tuple(reversed(stack))] += 1
+
+    @property
+    def duration(self) -> float:
+        end = self.stopped if self.stopped is not None else time.perf_counter()
+        return end - self.started if self.started is not None else 0.0
+
+
+def profiled(fn: Callable) -> Callable:
+    """Wrap fn, at submit time, so the thread that runs it joins the caller's active profiles"""
+    samplers = _active.get()
+    if not samplers:
+        return fn
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        tid = threading.get_ident()
+        joined = [s for s in samplers if tid not in s.thread_ids]
+        for sampler in joined:
+            sampler.thread_ids.add(tid)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            for sampler in joined:
+                sampler.thread_ids.discard(tid)
+    return run
+
+
+def _label(frame: Frame) -> str:
+    func, file, line = frame
+    return f"{func} ({os.path.basename(file)}:{line})"
+
+
+def to_collapsed(samples: Counter) -> str:
+    """One 'thread;outer;...;inner count' line per distinct stack"""
+    lines = []
+    for (thread, *stack), count in samples.most_common():
+        lines.append(';'.join([thread] + [_label(f).replace(';', ':') for f in stack]) + f' {count}')
+    return '\n'.join(lines) + '\n'
+
+
+def to_speedscope(samples: Counter, interval: float, name: str = 'profile') -> Dict[str, Any]:
+    """speedscope file-format document with one sampled profile per thread"""
+    frames: List[Dict[str, Any]] = []
+    frame_ids: Dict[Frame, int] = {}
+    per_thread: Dict[str, Tuple[list, list]] = {}
+    for (thread, *stack), count in samples.items():
+        ids = []
+        for f in stack:
+            if f not in frame_ids:
+                frame_ids[f] = len(frames)
+                frames.append({'name': f[0], 'file': f[1], 'line': f[2]})
+            ids.append(frame_ids[f])
+        thread_samples, weights = per_thread.setdefault(thread, ([], []))
+        thread_samples.append(ids)
+        weights.append(count * interval)
+    profiles = [{
+        'type': 'sampled', 'name': f'{name} [{thread}]', 'unit': 'seconds',
+        'startValue': 0, 'endValue': sum(weights), 'samples': thread_samples, 'weights': weights,
+    } for thread, (thread_samples, weights) in per_thread.items()]
+    return {
+        '$schema': 'https://www.speedscope.app/file-format-schema.json',
+        'name': name,
+        'exporter': 'backend.profiling',
+        'shared': {'frames': frames},
+        'profiles': profiles,
+    }
+
+
+class ProfileStore:
+    """The most recent finished profiles, by id"""
+
+    def __init__(self, size: int = PROFILE_HISTORY):
+        self._profiles: Deque[Dict[str, Any]] = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.active = 0
+
+    def try_begin(self) -> bool:
+        with self._lock:
+            if self.active >= MAX_CONCURRENT_PROFILES:
+                return False
+            self.active += 1
+            return True
+
+    def finish(self, profile_id: str, sampler: StackSampler, **meta) -> None:
+        with self._lock:
+            self.active -= 1
+            self._profiles.append(dict(meta, id=profile_id, duration=round(sampler.duration, 6),
+                                       interval=sampler.interval, n_samples=sum(sampler.samples.values()),
+                                       samples=sampler.samples))
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return next((p for p in self._profiles if p['id'] == profile_id), None)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{k: v for k, v in p.items() if k != 'samples'} for p in reversed(self._profiles)]
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """ASGI middleware sampling the stacks of selected requests.
+
+    Does nothing unless PROFILING_ENABLED; then a request is profiled when
+    it sends `X-Profile: 1` or is picked at PROFILE_SAMPLE_RATE. Profiled
+    responses carry an X-Profile-Id header naming the stored profile.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        for name, value in scope.get('headers', ()):
+            if name == b'x-profile':
+                return value.lower() in (b'1', b'true', b'yes')
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILING_ENABLED or scope['type'] != 'http' or not self._wanted(scope) \
+                or not profile_store.try_begin():
+            await self.app(scope, receive, send)
+            return
+        profile_id = str(next(_ids))
+        status = []
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+                message['headers'] = list(message.get('headers', [])) + [(b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        # The handler runs in this task on the event loop thread, which it shares with other requests
+        sampler = StackSampler([threading.get_ident()], task=asyncio.current_task())
+        try:
+            with sampler:
+                await self.app(scope, receive, send_with_id)
+        finally:
+            profile_store.finish(profile_id, sampler, method=scope.get('method'), path=scope.get('path'),
+                                 status=status[0] if status else None)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from backend.run_predict import DEFAULT_FIXTURES, run
+
+    parser = argparse.ArgumentParser(description='Profile a batch of predictions with the stack sampler')
+    parser.add_argument('--fixtures', help='JSON list of {match_id, home, away, context}; '
+                                           'defaults to the run_predict.py example')
+    parser.add_argument('--repeat', type=int, default=10, help='times to run the whole batch')
+    parser.add_argument('--interval', type=float, default=0.001, help='seconds between samples')
+    parser.add_argument('--format', choices=('speedscope', 'collapsed'), default='speedscope')
+    parser.add_argument('--output', default='predict.speedscope.json')
+    args = parser.parse_args(argv)
+
+    fixtures = DEFAULT_FIXTURES
+    if args.fixtures:
+        with open(args.fixtures) as f:
+            fixtures = json.load(f)
+    from backend.predictor import Predictor
+    predictor = Predictor()
+    predictor.load_models()
+
+    with StackSampler(interval=args.interval) as sampler:
+        for _ in range(args.repeat):
+            run(fixtures, predictor)
+    if args.format == 'collapsed':
+        output = to_collapsed(sampler.samples)
+    else:
+        output = json.dumps(to_speedscope(sampler.samples, sampler.interval, 'run_predict batch'))
+    with open(args.output, 'w') as f:
+        f.write(output)
+    n = sum(sampler.samples.values())
+    print(f"{args.repeat} x {len(fixtures)} predictions in {sampler.duration:.3f}s, "
+          f"{n} samples written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
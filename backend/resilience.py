@@ -0,0 +1,180 @@
+"""Fault handling for upstream API calls.
+
+Each upstream endpoint gets its own circuit breaker: after a run of
+transient failures it opens and calls fail immediately instead of waiting
+out timeouts, then lets a single trial call through once the reset timeout
+has passed. Transient errors (connection problems, timeouts, 429 and 5xx)
+are retried a bounded number of times with exponential backoff and full
+jitter, and a call can be hedged: if the first attempt is slow, a second
+identical request races it and the first answer wins.
+
+Code that has to fall back to stale or default data calls mark_degraded();
+request handlers collect those reasons with track_degradation() and report
+them on the response.
+"""
+import contextvars
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+from backend.profiling import profiled
+
+FAILURE_THRESHOLD = 5       # consecutive transient failures that open a breaker
+RESET_TIMEOUT = 30.0        # seconds an open breaker waits before a trial call
+RETRIES = 2                 # extra attempts for transient errors
+BACKOFF_BASE = 0.2          # seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_MAX = 2.0
+REQUEST_TIMEOUT = float(os.getenv('UPSTREAM_TIMEOUT', '5'))
+HEDGE_AFTER = float(os.getenv('UPSTREAM_HEDGE_AFTER', '1.0'))  # 0 disables hedging
+
+_hedge_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge')
+_degraded: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar('degraded', default=None)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while an endpoint's breaker is open"""
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial -> closed"""
+
+    def __init__(self, name: str, failure_threshold: int = FAILURE_THRESHOLD, reset_timeout: float = RESET_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.clock() - self.opened_at >= self.reset_timeout else 'open'
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; only one trial call while half-open"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial_running or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_running = False
+
+
+BREAKERS: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    with _breakers_lock:
+        if name not in BREAKERS:
+            BREAKERS[name] = CircuitBreaker(name)
+        return BREAKERS[name]
+
+
+def breaker_states() -> Dict[str, str]:
+    return {name: breaker.state for name, breaker in sorted(BREAKERS.items())}
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Errors worth retrying: network trouble, rate limiting, server errors"""
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(exc, requests.HTTPError) and exc.response is not None:
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return False
+
+
+def backoff_delay(attempt: int, rng: random.Random = random) -> float:
+    """Full-jitter exponential backoff"""
+    return rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def hedged(fn: Callable[[], Any], hedge_after: Optional[float]) -> Any:
+    """Run fn; if it has not finished after hedge_after seconds, race a second copy.
+
+    The first call to succeed wins; if both fail the last error is raised.
+    """
+    if not hedge_after:
+        return fn()
+    fn = profiled(fn)
+    pending = {_hedge_pool.submit(fn)}
+    done, pending = wait(pending, timeout=hedge_after)
+    if not done:
+        pending.add(_hedge_pool.submit(fn))
+    error = None
+    while True:
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not pending:
+            raise error
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+
+def call_upstream(endpoint: str, fn: Callable[[], Any], hedge_after: Optional[float] = HEDGE_AFTER,
+                  retries: int = RETRIES, sleep: Callable[[float], None] = time.sleep) -> Any:
+    """Call fn through the endpoint's circuit breaker with retries and optional hedging"""
+    breaker = get_breaker(endpoint)
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} circuit is open")
+        try:
+            result = hedged(fn, hedge_after)
+        except Exception as e:
+            if not is_transient(e):
+                # Upstream answered; the request itself is wrong
+                breaker.record_success()
+                raise
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            sleep(backoff_delay(attempt))
+        else:
+            breaker.record_success()
+            return result
+
+
+@contextmanager
+def track_degradation():
+    """Collect mark_degraded() reasons raised while handling one request"""
+    reasons: List[str] = []
+    token = _degraded.set(reasons)
+    try:
+        yield reasons
+    finally:
+        _degraded.reset(token)
+
+
+def mark_degraded(reason: str) -> None:
+    """Note that the current response is built from fallback or stale data"""
+    reasons = _degraded.get()
+    if reasons is not None and reason not in reasons:
+        reasons.append(reason)
+        print(f"[DEGRADED] {reason}")
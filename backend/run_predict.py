@@ -1,8 +1,21 @@
 import json
+from typing import Any, Dict, List, Optional
 from backend.predictor import Predictor
 
+DEFAULT_FIXTURES = [
+    {'match_id': 'm1', 'home': 'Man City', 'away': 'LowTown', 'context': {'star_player': 'Haaland'}},
+]
+
+
+def run(fixtures: List[Dict[str, Any]] = DEFAULT_FIXTURES, predictor: Optional[Predictor] = None) -> List[Dict]:
+    """Predict every fixture; builds and loads a Predictor unless one is given"""
+    if predictor is None:
+        predictor = Predictor()
+        predictor.load_models()
+    return [{'match_id': f['match_id'],
+             'candidates': predictor.predict_events(f['match_id'], f['home'], f['away'], f.get('context', {}))}
+            for f in fixtures]
+
+
 if __name__ == '__main__':
-    p = Predictor()
-    p.load_models()
-    results = p.predict_events('m1', 'Man City', 'LowTown', {'star_player': 'Haaland'})
-    print(json.dumps({'match_id': 'm1', 'candidates': results}, indent=2))
+    print(json.dumps(run()[0], indent=2))
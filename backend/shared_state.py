@@ -0,0 +1,232 @@
+"""State shared by every API worker process: snapshots, features and leases.
+
+Workers keep nothing they cannot rebuild from here, so any number of them
+(uvicorn --workers N, or replicas) serve the same data and one upstream
+refresh feeds them all. SHARED_STATE_URL picks the backend:
+
+- a file path (default backend/.cache/shared_state.sqlite3): sqlite in WAL
+  mode, for workers on one host and for tests
+- redis://host:port/db: Redis, for replicas on several hosts (needs the
+  optional `redis` package)
+- memory://: a plain dict, for a single process
+
+Leases (acquire/renew/release with an owner and a TTL) give single-flight
+refreshes and leader election on top of the same store.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from functools import lru_cache
+from typing import Any, Callable, List, Optional
+
+SHARED_STATE_URL = os.getenv('SHARED_STATE_URL',
+                             os.path.join(os.path.dirname(__file__), '.cache', 'shared_state.sqlite3'))
+
+# Identifies this process as a lease owner
+WORKER_ID = f"{os.uname().nodename}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class MemoryStore:
+    """Single-process store; the reference behaviour for the other backends"""
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._data = {}    # key -> (value, updated_at, expires_at)
+        self._leases = {}  # name -> (owner, expires_at)
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is not None and entry[2] is not None and entry[2] <= self.clock():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._live(key)
+        return None if entry is None else json.loads(entry[0])
+
+    def updated_at(self, key: str) -> Optional[float]:
+        with self._lock:
+            entry = self._live(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, updated_at: Optional[float] = None) -> None:
+        now = self.clock()
+        with self._lock:
+            self._data[key] = (json.dumps(value), now if updated_at is None else updated_at,
+                               None if ttl is None else now + ttl)
+
+    def keys(self, prefix: str) -> List[str]:
+        with self._lock:
+            return [k for k in list(self._data) if k.startswith(prefix) and self._live(k) is not None]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = self.clock()
+        with self._lock:
+            holder = self._leases.get(name)
+            if holder is None or holder[1] <= now or holder[0] == owner:
+                self._leases[name] = (owner, now + ttl)
+                return True
+            return False
+
+    def release_lease(self, name: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(name, (None,))[0] == owner:
+                del self._leases[name]
+
+
+class SqliteStore:
+    """Store in one sqlite file, shared by the processes of a host"""
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL,'
+                         ' updated_at REAL NOT NULL, expires_at REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL,'
+                         ' expires_at REAL NOT NULL)')
+            self._local.conn = conn
+        return conn
+
+    def _row(self, columns: str, key: str):
+        return self._conn().execute(
+            f'SELECT {columns} FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (key, self.clock())).fetchone()
+
+    def get(self, key: str) -> Optional[Any]:
+        row = self._row('value', key)
+        return None if row is None else json.loads(row[0])
+
+    def updated_at(self, key: str) -> Optional[float]:
+        row = self._row('updated_at', key)
+        return None if row is None else row[0]
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, updated_at: Optional[float] = None) -> None:
+        now = self.clock()
+        self._conn().execute(
+            'INSERT OR REPLACE INTO kv (key, value, updated_at, expires_at) VALUES (?, ?, ?, ?)',
+            (key, json.dumps(value), now if updated_at is None else updated_at, None if ttl is None else now + ttl))
+
+    def keys(self, prefix: str) -> List[str]:
+        rows = self._conn().execute(
+            'SELECT key FROM kv WHERE key >= ? AND key < ? AND (expires_at IS NULL OR expires_at > ?)',
+            (prefix, prefix + '\uffff', self.clock())).fetchall()
+        return [r[0] for r in rows]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        now = self.clock()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row is None or row[1] <= now or row[0] == owner:
+                conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                             (name, owner, now + ttl))
+                acquired = True
+            else:
+                acquired = False
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return acquired
+
+    def release_lease(self, name: str, owner: str) -> None:
+        self._conn().execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+
+class RedisStore:
+    """Store in Redis, shared by replicas on any host"""
+
+    def __init__(self, url: str):
+        import redis  # optional dependency
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self.client.get(key)
+        return None if value is None else json.loads(value)
+
+    def updated_at(self, key: str) -> Optional[float]:
+        value = self.client.get(f'{key}:updated_at')
+        return None if value is None else float(value)
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None, updated_at: Optional[float] = None) -> None:
+        px = None if ttl is None else int(ttl * 1000)
+        pipe = self.client.pipeline()
+        pipe.set(key, json.dumps(value), px=px)
+        pipe.set(f'{key}:updated_at', time.time() if updated_at is None else updated_at, px=px)
+        pipe.execute()
+
+    def keys(self, prefix: str) -> List[str]:
+        return [k.decode() for k in self.client.scan_iter(match=f'{prefix}*')
+                if not k.endswith(b':updated_at')]
+
+    # Renew only while still the owner; compare-and-set in one round trip
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        key = f'lease:{name}'
+        if self.client.set(key, owner, nx=True, px=int(ttl * 1000)):
+            return True
+        return bool(self.client.eval(self._RENEW, 1, key, owner, int(ttl * 1000)))
+
+    def release_lease(self, name: str, owner: str) -> None:
+        self.client.eval(self._RELEASE, 1, f'lease:{name}', owner)
+
+
+def open_store(url: str):
+    if url.startswith('memory://'):
+        return MemoryStore()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisStore(url)
+    return SqliteStore(url[len('sqlite://'):] if url.startswith('sqlite://') else url)
+
+
+@lru_cache(maxsize=None)
+def get_shared_store():
+    """Process-wide shared store selected by SHARED_STATE_URL"""
+    return open_store(SHARED_STATE_URL or 'memory://')
+
+
+class LeaderLease:
+    """Leader election over a store lease: whoever holds it runs the scheduled work.
+
+    Call renew() more often than ttl; a leader that stops renewing (crash,
+    hang) loses the lease after ttl and another worker takes over.
+    """
+
+    def __init__(self, store, name: str, owner: str = WORKER_ID, ttl: float = 15.0):
+        self.store = store
+        self.name = name
+        self.owner = owner
+        self.ttl = ttl
+        self.is_leader = False
+
+    def renew(self) -> bool:
+        try:
+            self.is_leader = self.store.acquire_lease(self.name, self.owner, self.ttl)
+        except Exception as e:
+            print(f"[LEADER] Could not renew {self.name}: {e}")
+            self.is_leader = False
+        return self.is_leader
+
+    def release(self) -> None:
+        if self.is_leader:
+            self.store.release_lease(self.name, self.owner)
+            self.is_leader = False
@@ -0,0 +1,190 @@
+"""Simultaneous fractional-Kelly staking for a slate of bets.
+
+Every positive-EV candidate of a matchday is staked at once. Each bet's own
+log-growth is kept exact, and bets on the same match are coupled through a
+covariance penalty (second-order log-growth). Mutually exclusive outcomes of
+one market (home/draw/away, over/under a line, correct scores, winning
+margins, HT/FT) get their exact negative correlation, so hedges are not
+penalised; bets on different markets of a game get a configured positive
+one, so stacking them costs more than spreading them.
+The problem is solved with damped diagonal-Newton steps over all bets at once,
+with exposure caps per match, per league and in total enforced after every
+step. Stakes are fractions of the current bankroll.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+
+KELLY_FRACTION = 0.25
+MAX_MATCH_EXPOSURE = 0.10   # share of bankroll staked on one match
+MAX_LEAGUE_EXPOSURE = 0.25  # ... on one league
+MAX_TOTAL_EXPOSURE = 0.50   # ... on the whole slate
+SAME_MATCH_CORRELATION = 0.5
+MAX_BET_FRACTION = 0.99     # keeps a single losing bet from wiping out log-growth
+
+
+def kelly_fraction(prob: float, odds: float) -> float:
+    """Full Kelly stake for one isolated bet at decimal odds"""
+    if odds <= 1.0:
+        return 0.0
+    return max((prob * odds - 1.0) / (odds - 1.0), 0.0)
+
+
+def _group_ids(keys: Sequence[Any]) -> np.ndarray:
+    ids = {}
+    return np.fromiter((ids.setdefault(k, len(ids)) for k in keys), dtype=np.int64, count=len(keys))
+
+
+def _market_group(market: Optional[str]) -> Optional[str]:
+    """Outcomes sharing a group are mutually exclusive results of one market"""
+    if not market:
+        return None
+    if market in ('home_win', 'draw', 'away_win'):
+        return '1x2'
+    for prefix in ('cs_', 'margin_', 'htft_', 'btts_'):
+        if market.startswith(prefix):
+            return prefix[:-1]
+    side = ''
+    for team in ('home_', 'away_'):
+        if market.startswith(team):
+            side, market = team, market[len(team):]
+    for prefix in ('over_', 'under_'):
+        if market.startswith(prefix):
+            return side + 'total_' + market[len(prefix):]
+    return side + market
+
+
+def _same_match_pairs(match: np.ndarray, prob: np.ndarray, markets: Optional[Sequence[Optional[str]]],
+                      correlation: float):
+    """Index pairs (i < j) of bets on the same match and each pair's correlation"""
+    order = np.argsort(match, kind='stable')
+    starts = np.flatnonzero(np.r_[True, match[order][1:] != match[order][:-1], True])
+    left, right = [], []
+    for a, b in zip(starts[:-1], starts[1:]):
+        if b - a > 1:
+            i, j = np.triu_indices(b - a, 1)
+            left.append(order[a:b][i])
+            right.append(order[a:b][j])
+    if not left:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    left, right = np.concatenate(left), np.concatenate(right)
+    rho = np.full(left.size, float(correlation))
+    if markets is not None:
+        groups = [_market_group(m) for m in markets]
+        names = list(markets)
+        exclusive = np.fromiter((groups[i] is not None and groups[i] == groups[j] and names[i] != names[j]
+                                 for i, j in zip(left.tolist(), right.tolist())), dtype=bool, count=left.size)
+        p_i, p_j = prob[left], prob[right]
+        odds_ratio = p_i * p_j / np.maximum((1.0 - p_i) * (1.0 - p_j), 1e-12)
+        rho[exclusive] = -np.sqrt(odds_ratio)[exclusive]
+    return left, right, rho
+
+
+def _apply_caps(x: np.ndarray, groups: List[np.ndarray], caps: List[float]) -> np.ndarray:
+    """Scale stakes down proportionally wherever a group's total is over its cap"""
+    for ids, cap in zip(groups, caps):
+        totals = np.bincount(ids, weights=x)
+        scale = np.minimum(1.0, cap / np.maximum(totals, 1e-12))
+        x = x * scale[ids]
+    return x
+
+
+def kelly_stakes(prob, odds, match_ids: Sequence[Any], leagues: Optional[Sequence[Any]] = None,
+                 markets: Optional[Sequence[Optional[str]]] = None, fraction: float = KELLY_FRACTION,
+                 correlation: float = SAME_MATCH_CORRELATION,
+                 max_match: float = MAX_MATCH_EXPOSURE, max_league: float = MAX_LEAGUE_EXPOSURE,
+                 max_total: float = MAX_TOTAL_EXPOSURE, iterations: int = 200, tol: float = 1e-8) -> np.ndarray:
+    """Bankroll fractions for many simultaneous bets.
+
+    Bets with EV <= 0 get nothing. `markets` names each bet's outcome
+    (home_win, over_2.5, ...) so exclusive outcomes of one match are
+    recognised; without it every same-match pair uses `correlation`.
+    The problem is solved for full Kelly with every cap divided by
+    `fraction`, then scaled back down, so the result is the fractional-Kelly
+    allocation and respects the caps as given.
+    """
+    prob = np.asarray(prob, dtype=float)
+    odds = np.asarray(odds, dtype=float)
+    n = prob.size
+    if n == 0:
+        return np.zeros(0)
+    if leagues is None:
+        leagues = [None] * n
+    match = _group_ids(match_ids)
+    groups = [match, _group_ids(leagues), np.zeros(n, dtype=np.int64)]
+    caps = [max_match / fraction, max_league / fraction, max_total / fraction]
+
+    left, right, rho = _same_match_pairs(match, prob, markets, correlation)
+
+    win = np.maximum(odds - 1.0, 1e-9)
+    active = prob * odds > 1.0
+    sd = odds * np.sqrt(prob * (1.0 - prob))
+    x = np.where(active, np.clip((prob * odds - 1.0) / win, 0.0, MAX_BET_FRACTION), 0.0)
+    x = _apply_caps(x, groups, caps)
+
+    for _ in range(iterations):
+        # Risk from the other bets on the same match: sd_i * sum_{j != i} rho_ij sd_j x_j
+        others = (np.bincount(left, weights=rho * sd[right] * x[right], minlength=n)
+                  + np.bincount(right, weights=rho * sd[left] * x[left], minlength=n))
+        grad = prob * win / (1.0 + x * win) - (1.0 - prob) / (1.0 - x) - sd * others
+        curv = (prob * win ** 2 / (1.0 + x * win) ** 2 + (1.0 - prob) / (1.0 - x) ** 2
+                + sd * (np.bincount(left, weights=np.abs(rho) * sd[right], minlength=n)
+                        + np.bincount(right, weights=np.abs(rho) * sd[left], minlength=n)))
+        step = 0.5 * grad / curv
+        new = np.where(active, np.clip(x + step, 0.0, MAX_BET_FRACTION), 0.0)
+        new = _apply_caps(new, groups, caps)
+        done = np.max(np.abs(new - x)) < tol
+        x = new
+        if done:
+            break
+    return x * fraction
+
+
+def stake_candidates(candidates: List[Dict[str, Any]], bankroll: float, **kwargs) -> List[Dict[str, Any]]:
+    """Stake a slate of candidate dicts (match_id, prob, odds, optional league).
+
+    Returns copies of the positive-stake candidates with 'fraction' and
+    'stake' added, largest stake first. Keyword arguments go to kelly_stakes.
+    """
+    if not candidates:
+        return []
+    fractions = kelly_stakes(
+        [c['prob'] for c in candidates],
+        [c['odds'] for c in candidates],
+        [c['match_id'] for c in candidates],
+        [c.get('league') for c in candidates],
+        [c.get('market') for c in candidates],
+        **kwargs,
+    )
+    staked = []
+    for c, f in zip(candidates, fractions):
+        if f > 1e-6:
+            staked.append(dict(c, fraction=round(float(f), 5), stake=round(float(f) * bankroll, 2)))
+    staked.sort(key=lambda c: c['stake'], reverse=True)
+    return staked
+
+
+def simulate_bankroll(rounds: List[Dict[str, Any]], bankroll: float = 100.0, n_paths: int = 1,
+                      seed: Optional[int] = None, **kwargs) -> np.ndarray:
+    """Bankroll after each round of bets, shape (n_paths, len(rounds) + 1).
+
+    Each round is a dict of equal-length sequences: prob, odds, match_id,
+    optional league, optional market and optional won (0/1 results for a backtest). Rounds
+    without results are drawn from prob, one draw per path, so many paths
+    give the distribution of outcomes under the model. Stakes are
+    re-computed from the current bankroll every round.
+    """
+    rng = np.random.default_rng(seed)
+    paths = np.empty((n_paths, len(rounds) + 1))
+    paths[:, 0] = bankroll
+    for i, rnd in enumerate(rounds):
+        prob = np.asarray(rnd['prob'], dtype=float)
+        odds = np.asarray(rnd['odds'], dtype=float)
+        fractions = kelly_stakes(prob, odds, rnd['match_id'], rnd.get('league'), rnd.get('market'), **kwargs)
+        if rnd.get('won') is not None:
+            won = np.broadcast_to(np.asarray(rnd['won'], dtype=float), (n_paths, prob.size))
+        else:
+            won = rng.random((n_paths, prob.size)) < prob
+        growth = 1.0 + (fractions * (won * odds - 1.0)).sum(axis=1)
+        paths[:, i + 1] = paths[:, i] * growth
+    return paths
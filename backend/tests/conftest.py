@@ -0,0 +1,17 @@
+import os
+
+# Keep test runs out of the developer's shared worker state and odds history
+os.environ.setdefault('SHARED_STATE_URL', 'memory://')
+os.environ.setdefault('ODDS_HISTORY_DIR', '')
+
+
+class ConstantMatchModel:
+    """Match-result model double: the same H/D/A probabilities for every fixture"""
+    classes_ = ['A', 'D', 'H']
+
+    def __init__(self, home: float, draw: float, away: float):
+        self.probs = [away, draw, home]
+
+    def predict_proba(self, frame):
+        import numpy as np
+        return np.array([self.probs] * len(frame))
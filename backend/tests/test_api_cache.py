@@ -0,0 +1,79 @@
+import pytest
+from backend import api_clients
+from backend.api_cache import ResponseCache
+from backend.api_clients import FootballDataAPI, OddsAPI
+from backend.predictor import Predictor
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+def _match(home_id, home, away_id, away, status='FINISHED'):
+    return {'homeTeam': {'id': home_id, 'name': home}, 'awayTeam': {'id': away_id, 'name': away},
+            'status': status, 'score': {'fullTime': {'home': 2, 'away': 1}}}
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    calls = []
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        calls.append(url)
+        if url.endswith('/head2head'):
+            return FakeResponse({'matches': [_match(1, 'A', 2, 'B')]})
+        if '/teams/' in url:
+            return FakeResponse({'matches': [_match(1, 'A', 2, 'B')]})
+        return FakeResponse([])
+
+    monkeypatch.setattr(api_clients.requests, 'get', fake_get)
+    return calls
+
+
+def test_ttl_expiry(tmp_path):
+    now = [1000.0]
+    cache = ResponseCache(str(tmp_path / 'c.sqlite3'), clock=lambda: now[0])
+    cache.set('odds', {'sport': 'x'}, [1, 2], ttl=60)
+    cache.set('head2head', {'id': 1}, {'matches': []}, ttl=None)
+    assert cache.get('odds', {'sport': 'x'}) == [1, 2]
+    now[0] += 61
+    assert cache.get('odds', {'sport': 'x'}) is None
+    assert cache.get('odds', {'sport': 'x'}, allow_stale=True) == [1, 2]
+    assert cache.get('head2head', {'id': 1}) == {'matches': []}
+    assert cache.purge_expired() == 1
+
+
+def test_api_key_not_part_of_key():
+    assert ResponseCache.make_key('odds', {'apiKey': 'a', 'regions': 'uk'}) == \
+        ResponseCache.make_key('odds', {'apiKey': 'b', 'regions': 'uk'})
+
+
+def test_finished_h2h_never_expires(tmp_path, upstream):
+    now = [1000.0]
+    cache = ResponseCache(str(tmp_path / 'c.sqlite3'), clock=lambda: now[0])
+    api = FootballDataAPI(cache=cache)
+    api.get_head_to_head(42)
+    api.get_team_matches(1)
+    now[0] += 365 * 24 * 3600
+    api.get_head_to_head(42)
+    api.get_team_matches(1)
+    assert [u.endswith('/head2head') for u in upstream] == [True, False, False]
+
+
+def test_warm_restart_predicts_without_upstream_calls(tmp_path, upstream):
+    path = str(tmp_path / 'c.sqlite3')
+    cold = Predictor(FootballDataAPI(ResponseCache(path)), OddsAPI(ResponseCache(path)))
+    cold.predict_events('m1', 'A', 'B', {'real_match_id': 42})
+    assert len(upstream) == 3  # h2h + both teams' recent matches
+
+    upstream.clear()
+    warm = Predictor(FootballDataAPI(ResponseCache(path)), OddsAPI(ResponseCache(path)))
+    warm.predict_events('m1', 'A', 'B', {'real_match_id': 42})
+    assert upstream == []
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+from backend import train
+from backend.calibration import Calibrator, fit_calibration, historical_market_probs
+from backend.predictor import Predictor
+from backend.tests.conftest import ConstantMatchModel
+
+
+def test_apply_interpolates_each_market_independently():
+    cal = Calibrator({
+        'over_2.5': ([0.2, 0.8], [0.3, 0.7]),
+        'draw': ([0.1, 0.5], [0.15, 0.25]),
+    })
+    out = cal.apply(['over_2.5', 'draw', 'draw', 'unknown', 'over_2.5'], [0.5, 0.3, 0.9, 0.42, 0.0])
+    np.testing.assert_allclose(out, [0.5, 0.2, 0.25, 0.42, 0.3])
+
+
+def test_exclusive_outcomes_still_sum_to_one():
+    cal = Calibrator({'over_2.5': ([0.0, 1.0], [0.1, 0.7]), 'btts_yes': ([0.0, 1.0], [0.2, 0.9]),
+                      'home_win': ([0.0, 1.0], [0.0, 0.8])})
+    events = [{'market': m, 'prob': p, 'odds': 2.0} for m, p in [
+        ('over_2.5', 0.55), ('under_2.5', 0.45), ('btts_yes', 0.5), ('btts_no', 0.5),
+        ('home_win', 0.5), ('draw', 0.25), ('away_win', 0.25), ('over_1.5', 0.75)]]
+    probs = {e['market']: e['prob'] for e in cal.calibrate_events(events)}
+    for group in (('over_2.5', 'under_2.5'), ('btts_yes', 'btts_no'), ('home_win', 'draw', 'away_win')):
+        assert abs(sum(probs[m] for m in group) - 1) <= 1e-3
+    assert abs(probs['over_2.5'] - 0.43 / 0.88) <= 1e-3
+    # A lone side of a line has nothing to be normalized against
+    assert probs['over_1.5'] == 0.75
+
+
+def test_round_trip(tmp_path):
+    cal = Calibrator({'btts_yes': ([0.1, 0.9], [0.2, 0.8])}, {'method': 'isotonic'})
+    path = str(tmp_path / 'cal.json')
+    cal.save(path)
+    loaded = Calibrator.load(path)
+    assert loaded.metadata == {'method': 'isotonic'}
+    np.testing.assert_allclose(loaded.apply(['btts_yes'], [0.5]), [0.5])
+
+
+def test_historical_probs_match_predictor():
+    """The offline replay must use the same raw probabilities as serving"""
+    p = Predictor()
+    features = p._analyze_match_statistics('A', 'B', None, {})
+    frame = pd.DataFrame([{
+        'home_gf': features['home_goals_avg'], 'home_ga': features['home_conceded_avg'],
+        'away_gf': features['away_goals_avg'], 'away_ga': features['away_conceded_avg'],
+        'home_cs': features['home_clean_sheet_pct'], 'away_cs': features['away_clean_sheet_pct'],
+        'home_goals': 1, 'away_goals': 1,
+    }])
+    probs = historical_market_probs(frame)
+    served = {e['market']: e['prob'] for e in p._analyze_match_result(features, {}, 'A', 'B', {})}
+    served.update({e['market']: e['prob'] for e in p._analyze_btts(features, {})})
+    served['over_2.5'] = p._poisson_over(features['total_xg'], 2.5)
+    for market, prob in served.items():
+        assert abs(probs[market][0][0] - prob) < 1e-3, market
+
+
+def test_fit_and_serve(tmp_path):
+    csv_path = tmp_path / 'matches.csv'
+    train.make_synthetic_match_history(n_teams=10, n_seasons=3).to_csv(csv_path, index=False)
+    cal = fit_calibration(str(csv_path), min_samples=100)
+    assert {'home_win', 'draw', 'away_win', 'over_2.5', 'btts_yes'} <= set(cal.maps)
+    for x, y in cal.maps.values():
+        assert np.all(np.diff(x) >= 0) and np.all(np.diff(y) >= -1e-9)
+
+    p = Predictor()
+    p.models = {'calibration': cal}
+    results = p.predict_events('m1', 'A', 'B', {})
+    result_probs = [r['prob'] for r in results if r['market'] in ('home_win', 'draw', 'away_win')]
+    assert len(result_probs) == 3 and abs(sum(result_probs) - 1.0) < 0.01
+    for r in results:
+        assert abs(r['ev'] - (r['prob'] * r['odds'] - 1.0)) < 0.01
+
+
+def test_calibration_applies_to_the_poisson_leg_before_the_blend():
+    from backend.predictor import MATCH_MODEL, MATCH_MODEL_BLEND
+    p = Predictor()
+    features = p._analyze_match_statistics('A', 'B', None, {})
+    raw = {e['market']: e['prob'] for e in p._analyze_match_result(features, {}, 'A', 'B', {})}
+    # Squash every 1X2 probability towards a third
+    squash = ([0.0, 1.0], [0.3, 0.36])
+    cal = Calibrator({m: squash for m in ('home_win', 'draw', 'away_win')})
+    p.models = {'calibration': cal, MATCH_MODEL: ConstantMatchModel(home=0.5, draw=0.3, away=0.2)}
+    served = {e['market']: e['prob'] for e in p.predict_events('m1', 'A', 'B', {})
+              if e['market'] in ('home_win', 'draw', 'away_win')}
+    poisson = {m: 0.3 + 0.06 * raw[m] for m in raw}
+    total = sum(poisson.values())
+    w = MATCH_MODEL_BLEND
+    for market, label in (('home_win', 'H'), ('draw', 'D'), ('away_win', 'A')):
+        expected = (1 - w) * poisson[market] / total + w * {'H': 0.5, 'D': 0.3, 'A': 0.2}[label]
+        assert abs(served[market] - expected) < 2e-3, market
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from backend import engines
+from backend.app import main
+from backend.odds import process_odds, to_odds_data
+
+
+def test_registry_lookups():
+    assert [lg.code for lg in engines.resolve_leagues('ALL')] == ['PL', 'PD', 'BL1', 'SA', 'FL1']
+    assert engines.engine_for_league('NBA') is engines.BASKETBALL
+    assert engines.engine_for_league('DED') is engines.FOOTBALL
+    assert engines.engine_for_league(None) is engines.FOOTBALL
+    assert engines.LEAGUES['SA'].odds_sport_key == 'soccer_italy_serie_a'
+
+
+def test_engines_load_independently():
+    engine = engines.SportEngine('test', 'test', 'normal', ['h2h'], 'backend.basketball:BasketballPredictor',
+                                 [engines.League('TST', 'Test', 'test', 'test_key')])
+    assert not engine.loaded and engine._predictor is None
+    predictor = engine.ensure_loaded()
+    assert engine.loaded and engine.ensure_loaded() is predictor
+
+
+def test_basketball_prices_from_consensus():
+    payload = [{'id': 'g1', 'home_team': 'Celtics', 'away_team': 'Knicks', 'bookmakers': [{'key': 'a', 'markets': [
+        {'key': 'h2h', 'outcomes': [{'name': 'Celtics', 'price': 1.5}, {'name': 'Knicks', 'price': 2.7}]},
+        {'key': 'spreads', 'outcomes': [{'name': 'Celtics', 'price': 1.91, 'point': -5.5},
+                                        {'name': 'Knicks', 'price': 1.91, 'point': 5.5}]},
+        {'key': 'totals', 'outcomes': [{'name': 'Over', 'price': 1.91, 'point': 224.5},
+                                       {'name': 'Under', 'price': 1.91, 'point': 224.5}]},
+    ]}]}]
+    odds_data = to_odds_data(process_odds(payload)['g1'])
+    assert odds_data['total_line'] == 224.5 and odds_data['home_spread_line'] == -5.5
+    predictor = engines.BASKETBALL.ensure_loaded()
+    events = {e['market']: e for e in predictor.predict_events('g1', 'Celtics', 'Knicks', {'odds_data': odds_data})}
+    assert abs(events['home_win']['prob'] - odds_data['market_prob_home']) < 0.01
+    assert abs(events['over_total']['prob'] + events['under_total']['prob'] - 1.0) < 0.01
+    assert {'home_spread', 'away_spread'} <= set(events)
+
+
+def test_matches_fetch_odds_per_sport_key(monkeypatch):
+    kickoff = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+    odds_calls = []
+
+    def fake_odds(sport='soccer_epl', markets='h2h,spreads,totals'):
+        odds_calls.append(sport)
+        if sport == 'soccer_spain_la_liga':
+            return [{'id': 'o1', 'home_team': 'Sevilla', 'away_team': 'Betis', 'bookmakers': [{'key': 'a', 'markets': [
+                {'key': 'h2h', 'outcomes': [{'name': 'Sevilla', 'price': 2.0}, {'name': 'Draw', 'price': 3.3},
+                                            {'name': 'Betis', 'price': 3.9}]}]}]}]
+        if sport == 'basketball_nba':
+            return [{'id': 'n1', 'home_team': 'Celtics', 'away_team': 'Knicks', 'commence_time': kickoff,
+                     'bookmakers': []}]
+        return []
+
+    def fake_fixtures(league='PL', days_ahead=7):
+        if league == 'PD':
+            return [{'id': 1, 'home_team': 'Sevilla', 'away_team': 'Betis', 'date': kickoff, 'competition': 'La Liga'}]
+        return []
+
+    monkeypatch.setattr(main.odds_api, 'get_odds', fake_odds)
+    monkeypatch.setattr(main.football_api, 'get_upcoming_matches', fake_fixtures)
+    now = datetime.now(timezone.utc)
+
+    result = asyncio.run(main._fetch_matches('ALL', 3, now))
+    assert sorted(odds_calls) == sorted(lg.odds_sport_key for lg in engines.resolve_leagues('ALL'))
+    assert result['total'] == 1 and result['matches'][0]['odds']['Home'] == 2.0
+    assert result['matches'][0]['league'] == 'PD'
+
+    odds_calls.clear()
+    nba = asyncio.run(main._fetch_matches('NBA', 3, now))
+    assert odds_calls == ['basketball_nba']
+    assert nba['matches'][0]['sport'] == 'basketball' and nba['matches'][0]['id'] == 'n1'
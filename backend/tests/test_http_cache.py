@@ -0,0 +1,53 @@
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from backend.app import main
+
+client = TestClient(main.app)
+
+
+def _seed(n=200):
+    matches = [{'id': i, 'home_team': f'Home {i}', 'away_team': f'Away {i}', 'date': '2026-10-20T15:00:00Z',
+                'competition': 'Premier League', 'odds': {'Home': 2.1, 'Draw': 3.4, 'Away': 3.9}}
+               for i in range(n)]
+    main.matches_cache['PL_7'] = {'matches': matches, 'total': n}
+    main.cache_timestamp['PL_7'] = datetime.now(timezone.utc)
+
+
+def test_matches_conditional_get():
+    _seed()
+    first = client.get('/matches', params={'league': 'PL', 'days': 7})
+    assert first.status_code == 200
+    assert first.json()['total'] == 200
+    etag = first.headers['etag']
+    assert 'max-age=' in first.headers['cache-control']
+
+    again = client.get('/matches', params={'league': 'PL', 'days': 7}, headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.content == b''
+
+    since = client.get('/matches', params={'league': 'PL', 'days': 7},
+                       headers={'If-Modified-Since': first.headers['last-modified']})
+    assert since.status_code == 304
+
+    # A refreshed cache entry gets a new version
+    _seed()
+    main.cache_timestamp['PL_7'] = main.cache_timestamp['PL_7'].replace(year=2100)
+    changed = client.get('/matches', params={'league': 'PL', 'days': 7}, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+
+
+def test_matches_pagination_and_fields():
+    _seed()
+    resp = client.get('/matches', params={'league': 'PL', 'days': 7, 'offset': 10, 'limit': 5,
+                                           'fields': 'id,home_team'})
+    body = resp.json()
+    assert body['total'] == 200 and body['offset'] == 10 and body['limit'] == 5
+    assert body['matches'] == [{'id': i, 'home_team': f'Home {i}'} for i in range(10, 15)]
+    full = client.get('/matches', params={'league': 'PL', 'days': 7})
+    assert resp.headers['etag'] != full.headers['etag']
+
+
+def test_matches_compressed():
+    _seed()
+    resp = client.get('/matches', params={'league': 'PL', 'days': 7}, headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['content-encoding'] in ('gzip', 'br')
+    assert resp.num_bytes_downloaded < len(resp.content) / 3
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from backend import inplay, markets
+from backend.app import main
+from backend.bench.inplay import replay
+from backend.inplay import InPlayEngine
+
+
+def _engine(*matches):
+    engine = InPlayEngine(capacity=1)
+    for i, (h, a) in enumerate(matches):
+        engine.add_match(f'm{i}', h, a)
+    engine.recompute()
+    return engine
+
+
+def _prob(engine, match_id, market):
+    return engine.win[engine.index[match_id], engine.names.index(market)]
+
+
+def test_kickoff_prices_match_the_pre_match_book():
+    engine = _engine((1.5, 1.1), (0.7, 2.0))
+    book = markets.generate_markets([1.5, 0.7], [1.1, 2.0])
+    for market in ('cs_1-0', 'ah_home_-0.5', 'away_over_1.5', 'htft_H/H', 'htft_D/A', 'dc_X2'):
+        for i in range(2):
+            assert abs(_prob(engine, f'm{i}', market) - book.win[i, book.index(market)]) < 1e-6
+    htft = [engine.names.index(n) for n in inplay.htft_names()]
+    assert np.allclose(engine.win[:2, htft].sum(axis=1), 1.0)
+
+
+def test_only_changed_matches_are_recomputed():
+    engine = _engine((1.5, 1.1), (1.2, 1.2), (0.9, 1.4))
+    state = {'match_id': 'm1', 'minute': 20, 'home_goals': 0, 'away_goals': 0}
+    engine.apply([state])
+    before = engine.win.copy()
+    assert engine.recompute() == 1
+    changed = np.flatnonzero((engine.win != before).any(axis=1))
+    assert changed.tolist() == [1]
+    engine.apply([state])  # same state again: nothing to do
+    assert engine.recompute() == 0
+    # Time passing without goals favours unders and the draw
+    assert _prob(engine, 'm1', 'under_2.5') > before[1, engine.names.index('under_2.5')]
+
+
+def test_goals_settle_markets_which_stay_frozen():
+    engine = _engine((1.5, 1.1))
+    engine.apply([{'match_id': 'm0', 'minute': 30, 'home_goals': 1, 'away_goals': 1}])
+    engine.recompute()
+    row, col = 0, engine.names.index
+    assert engine.settled[row, col('over_1.5')] and _prob(engine, 'm0', 'over_1.5') == 1.0
+    assert engine.settled[row, col('btts_yes')] and _prob(engine, 'm0', 'btts_no') == 0.0
+    assert engine.settled[row, col('cs_0-0')] and _prob(engine, 'm0', 'cs_0-0') == 0.0
+    assert not engine.settled[row, col('cs_1-1')] and not engine.settled[row, col('home_win')]
+    settled = engine.settled[row].copy()
+    frozen = engine.win[row, settled].copy()
+    engine.apply([{'match_id': 'm0', 'minute': 60, 'home_goals': 1, 'away_goals': 1}])
+    engine.recompute()
+    assert np.array_equal(engine.win[row, settled], frozen)
+
+    # A goal ruled out reopens what it had settled
+    engine.apply([{'match_id': 'm0', 'minute': 61, 'home_goals': 1, 'away_goals': 0}])
+    engine.recompute()
+    assert not engine.settled[row, col('btts_yes')] and 0 < _prob(engine, 'm0', 'btts_yes') < 1
+
+
+def test_red_card_shifts_rates():
+    engine = _engine((1.4, 1.4), (1.4, 1.4))
+    engine.apply([{'match_id': 'm0', 'minute': 30, 'home_goals': 0, 'away_goals': 0},
+                  {'match_id': 'm1', 'minute': 30, 'home_goals': 0, 'away_goals': 0, 'home_reds': 1}])
+    engine.recompute()
+    first, second = engine.remaining_xg(np.array([0, 1]))
+    left = first + second
+    assert left[1, 0] < left[0, 0] and left[1, 1] > left[0, 1]
+    assert _prob(engine, 'm1', 'home_win') < _prob(engine, 'm0', 'home_win')
+
+
+def test_half_time_and_full_time_settlement():
+    engine = _engine((1.5, 1.1))
+    engine.apply([{'match_id': 'm0', 'minute': 45, 'status': 'HT', 'home_goals': 1, 'away_goals': 0}])
+    engine.recompute()
+    htft = {n: _prob(engine, 'm0', n) for n in inplay.htft_names()}
+    assert abs(sum(htft.values()) - 1) < 1e-9
+    assert all(p == 0 for n, p in htft.items() if not n.startswith('htft_H/'))
+    assert abs(htft['htft_H/H'] - _prob(engine, 'm0', 'home_win')) < 1e-9
+    # The half-time score stays put while the second half changes the score
+    engine.apply([{'match_id': 'm0', 'minute': 90, 'status': 'FT', 'home_goals': 1, 'away_goals': 2}])
+    engine.recompute()
+    assert engine.settled[0].all()
+    assert _prob(engine, 'm0', 'htft_H/A') == 1.0 and _prob(engine, 'm0', 'away_win') == 1.0
+    assert _prob(engine, 'm0', 'ah_home_+1') == 0.0 and engine.push[0, engine.names.index('ah_home_+1')] == 1.0
+    assert engine.state('m0')['ht_home_goals'] == 1
+
+
+def test_half_time_score_is_only_inferred_from_an_observed_first_half():
+    engine = _engine((1.5, 1.1), (1.5, 1.1))
+    # m0 is first seen after the break: its half-time score is unknown
+    engine.apply([{'match_id': 'm0', 'minute': 50, 'status': '2H', 'home_goals': 2, 'away_goals': 0},
+                  {'match_id': 'm1', 'minute': 30, 'home_goals': 1, 'away_goals': 0}])
+    engine.apply([{'match_id': 'm1', 'minute': 50, 'status': '2H', 'home_goals': 2, 'away_goals': 0}])
+    engine.recompute()
+    assert 'ht_home_goals' not in engine.state('m0') and engine.state('m1')['ht_home_goals'] == 1
+    assert np.isnan(_prob(engine, 'm0', 'htft_H/H'))
+    assert engine.snapshot('m0')['markets']['htft_H/H'] == {'prob': None, 'settled': True, 'available': False}
+    assert _prob(engine, 'm1', 'htft_H/H') > 0.5 and _prob(engine, 'm1', 'htft_D/H') == 0.0
+    engine.apply([{'match_id': 'm0', 'minute': 90, 'status': 'FT', 'home_goals': 2, 'away_goals': 0}])
+    engine.recompute()
+    assert np.isnan(_prob(engine, 'm0', 'htft_H/H'))
+    # A later state carrying the half-time score prices and settles HT/FT
+    engine.apply([{'match_id': 'm0', 'minute': 90, 'status': 'FT', 'home_goals': 2, 'away_goals': 0,
+                   'ht_home_goals': 0, 'ht_away_goals': 0}])
+    engine.recompute()
+    assert _prob(engine, 'm0', 'htft_D/H') == 1.0 and _prob(engine, 'm0', 'htft_H/H') == 0.0
+
+
+def test_scores_beyond_the_grid_are_unavailable_until_full_time():
+    engine = _engine((3.0, 0.5))
+    engine.apply([{'match_id': 'm0', 'minute': 30, 'home_goals': 6, 'away_goals': 0}])
+    engine.recompute()
+    assert _prob(engine, 'm0', 'home_win') > 0.99 and not engine.settled[0].all()
+    engine.apply([{'match_id': 'm0', 'minute': 60, 'status': '2H', 'home_goals': 7, 'away_goals': 0}])
+    engine.recompute()
+    book = engine.snapshot('m0')['markets']
+    assert book['home_win'] == {'prob': None, 'settled': True, 'available': False}
+    assert book['over_4.5'] == {'prob': 1.0, 'settled': True}  # decided before, stays priced
+    engine.apply([{'match_id': 'm0', 'minute': 90, 'status': 'FT', 'home_goals': 7, 'away_goals': 1}])
+    engine.recompute()
+    assert engine.settled[0].all() and not np.isnan(engine.win[0]).any()
+    assert _prob(engine, 'm0', 'home_win') == 1.0 and _prob(engine, 'm0', 'margin_home_3+') == 1.0
+    assert _prob(engine, 'm0', 'htft_H/H') == 1.0
+
+
+def test_finished_matches_are_evicted():
+    now = [1000.0]
+    engine = InPlayEngine(capacity=1, clock=lambda: now[0])
+    for match_id in ('a', 'b', 'c'):
+        engine.add_match(match_id, 1.4, 1.0)
+    engine.apply([{'match_id': 'a', 'minute': 90, 'status': 'FT', 'home_goals': 1, 'away_goals': 0},
+                  {'match_id': 'b', 'minute': 60, 'home_goals': 0, 'away_goals': 1}])
+    engine.recompute()
+    assert engine.evict(3600) == []
+    now[0] += 3601
+    assert engine.evict(3600) == ['a']
+    assert 'a' not in engine and engine.ids == ['b', 'c'] and engine.state('b')['away_goals'] == 1
+    # The freed row is reset for the next match
+    engine.add_match('d', 1.2, 1.2)
+    assert engine.state('d')['status'] == '1H' and engine.state('d')['home_goals'] == 0
+
+
+def test_simulated_feed_settles_every_market():
+    result = replay(40, messages=True)
+    assert result['all_settled'] and result['updates'] == 40 * 93
+
+
+def test_invalid_states():
+    engine = _engine((1.5, 1.1))
+    with pytest.raises(KeyError):
+        engine.apply([{'match_id': 'nope', 'minute': 1, 'home_goals': 0, 'away_goals': 0}])
+    with pytest.raises(ValueError):
+        engine.apply([{'match_id': 'm0', 'minute': 10, 'home_goals': -1, 'away_goals': 0}])
+    with pytest.raises(ValueError):
+        engine.apply([{'match_id': 'm0', 'minute': 10, 'home_goals': 0}])
+
+
+def test_inplay_endpoints_share_state_across_workers(monkeypatch):
+    from backend.shared_state import MemoryStore
+    monkeypatch.setattr(main, 'shared_store', MemoryStore())
+    monkeypatch.setattr(inplay, '_engine', None)
+    result = asyncio.run(main.inplay_states(main.LiveStatesRequest(states=[
+        {'match_id': 'live1', 'minute': 50, 'home_goals': 2, 'away_goals': 0, 'home_xg': 1.6, 'away_xg': 0.9}])))
+    assert result == {'updated': 1, 'recomputed': 1}
+
+    monkeypatch.setattr(inplay, '_engine', None)  # a different worker
+    body = json.loads(asyncio.run(main.inplay_markets('live1')).body)
+    assert body['status'] == '2H' and body['home_goals'] == 2
+    assert body['markets']['over_1.5'] == {'prob': 1.0, 'settled': True}
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.inplay_markets('unknown'))
+    assert e.value.status_code == 404
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(main.inplay_states(main.LiveStatesRequest(states=[
+            {'match_id': 'never-predicted', 'minute': 5, 'home_goals': 0, 'away_goals': 0}])))
+    assert e.value.status_code == 404
+    for xg in ({'home_xg': 1.2}, {'home_xg': 'lots', 'away_xg': 1.0}):
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(main.inplay_states(main.LiveStatesRequest(states=[
+                dict({'match_id': 'bad-xg', 'minute': 5, 'home_goals': 0, 'away_goals': 0}, **xg)])))
+        assert e.value.status_code == 400
@@ -0,0 +1,118 @@
+import asyncio
+import numpy as np
+import pytest
+from backend import markets
+from backend.app import main
+from backend.markets import generate_markets, htft_probs, market_label, top_k, top_k_per_row
+from backend.predictor import Predictor
+from backend.shared_state import MemoryStore
+
+
+def _families(book, prefix):
+    return [i for i, name in enumerate(book.names) if name.startswith(prefix)]
+
+
+def test_books_are_consistent_with_the_score_distribution():
+    book = generate_markets([1.6, 0.4, 2.8], [1.1, 1.9, 0.7])
+    grid = markets.score_matrix(np.array([1.6, 0.4, 2.8]), np.array([1.1, 1.9, 0.7]))
+    grid /= grid.sum(axis=(1, 2), keepdims=True)
+    home_win = np.tril(grid, -1).sum(axis=(1, 2))
+    draw = np.trace(grid, axis1=1, axis2=2)
+    col = book.index
+
+    for prefix in ('cs_', 'htft_'):
+        assert np.allclose(book.win[:, _families(book, prefix)].sum(axis=1), 1.0)
+    margins = _families(book, 'margin_')
+    assert np.allclose(book.win[:, margins].sum(axis=1), 1.0)
+    assert np.allclose(book.win[:, col('cs_2-1')], grid[:, 2, 1])
+    assert np.allclose(book.win[:, col('dc_1X')], home_win + draw)
+    assert np.allclose(book.win[:, col('ah_home_-0.5')], home_win)
+    # Level handicap refunds the draw; quarter line splits the stake
+    assert np.allclose(book.push[:, col('ah_home_+0')], draw)
+    assert np.allclose(book.win[:, col('ah_home_-0.25')], home_win)
+    assert np.allclose(book.push[:, col('ah_home_-0.25')], draw / 2)
+    assert np.allclose(book.win[:, col('home_over_0.5')], 1 - grid[:, 0, :].sum(axis=1))
+    # HT/FT full-time margins add up to the full-time result (up to grid truncation)
+    ft_home = book.win[:, [col(f'htft_{ht}/H') for ht in 'HDA']].sum(axis=1)
+    assert np.allclose(ft_home, home_win, atol=1e-3)
+
+
+def test_half_split_shifts_half_time_draws():
+    early, late = htft_probs([1.5], [1.2], first_half_share=0.6), htft_probs([1.5], [1.2], first_half_share=0.3)
+    draw_draw = markets.RESULTS.index('D') * 4
+    assert late[0, draw_draw] > early[0, draw_draw]
+
+
+def test_fair_odds_have_zero_ev():
+    book = generate_markets([1.3], [1.0])
+    ev = book.expected_value(book.fair_odds())
+    assert np.allclose(ev[np.isfinite(ev)], 0.0)
+
+
+def test_top_k_matches_full_sort():
+    rng = np.random.RandomState(0)
+    values = rng.normal(size=(50, 120))
+    values[rng.rand(*values.shape) < 0.3] = np.nan
+    rows, cols = top_k(values, 25)
+    ranked = np.sort(np.nan_to_num(values, nan=-np.inf).ravel())[::-1][:25]
+    assert np.array_equal(values[rows, cols], ranked)
+    per_row = top_k_per_row(values, 3)
+    assert np.array_equal(np.take_along_axis(values, per_row[:1], axis=1)[0],
+                          np.sort(values[0][~np.isnan(values[0])])[::-1][:3])
+
+
+def test_labels():
+    assert market_label('htft_D/H', 'Arsenal', 'Spurs') == 'HT/FT Draw / Arsenal'
+    assert market_label('ah_away_+1.5', 'Arsenal', 'Spurs') == 'Spurs +1.5 (Asian handicap)'
+    assert market_label('dc_X2', 'Arsenal', 'Spurs') == 'Double chance Draw or Spurs'
+
+
+def _board_predictor(store=None):
+    p = Predictor(shared_store=store or MemoryStore())
+    for i in range(4):
+        p.predict_events(f'm{i}', f'H{i}', f'A{i}', {'odds_data': {
+            'home_spread_line': -0.5, 'home_spread_odds': 2.0 + i / 10, 'away_spread_odds': 1.8}})
+    return p
+
+
+def test_market_board_ranks_priced_markets_by_ev():
+    p = _board_predictor()
+    board = p.market_board(prices={'m0': {'cs_1-1': 40.0, 'dc_12': 1.01}}, top_k=5)
+    assert board['n_matches'] == 4 and board['n_priced'] == 4 * 2 + 2
+    evs = [c['ev'] for c in board['candidates']]
+    assert evs == sorted(evs, reverse=True) and len(evs) == 5
+    assert board['candidates'][0] == dict(board['candidates'][0], match_id='m0', market='cs_1-1',
+                                          event='Correct score 1-1')
+    per_match = p.market_board(['m1', 'm2', 'unknown'], per_match=1)
+    assert [c['match_id'] for c in per_match['candidates']] == ['m1', 'm2']
+    with pytest.raises(ValueError):
+        p.market_board(prices={'m0': {'cs_9-9': 3.0}})
+    with pytest.raises(ValueError):
+        p.market_board(top_k=0)
+
+
+def test_feed_spread_lines_outside_the_book_are_skipped():
+    p = _board_predictor()
+    p.predict_events('m9', 'H9', 'A9', {'odds_data': {
+        'home_spread_line': -3.5, 'home_spread_odds': 1.9, 'away_spread_odds': 1.9}})
+    board = p.market_board(per_match=1)
+    assert board['n_matches'] == 5 and {c['match_id'] for c in board['candidates']} == {'m0', 'm1', 'm2', 'm3'}
+    with pytest.raises(ValueError):
+        p.market_board(prices={'m9': {'ah_home_-3.5': 1.9}})
+
+
+def test_default_board_covers_matches_cached_by_other_workers():
+    store = MemoryStore()
+    _board_predictor(store)
+    other = Predictor(shared_store=store)
+    other.predict_events('m9', 'H9', 'A9', {})
+    board = other.market_board(per_match=1)
+    assert board['n_matches'] == 5
+    assert {c['match_id'] for c in board['candidates']} == {'m0', 'm1', 'm2', 'm3'}
+
+
+def test_markets_endpoint(monkeypatch):
+    monkeypatch.setattr(main, 'predictor', _board_predictor())
+    monkeypatch.setattr(main, 'wait_until_ready', lambda: asyncio.sleep(0))
+    response = asyncio.run(main.predict_markets(main.MarketsRequest(top_k=3)))
+    assert b'"ah_' in response.body
@@ -0,0 +1,61 @@
+import numpy as np
+from backend.odds import process_odds, remove_margin, to_odds_data, match_prices
+
+
+def _book(key, home, draw, away, over=None, under=None):
+    markets = [{'key': 'h2h', 'outcomes': [
+        {'name': 'Arsenal', 'price': home}, {'name': 'Draw', 'price': draw}, {'name': 'Chelsea', 'price': away},
+    ]}]
+    if over:
+        markets.append({'key': 'totals', 'outcomes': [
+            {'name': 'Over', 'price': over, 'point': 2.5}, {'name': 'Under', 'price': under, 'point': 2.5},
+        ]})
+    markets.append({'key': 'spreads', 'outcomes': [
+        {'name': 'Arsenal', 'price': 1.95, 'point': -0.5}, {'name': 'Chelsea', 'price': 1.9, 'point': 0.5},
+    ]})
+    return {'key': key, 'markets': markets}
+
+
+PAYLOAD = [{
+    'id': 'e1', 'sport_key': 'soccer_epl', 'home_team': 'Arsenal', 'away_team': 'Chelsea',
+    'bookmakers': [
+        _book('a', 2.0, 3.4, 4.0, over=1.9, under=1.95),
+        _book('b', 2.1, 3.3, 3.8, over=1.85, under=2.0),
+        _book('c', 1.95, 3.5, 4.2),
+    ],
+}, {
+    'id': 'e2', 'sport_key': 'soccer_epl', 'home_team': 'Spurs', 'away_team': 'Fulham', 'bookmakers': [],
+}]
+
+
+def test_remove_margin_per_book():
+    implied = 1.0 / np.array([2.0, 3.4, 4.0, 1.9, 1.95])
+    books = np.array([0, 0, 0, 1, 1])
+    for method in ('multiplicative', 'shin'):
+        fair = remove_margin(implied, books, 2, method)
+        np.testing.assert_allclose(np.bincount(books, weights=fair), [1.0, 1.0], atol=1e-6)
+    mult = remove_margin(implied, books, 2, 'multiplicative')
+    shin = remove_margin(implied, books, 2, 'shin')
+    # Shin puts more of the margin on the longshot
+    assert shin[2] < mult[2] and shin[0] > mult[0]
+
+
+def test_process_odds_consensus_and_best_price():
+    summary = process_odds(PAYLOAD)
+    assert summary['e2']['markets'] == {}
+    h2h = {o['name']: o for o in summary['e1']['markets']['h2h']}
+    assert h2h['Arsenal']['best_price'] == 2.1 and h2h['Arsenal']['best_bookmaker'] == 'b'
+    assert h2h['Chelsea']['best_price'] == 4.2 and h2h['Chelsea']['n_books'] == 3
+    assert abs(sum(o['fair_prob'] for o in h2h.values()) - 1.0) < 1e-3
+    assert all(o['margin'] > 0 for o in h2h.values())
+    spreads = summary['e1']['markets']['spreads']
+    assert abs(sum(o['fair_prob'] for o in spreads) - 1.0) < 1e-3
+
+
+def test_to_odds_data_feeds_predictor_keys():
+    summary = process_odds(PAYLOAD)['e1']
+    odds_data = to_odds_data(summary)
+    assert odds_data['home_odds'] == 2.1 and odds_data['draw_odds'] == 3.5 and odds_data['away_odds'] == 4.2
+    assert odds_data['over_2.5_goals'] == 1.9 and odds_data['under_2.5_goals'] == 2.0
+    assert 0 < odds_data['market_prob_home'] < 1
+    assert match_prices(summary) == {'Home': 2.1, 'Draw': 3.5, 'Away': 4.2}
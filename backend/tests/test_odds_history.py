@@ -0,0 +1,105 @@
+import asyncio
+import os
+import numpy as np
+from backend.features import FeatureEngine
+from backend.odds_history import OddsHistory, TICK_DTYPE
+from backend.predictor import Predictor
+
+T0 = 1_700_000_000
+
+
+def _snapshot(home_prices, draw=3.4, away=3.6, event='e1'):
+    """One event, one price per bookmaker for the home side"""
+    return [{'id': event, 'home_team': 'Arsenal', 'away_team': 'Chelsea', 'bookmakers': [
+        {'key': f'b{i}', 'markets': [{'key': 'h2h', 'outcomes': [
+            {'name': 'Arsenal', 'price': price}, {'name': 'Draw', 'price': draw}, {'name': 'Chelsea', 'price': away}]}]}
+        for i, price in enumerate(home_prices)]}]
+
+
+def test_only_changes_are_stored(tmp_path):
+    history = OddsHistory(str(tmp_path), flush_rows=10_000)
+    assert history.ingest(_snapshot([2.1, 2.1, 2.1]), now=T0) == 9
+    assert history.ingest(_snapshot([2.1, 2.1, 2.1]), now=T0 + 60) == 0
+    assert history.ingest(_snapshot([2.0, 2.1, 2.1]), now=T0 + 120) == 1
+    history.flush(now=T0 + 120)
+    day_file = [f for f in os.listdir(tmp_path) if f.endswith('.ticks')]
+    assert len(day_file) == 1
+    assert os.path.getsize(tmp_path / day_file[0]) == 10 * TICK_DTYPE.itemsize
+
+    # A fresh reader sees the flushed ticks through the symbols file
+    assert OddsHistory(str(tmp_path)).ticks('e1').size == 10
+
+
+def test_line_movement_and_steam(tmp_path):
+    history = OddsHistory(str(tmp_path))
+    history.ingest(_snapshot([2.4] * 5), now=T0)
+    history.ingest(_snapshot([2.4] * 5), now=T0 + 3600)
+    # Every bookmaker cuts the home price within a few minutes
+    for i in range(5):
+        prices = [2.0] * (i + 1) + [2.4] * (4 - i)
+        history.ingest(_snapshot(prices), now=T0 + 7 * 3600 + 60 * i)
+
+    movement = history.line_movement('e1', now=T0 + 8 * 3600)
+    home = movement['outcomes']['Arsenal']
+    assert home['current'] > home['opening'] and home['change'] > 0.03 and home['velocity'] > 0
+    total = sum(o['current'] for o in movement['outcomes'].values())
+    assert abs(total - 1.0) < 1e-3
+    steam = movement['steam_moves']
+    assert len(steam) == 1 and steam[0]['outcome'] == 'Arsenal'
+    assert steam[0]['direction'] == 'shortening' and steam[0]['books'] == 5
+
+    features = FeatureEngine(history).compute_line_movement('e1', 'Arsenal', 'Chelsea')
+    assert features['line_move_home'] == home['change'] and features['steam_home'] == 1
+
+
+def test_downsampling_and_bounded_tracking(tmp_path):
+    history = OddsHistory(str(tmp_path), flush_rows=100, max_tracked_keys=6)
+    for minute in range(120):
+        history.ingest(_snapshot([2.0 + 0.01 * (minute % 7)] * 2), now=T0 + 60 * minute)
+    history.flush(now=T0 + 7200)
+    assert history._last_keys.size <= 6
+    before = history.ticks('e1').size
+    dropped = history.downsample(before=T0 + 10 * 86400, bucket=3600)
+    after = history.ticks('e1')
+    assert dropped == before - after.size and after.size <= 3 * 2 * 3
+    # The last price of every key survives
+    last = after[after['ts'] == after['ts'].max()]
+    np.testing.assert_allclose(np.sort(last['price'])[-1], 2.0 + 0.01 * (119 % 7), rtol=1e-6)
+
+
+def test_predictor_attaches_line_move(tmp_path):
+    history = OddsHistory(str(tmp_path))
+    history.ingest(_snapshot([2.4] * 3), now=T0)
+    history.ingest(_snapshot([2.0] * 3), now=T0 + 3600)
+    p = Predictor()
+    p._feature_engine = FeatureEngine(history)
+    events = p.predict_events('m1', 'Arsenal', 'Chelsea', {'odds_data': {
+        'home_odds': 2.0, 'draw_odds': 3.4, 'away_odds': 3.6, 'odds_event_id': 'e1'}})
+    home = [e for e in events if e['market'] == 'home_win']
+    assert home and home[0]['line_move'] > 0
+
+
+def test_shutdown_flushes_buffered_ticks(tmp_path, monkeypatch):
+    from backend import odds_history
+    from backend.app import main
+    history = OddsHistory(str(tmp_path), flush_rows=10_000)
+    history.ingest(_snapshot([2.1, 3.3, 3.5]), now=T0)
+    monkeypatch.setattr(odds_history, 'get_odds_history', lambda: history)
+    asyncio.run(main.shutdown_event())
+    assert not history._buffer
+    assert OddsHistory(str(tmp_path)).ticks('e1').size == 9
+
+
+def test_two_writers_share_one_store(tmp_path):
+    # Two workers' stores on one directory, as under uvicorn --workers 2
+    a = OddsHistory(str(tmp_path), flush_rows=10_000)
+    b = OddsHistory(str(tmp_path), flush_rows=1)
+    a.ingest(_snapshot([2.1, 2.2], event='e1'), now=T0)  # buffered, symbols claimed
+    b.ingest(_snapshot([1.9, 1.8, 1.7], event='e2'), now=T0 + 60)
+    a.flush(now=T0 + 120)
+    for store in (a, b, OddsHistory(str(tmp_path))):
+        e1, e2 = store.ticks('e1', 'h2h'), store.ticks('e2', 'h2h')
+        assert e1.size == 6 and e2.size == 9
+        assert store.line_movement('e2')['outcomes']['Arsenal']['n_ticks'] == 3
+        home = store.outcomes.index(['h2h', 'Arsenal', None])
+        np.testing.assert_allclose(np.sort(e1[e1['outcome'] == home]['price']), [2.1, 2.2], rtol=1e-6)
@@ -0,0 +1,114 @@
+import json
+import time
+from fastapi.testclient import TestClient
+from backend import profiling
+from backend.app import main
+from backend.profiling import StackSampler, to_collapsed, to_speedscope
+
+
+def _busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_sampler_sees_the_hot_function():
+    with StackSampler(interval=0.001) as sampler:
+        _busy_loop(0.1)
+    # The GIL switch interval (5ms) bounds how often a busy thread can be sampled
+    assert sum(sampler.samples.values()) > 5
+    collapsed = to_collapsed(sampler.samples)
+    assert '_busy_loop (test_profiling.py:' in collapsed.splitlines()[0]
+    doc = to_speedscope(sampler.samples, sampler.interval, 'busy')
+    frame_names = [f['name'] for f in doc['shared']['frames']]
+    assert '_busy_loop' in frame_names and doc['profiles'][0]['type'] == 'sampled'
+    assert len(doc['profiles'][0]['samples']) == len(doc['profiles'][0]['weights'])
+
+
+def test_profiling_is_off_by_default():
+    with TestClient(main.app) as client:
+        resp = client.get('/health', headers={'X-Profile': '1'})
+        assert 'x-profile-id' not in resp.headers
+        assert client.get('/debug/profiles').status_code == 404
+
+
+def test_profiled_request_exposes_flame_graph(monkeypatch):
+    monkeypatch.setattr(profiling, 'PROFILING_ENABLED', True)
+    monkeypatch.setattr(profiling, 'profile_store', profiling.ProfileStore())
+    with TestClient(main.app) as client:
+        client.portal.call(main.wait_until_ready)
+        assert 'x-profile-id' not in client.get('/health').headers
+        resp = client.post('/predict', json={'match_id': 'm1', 'home_team': 'A', 'away_team': 'B'},
+                           headers={'X-Profile': '1'})
+        profile_id = resp.headers['x-profile-id']
+        listed = client.get('/debug/profiles').json()['profiles']
+        assert listed[0]['id'] == profile_id and listed[0]['path'] == '/predict' and listed[0]['status'] == 200
+        doc = client.get(f'/debug/profiles/{profile_id}').json()
+        assert doc['$schema'].startswith('https://www.speedscope.app')
+        collapsed = client.get(f'/debug/profiles/{profile_id}', params={'format': 'collapsed'})
+        assert collapsed.headers['content-type'].startswith('text/plain')
+        assert client.get('/debug/profiles/nope').status_code == 404
+
+
+def test_offline_batch_cli(tmp_path, capsys):
+    fixtures = tmp_path / 'fixtures.json'
+    fixtures.write_text(json.dumps([{'match_id': 'a', 'home': 'A', 'away': 'B'},
+                                    {'match_id': 'b', 'home': 'C', 'away': 'D', 'context': {}}]))
+    out = tmp_path / 'out.speedscope.json'
+    profiling.main(['--fixtures', str(fixtures), '--repeat', '20', '--output', str(out)])
+    # A warm batch can finish before the first sample, so only the document's shape is fixed
+    doc = json.loads(out.read_text())
+    assert doc['$schema'].startswith('https://www.speedscope.app') and doc['exporter'] == 'backend.profiling'
+    assert all(len(p['samples']) == len(p['weights']) for p in doc['profiles'])
+    assert '20 x 2 predictions in' in capsys.readouterr().out
+
+
+def test_profile_follows_submitted_work_only():
+    from concurrent.futures import ThreadPoolExecutor
+    pool = ThreadPoolExecutor(2, thread_name_prefix='asyncio_test')
+
+    def work(seconds):
+        _busy_loop(seconds)
+
+    def unrelated(seconds):
+        _busy_loop(seconds)
+
+    # Another request's job, submitted outside the profile, keeps a pool worker busy
+    other = pool.submit(unrelated, 0.3)
+    with StackSampler(interval=0.001) as sampler:
+        pool.submit(profiling.profiled(work), 0.15).result()
+    other.result()
+    pool.shutdown()
+    collapsed = to_collapsed(sampler.samples)
+    assert 'work (test_profiling.py:' in collapsed
+    assert 'unrelated' not in collapsed
+
+
+def test_loop_samples_belong_to_the_profiled_task():
+    import asyncio
+
+    # Chunks longer than the GIL switch interval, so samples land inside them
+    def profiled_work():
+        _busy_loop(0.02)
+
+    def other_request():
+        _busy_loop(0.02)
+
+    async def run(work, rounds, sampled):
+        sampler = StackSampler(interval=0.001, task=asyncio.current_task()) if sampled else None
+        if sampler:
+            sampler.start()
+        for _ in range(rounds):
+            work()
+            await asyncio.sleep(0)
+        if sampler:
+            sampler.stop()
+        return sampler
+
+    async def both():
+        sampler, _ = await asyncio.gather(run(profiled_work, 10, True), run(other_request, 10, False))
+        return sampler
+
+    collapsed = to_collapsed(asyncio.run(both()).samples)
+    assert 'profiled_work (test_profiling.py:' in collapsed
+    assert 'other_request' not in collapsed
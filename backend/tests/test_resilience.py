@@ -0,0 +1,148 @@
+import time
+import pytest
+import requests
+from fastapi.testclient import TestClient
+from backend import api_clients, resilience
+from backend.api_cache import ResponseCache
+from backend.resilience import (CircuitBreaker, CircuitOpenError, call_upstream, hedged, mark_degraded,
+                                track_degradation)
+
+
+class FakeResponse:
+    def __init__(self, payload, status=200):
+        self.payload = payload
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f'{self.status_code}', response=self)
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(monkeypatch):
+    monkeypatch.setattr(resilience, 'BREAKERS', {})
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 0.0)
+
+
+def test_breaker_opens_and_recovers():
+    now = [0.0]
+    breaker = CircuitBreaker('x', failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open' and not breaker.allow()
+    now[0] = 10.0
+    assert breaker.allow() and not breaker.allow()  # one trial call at a time
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    now[0] = 20.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+
+def test_retries_transient_errors_only():
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise requests.ConnectionError('reset')
+        return 'ok'
+
+    assert call_upstream('flaky', flaky, hedge_after=None, retries=2) == 'ok'
+    assert len(attempts) == 3
+
+    def forbidden():
+        attempts.append(1)
+        FakeResponse({}, status=403).raise_for_status()
+
+    attempts.clear()
+    with pytest.raises(requests.HTTPError):
+        call_upstream('forbidden', forbidden, hedge_after=None)
+    assert len(attempts) == 1 and resilience.BREAKERS['forbidden'].state == 'closed'
+
+
+def test_open_circuit_fails_fast():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise requests.Timeout('slow')
+
+    for _ in range(resilience.FAILURE_THRESHOLD):
+        with pytest.raises(requests.Timeout):
+            call_upstream('down', down, hedge_after=None, retries=0)
+    assert resilience.BREAKERS['down'].state == 'open'
+    n = len(calls)
+    with pytest.raises(CircuitOpenError):
+        call_upstream('down', down, hedge_after=None)
+    assert len(calls) == n
+
+
+def test_hedged_request_beats_slow_first_attempt():
+    delays = [0.5, 0.0]
+
+    def request():
+        time.sleep(delays.pop(0))
+        return 'answer'
+
+    start = time.perf_counter()
+    assert hedged(request, hedge_after=0.05) == 'answer'
+    assert time.perf_counter() - start < 0.4
+
+
+def test_degradation_is_scoped_to_the_request():
+    mark_degraded('outside')  # no request being tracked: ignored
+    with track_degradation() as reasons:
+        mark_degraded('odds: stale')
+        mark_degraded('odds: stale')
+    assert reasons == ['odds: stale']
+
+
+def test_team_stats_without_finished_matches_are_degraded():
+    api = api_clients.FootballDataAPI.__new__(api_clients.FootballDataAPI)
+    scheduled = [{'homeTeam': {'name': 'A'}, 'awayTeam': {'name': 'B'}, 'score': {'fullTime': {'home': None}}}]
+    with track_degradation() as reasons:
+        stats = api.calculate_team_stats('A', scheduled)
+    assert stats['goals_scored_avg'] == 1.5 and reasons == ['team stats: default values']
+    finished = [{'homeTeam': {'name': 'A'}, 'awayTeam': {'name': 'B'}, 'score': {'fullTime': {'home': 2, 'away': 0}}}]
+    with track_degradation() as reasons:
+        stats = api.calculate_team_stats('A', finished)
+    assert stats['wins'] == 1 and reasons == []
+
+
+def test_stale_cache_served_when_upstream_down(tmp_path, monkeypatch):
+    now = [1000.0]
+    cache = ResponseCache(str(tmp_path / 'c.sqlite3'), clock=lambda: now[0])
+    responses = [FakeResponse([{'id': 'e1'}])]
+
+    def fake_get(url, headers=None, params=None, timeout=None):
+        if responses:
+            return responses.pop(0)
+        raise requests.ConnectionError('down')
+
+    monkeypatch.setattr(api_clients.requests, 'get', fake_get)
+    odds = api_clients.OddsAPI(cache)
+    assert odds.get_odds() == [{'id': 'e1'}]
+    now[0] += 3600
+    with track_degradation() as reasons:
+        assert odds.get_odds() == [{'id': 'e1'}]
+    assert reasons and reasons[0].startswith('odds: stale')
+    with track_degradation() as reasons:
+        assert odds.get_odds('other_sport') == []
+    # Two failing calls' retries are enough to open the odds breaker
+    assert reasons == ['odds: unavailable (CircuitOpenError)']
+    assert resilience.BREAKERS['odds'].state == 'open'
+
+
+def test_predict_reports_degraded():
+    from backend.app import main
+    with TestClient(main.app) as client:
+        client.portal.call(main.wait_until_ready)
+        body = client.post('/predict', json={'match_id': 'm1', 'home_team': 'A', 'away_team': 'B'}).json()
+    assert body['degraded'] is True
+    assert 'team stats: default values' in body['degraded_reasons']
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+from backend import shared_state
+from backend.shared_state import LeaderLease, MemoryStore, SqliteStore
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_store(request, tmp_path):
+    now = [1000.0]
+
+    def make():
+        if request.param == 'memory':
+            store = getattr(make, 'shared', None) or MemoryStore(clock=lambda: now[0])
+            make.shared = store  # a memory store is only shared within one process
+            return store
+        return SqliteStore(str(tmp_path / 'state.sqlite3'), clock=lambda: now[0])
+    make.now = now
+    return make
+
+
+def test_values_expire_and_list_by_prefix(make_store):
+    store = make_store()
+    store.set('matches:PL', {'matches': [1]}, ttl=10, updated_at=990.0)
+    store.set('watch:PL', 1)
+    assert make_store().get('matches:PL') == {'matches': [1]}
+    assert make_store().updated_at('matches:PL') == 990.0
+    assert store.keys('matches:') == ['matches:PL']
+    make_store.now[0] += 10
+    assert store.get('matches:PL') is None and store.keys('matches:') == []
+    assert store.get('watch:PL') == 1
+
+
+def test_lease_single_owner_until_expiry(make_store):
+    a, b = make_store(), make_store()
+    assert a.acquire_lease('refresh', 'w1', ttl=5)
+    assert not b.acquire_lease('refresh', 'w2', ttl=5)
+    assert a.acquire_lease('refresh', 'w1', ttl=5)  # renewal by the owner
+    make_store.now[0] += 5
+    assert b.acquire_lease('refresh', 'w2', ttl=5)
+    a.release_lease('refresh', 'w1')  # not the owner any more: no effect
+    assert not a.acquire_lease('refresh', 'w1', ttl=5)
+    b.release_lease('refresh', 'w2')
+    assert a.acquire_lease('refresh', 'w1', ttl=5)
+
+
+def test_leader_fails_over(make_store):
+    first = LeaderLease(make_store(), 'refresher', owner='w1', ttl=5)
+    second = LeaderLease(make_store(), 'refresher', owner='w2', ttl=5)
+    assert first.renew() and not second.renew()
+    make_store.now[0] += 6  # the leader stopped renewing
+    assert second.renew() and not first.renew()
+    second.release()
+    assert first.renew()
+
+
+def test_concurrent_requests_refresh_once(monkeypatch):
+    from backend.app import main
+    store = MemoryStore()
+    calls = []
+
+    async def fake_fetch(league, days, now):
+        calls.append(league)
+        await asyncio.sleep(0.05)
+        return {'matches': [{'id': 1}], 'total': 1}
+
+    monkeypatch.setattr(main, 'shared_store', store)
+    monkeypatch.setattr(main, '_fetch_matches', fake_fetch)
+    monkeypatch.setattr(main, 'matches_cache', {})
+    monkeypatch.setattr(main, 'cache_timestamp', {})
+    monkeypatch.setattr(main, '_refresh_locks', {})
+
+    async def burst():
+        return await asyncio.gather(*[main._refresh_snapshot('PL', 7, main.CACHE_DURATION) for _ in range(20)])
+
+    asyncio.run(burst())
+    assert calls == ['PL']
+    assert store.get('matches:PL_7')['total'] == 1
+
+
+def test_upstream_calls_constant_across_workers():
+    pytest.importorskip('uvicorn')
+    from backend.bench.scaling import FakeUpstream, measure
+    upstream = FakeUpstream()
+    try:
+        runs = [measure(upstream, workers, n_requests=40) for workers in (1, 3)]
+    finally:
+        upstream.close()
+    assert all(r['ok'] == r['requests'] for r in runs)
+    assert runs[0]['upstream_calls'] == runs[1]['upstream_calls'] > 0
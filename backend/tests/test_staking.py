@@ -0,0 +1,94 @@
+import asyncio
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from backend.app import main
+from backend.predictor import Predictor
+from backend.staking import kelly_fraction, kelly_stakes, simulate_bankroll, stake_candidates
+
+NO_CAPS = dict(max_match=10, max_league=10, max_total=10)
+
+
+def test_isolated_bet_is_fractional_kelly():
+    f = kelly_stakes([0.6], [2.0], ['m1'], fraction=0.5, **NO_CAPS)
+    assert abs(f[0] - 0.5 * kelly_fraction(0.6, 2.0)) < 1e-6
+    assert kelly_stakes([0.4], [2.0], ['m1'], **NO_CAPS)[0] == 0.0
+
+
+def test_correlated_bets_get_less_than_independent_ones():
+    same = kelly_stakes([0.6, 0.6], [2.0, 2.0], ['m1', 'm1'], fraction=1.0, **NO_CAPS)
+    apart = kelly_stakes([0.6, 0.6], [2.0, 2.0], ['m1', 'm2'], fraction=1.0, **NO_CAPS)
+    assert same.sum() < apart.sum()
+
+
+def test_exclusive_outcomes_are_not_penalised_as_correlated():
+    # Home and away of one match never both win: the pair is a partial hedge
+    prob, odds = [0.45, 0.35], [2.5, 3.2]
+    hedged = kelly_stakes(prob, odds, ['m1', 'm1'], markets=['home_win', 'away_win'], fraction=1.0, **NO_CAPS)
+    stacked = kelly_stakes(prob, odds, ['m1', 'm1'], markets=['home_win', 'btts_yes'], fraction=1.0, **NO_CAPS)
+    apart = kelly_stakes(prob, odds, ['m1', 'm2'], fraction=1.0, **NO_CAPS)
+    assert stacked.sum() < apart.sum() <= hedged.sum() + 1e-9
+    over_under = kelly_stakes([0.6, 0.45], [1.8, 2.6], ['m1', 'm1'], markets=['over_2.5', 'under_2.5'],
+                              fraction=1.0, **NO_CAPS)
+    assert over_under.sum() >= kelly_stakes([0.6, 0.45], [1.8, 2.6], ['m1', 'm2'], fraction=1.0, **NO_CAPS).sum()
+
+
+def test_exposure_caps_hold_for_a_large_slate():
+    rng = np.random.default_rng(0)
+    n = 300
+    prob = rng.uniform(0.2, 0.7, n)
+    odds = 1 / prob * rng.uniform(0.95, 1.2, n)
+    match = rng.integers(0, 100, n)
+    league = match % 4
+    f = kelly_stakes(prob, odds, match, league, max_match=0.02, max_league=0.1, max_total=0.3)
+    assert np.all(f >= 0) and np.all(f[prob * odds <= 1] == 0)
+    assert np.bincount(match, weights=f).max() <= 0.02 + 1e-9
+    assert np.bincount(league, weights=f).max() <= 0.1 + 1e-9
+    assert f.sum() <= 0.3 + 1e-9
+
+
+def test_exotic_outcomes_of_one_market_are_exclusive():
+    from backend.staking import _market_group
+    groups = {m: _market_group(m) for m in ('cs_1-0', 'cs_other', 'margin_home_1', 'margin_draw', 'htft_H/H',
+                                            'htft_D/A', 'home_over_1.5', 'home_under_1.5', 'away_over_1.5')}
+    assert groups['cs_1-0'] == groups['cs_other'] and groups['margin_home_1'] == groups['margin_draw']
+    assert groups['htft_H/H'] == groups['htft_D/A'] and groups['home_over_1.5'] == groups['home_under_1.5']
+    assert len({groups['cs_1-0'], groups['margin_draw'], groups['htft_H/H'], groups['away_over_1.5'],
+                groups['home_over_1.5']}) == 5
+    prob, odds = [0.12, 0.1], [10.0, 12.0]
+    scores = kelly_stakes(prob, odds, ['m1', 'm1'], markets=['cs_1-0', 'cs_1-1'], fraction=1.0, **NO_CAPS)
+    apart = kelly_stakes(prob, odds, ['m1', 'm2'], fraction=1.0, **NO_CAPS)
+    assert scores.sum() >= apart.sum()
+
+
+def test_stake_candidates_and_endpoint():
+    slate = [
+        {'match_id': 'm1', 'league': 'PL', 'market': 'home_win', 'prob': 0.55, 'odds': 2.1},
+        {'match_id': 'm2', 'league': 'PL', 'market': 'over_2.5', 'prob': 0.5, 'odds': 1.8},
+    ]
+    bets = stake_candidates(slate, 1000.0)
+    assert [b['market'] for b in bets] == ['home_win']
+    assert 0 < bets[0]['stake'] <= 100.0
+    result = asyncio.run(main.stakes(main.StakeRequest(bankroll=1000.0, candidates=slate)))
+    assert result['bets'] == bets and result['total_stake'] == bets[0]['stake']
+    for bad in ({'max_match': -0.1}, {'max_total': 0}, {'correlation': 1.0}, {'correlation': -0.2}):
+        with pytest.raises(HTTPException) as err:
+            asyncio.run(main.stakes(main.StakeRequest(bankroll=1000.0, candidates=slate, **bad)))
+        assert err.value.status_code == 400
+
+
+def test_simulated_paths():
+    rnd = {'prob': [0.55, 0.3], 'odds': [2.1, 4.0], 'match_id': ['a', 'b']}
+    paths = simulate_bankroll([rnd] * 50, bankroll=100.0, n_paths=500, seed=0)
+    assert paths.shape == (500, 51) and np.all(paths > 0)
+    assert np.median(paths[:, -1]) > 100.0
+    backtest = simulate_bankroll([dict(rnd, won=[1, 0])], bankroll=100.0)
+    f = kelly_stakes(rnd['prob'], rnd['odds'], rnd['match_id'])
+    assert abs(backtest[0, 1] - 100.0 * (1 + f[0] * 1.1 - f[1])) < 1e-9
+
+
+def test_parlay_stake_uses_bankroll():
+    legs = [{'prob': 0.6, 'odds': 2.0, 'ev': 0.2}, {'prob': 0.7, 'odds': 1.6, 'ev': 0.12}]
+    small = Predictor().optimize_parlay(legs, bankroll=100.0)
+    large = Predictor().optimize_parlay(legs, bankroll=1000.0)
+    assert 0 < small['stake'] and abs(large['stake'] - 10 * small['stake']) < 0.1
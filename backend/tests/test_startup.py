@@ -0,0 +1,31 @@
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+from backend.api_clients import get_football_api, get_odds_api
+from backend.predictor import Predictor
+
+
+def test_app_import_skips_heavy_modules():
+    """Importing the app must not pull in pandas/sklearn/joblib"""
+    code = (
+        "import sys, backend.app.main; "
+        "print(','.join(m for m in ('pandas', 'sklearn', 'joblib') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ''
+
+
+def test_predictor_shares_api_clients():
+    p = Predictor()
+    assert p.football_api is get_football_api()
+    assert p.odds_api is get_odds_api()
+
+
+def test_health_and_ready():
+    from backend.app import main
+    with TestClient(main.app) as client:
+        assert client.get('/health').json() == {'status': 'ok'}
+        client.portal.call(main.wait_until_ready)
+        resp = client.get('/ready')
+        assert resp.status_code == 200
+        assert resp.json()['ready'] is True
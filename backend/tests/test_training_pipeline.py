@@ -0,0 +1,54 @@
+from backend import train
+from backend.model_store import ModelStore, MATCH_MODEL
+from backend.predictor import Predictor
+
+SMALL_GRID = {'n_estimators': [20, 40], 'max_depth': [2]}
+
+
+def _write_history(path, df):
+    df.to_csv(path, index=False)
+    return str(path)
+
+
+def test_build_match_features_has_no_leakage():
+    df = train.make_synthetic_match_history(n_teams=6, n_seasons=1)
+    frame = train.build_match_features(df, window=5, min_periods=1)
+    first = frame.iloc[0]
+    # The first usable match only sees games played strictly before it
+    team = first['home']
+    prior = df[(df['date'] < first['date']) & ((df['home'] == team) | (df['away'] == team))]
+    scored = [r.home_goals if r.home == team else r.away_goals for r in prior.itertuples()]
+    assert len(prior) >= 1
+    assert first['home_gf'] == sum(scored) / len(scored)
+    assert set(frame['result']) <= {'H', 'D', 'A'}
+
+
+def test_train_update_and_hot_swap(tmp_path):
+    history = train.make_synthetic_match_history(n_teams=8, n_seasons=2)
+    cutoff = history['date'].iloc[int(len(history) * 0.8)]
+    csv_path = _write_history(tmp_path / 'matches.csv', history[history['date'] <= cutoff])
+
+    store = ModelStore(str(tmp_path / 'store'))
+    v1 = train.train_match_model(csv_path, store, n_jobs=2, param_grid=SMALL_GRID)
+    assert v1 == 1 and store.latest_version(MATCH_MODEL) == 1
+
+    predictor = Predictor(model_store=store)
+    predictor.load_models()
+    assert predictor.model_versions == {MATCH_MODEL: 1}
+    old_model = predictor.models[MATCH_MODEL]
+
+    # New results arrive: warm-start adds stages instead of retraining
+    _write_history(tmp_path / 'matches.csv', history)
+    v2 = train.update_match_model(csv_path, store, extra_estimators=10)
+    model, meta = store.load(MATCH_MODEL, v2)
+    assert v2 == 2 and meta['mode'] == 'incremental' and meta['parent_version'] == 1
+    assert model.n_estimators == old_model.n_estimators + 10
+
+    # Nothing new: no new version is written
+    assert train.update_match_model(csv_path, store) == 2
+
+    assert predictor.maybe_reload() is True
+    assert predictor.model_versions == {MATCH_MODEL: 2}
+    assert predictor.models[MATCH_MODEL] is not old_model
+    results = predictor.predict_events('m1', 'A', 'B', {})
+    assert abs(sum(r['prob'] for r in results if r['event'] in ('A Win', 'B Win', 'Draw')) - 1.0) < 0.01
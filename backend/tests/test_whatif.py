@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from backend.app import main
+from backend.predictor import Predictor
+from backend.tests.conftest import ConstantMatchModel
+
+
+def _predicted(odds_data=None):
+    p = Predictor()
+    p.predict_events('m1', 'A', 'B', {'odds_data': odds_data or {'home_odds': 2.1, 'draw_odds': 3.4, 'away_odds': 3.6}})
+    return p
+
+
+def test_baseline_matches_prediction():
+    p = _predicted()
+    served = {e['market']: e for e in p.predict_events('m1', 'A', 'B', {'odds_data': {'home_odds': 2.1}})}
+    result = p.what_if('m1')
+    assert result['home_xg'] == [round(p.feature_cache['m1']['features']['home_xg'], 3)]
+    for market in ('home_win', 'draw', 'away_win'):
+        if market in served:
+            assert abs(result['markets'][market]['prob'][0] - served[market]['prob']) < 1e-3
+    assert result['markets']['home_win']['odds'] == 2.1
+
+
+def test_sweep_is_monotonic_and_priced_at_fixed_odds():
+    p = _predicted()
+    result = p.what_if('m1', {'odds': {'home_win': 2.5}},
+                       {'param': 'home_xg_delta', 'start': -0.5, 'stop': 0.5, 'steps': 21})
+    home = result['markets']['home_win']
+    assert len(result['values']) == len(home['prob']) == len(home['ev']) == 21
+    assert all(b >= a for a, b in zip(home['prob'], home['prob'][1:]))
+    assert home['odds'] == 2.5
+    assert all(abs(ev - (prob * 2.5 - 1.0)) < 1e-3 for prob, ev in zip(home['prob'], home['ev']))
+    over = result['markets']['over_2.5']['prob']
+    assert over[-1] > over[0]
+
+
+def test_unknown_match_and_params():
+    p = _predicted()
+    assert p.what_if('nope') is None
+    with pytest.raises(ValueError):
+        p.what_if('m1', {'weather': 1})
+    with pytest.raises(ValueError):
+        p.what_if('m1', sweep={'param': 'home_xg', 'values': list(range(5000))})
+
+
+def test_feature_cache_is_bounded(monkeypatch):
+    monkeypatch.setattr('backend.predictor.FEATURE_CACHE_SIZE', 3)
+    p = Predictor()
+    for i in range(5):
+        p.predict_events(f'm{i}', 'A', 'B', {})
+    assert list(p.feature_cache) == ['m2', 'm3', 'm4']
+
+
+def test_whatif_endpoint(monkeypatch):
+    p = _predicted()
+    monkeypatch.setattr(main, 'predictor', p)
+    monkeypatch.setattr(main, 'wait_until_ready', lambda: asyncio.sleep(0))
+    response = asyncio.run(main.predict_whatif(main.WhatIfRequest(
+        match_id='m1', sweep={'param': 'away_form_delta', 'values': [-1, 0, 1]})))
+    assert b'"markets"' in response.body
+    with pytest.raises(main.HTTPException) as missing:
+        asyncio.run(main.predict_whatif(main.WhatIfRequest(match_id='other')))
+    assert missing.value.status_code == 404
+
+
+def test_baseline_matches_prediction_with_match_model_and_calibration():
+    from backend.calibration import Calibrator
+    from backend.model_store import MATCH_MODEL
+    p = Predictor()
+    p.models = {MATCH_MODEL: ConstantMatchModel(home=0.6, draw=0.25, away=0.15),
+                'calibration': Calibrator({m: ([0.0, 1.0], [0.1, 0.8]) for m in ('home_win', 'draw', 'over_2.5')})}
+    served = {e['market']: e['prob'] for e in p.predict_events('m1', 'A', 'B', {})}
+    result = p.what_if('m1')
+    for market in ('home_win', 'draw', 'away_win', 'over_2.5'):
+        if market in served:
+            assert abs(result['markets'][market]['prob'][0] - served[market]) < 1e-3, market
@@ -1,16 +1,23 @@
 import argparse
 import os
-import joblib
-import numpy as np
-import pandas as pd
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.model_selection import train_test_split
+from typing import Optional
+from backend.data.ingest import load_historical_matches
+from backend.model_store import ModelStore, MODEL_DIR, MATCH_MODEL
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), '..', 'models')
 MODEL_PATH = os.path.join(MODEL_DIR, 'player_score_model.joblib')
 
+MATCH_FEATURES = ['home_gf', 'home_ga', 'home_pts', 'away_gf', 'away_ga', 'away_pts']
+DEFAULT_PARAM_GRID = {
+    'n_estimators': [50, 100],
+    'learning_rate': [0.05, 0.1],
+    'max_depth': [2, 3],
+}
+
 
 def make_synthetic_player_dataset(n=2000, random_state=42):
+    # Heavy imports are deferred so that importing this module is free
+    import numpy as np
+    import pandas as pd
     rng = np.random.RandomState(random_state)
     # Features: recent_goals, shots_on_target_per90, starts_last5, xG_per90
     recent_goals = rng.poisson(0.3, size=n)
@@ -32,6 +39,9 @@ def make_synthetic_player_dataset(n=2000, random_state=42):
 
 
 def train_and_save(model_path=MODEL_PATH, n=2000):
+    import joblib
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.model_selection import train_test_split
     df = make_synthetic_player_dataset(n=n)
     X = df[['recent_goals', 'shots_on_target', 'starts_last5', 'xg']]
     y = df['label']
@@ -43,12 +53,179 @@ def train_and_save(model_path=MODEL_PATH, n=2000):
     print(f"Saved model to {model_path}")
 
 
+def make_synthetic_match_history(n_teams=12, n_seasons=3, start='2021-08-01', random_state=7):
+    """Double round-robin seasons with Poisson goals driven by fixed team strengths"""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.RandomState(random_state)
+    teams = [f'Team {i:02d}' for i in range(n_teams)]
+    attack = rng.normal(1.35, 0.3, size=n_teams).clip(0.6, None)
+    defense = rng.normal(1.0, 0.2, size=n_teams).clip(0.5, None)
+
+    # Circle-method rounds so every team plays once per matchday
+    order = list(range(n_teams))
+    rounds = []
+    for _ in range(n_teams - 1):
+        rounds.append([(order[i], order[-1 - i]) for i in range(n_teams // 2)])
+        order = [order[0], order[-1]] + order[1:-1]
+    rounds += [[(a, h) for h, a in fixtures] for fixtures in rounds]
+
+    rows = []
+    date = pd.Timestamp(start)
+    for _ in range(n_seasons):
+        for fixtures in rounds:
+            date += pd.Timedelta(days=7)
+            for h, a in fixtures:
+                rows.append({
+                    'date': date,
+                    'home': teams[h],
+                    'away': teams[a],
+                    'home_goals': rng.poisson(attack[h] * defense[a] * 1.15),
+                    'away_goals': rng.poisson(attack[a] * defense[h] * 0.9),
+                    'home_corners': rng.poisson(5.5),
+                    'away_corners': rng.poisson(4.8),
+                })
+    return pd.DataFrame(rows)
+
+
+def build_match_features(df, window=10, min_periods=3):
+    """Pre-match rolling team features for every historical match.
+
+    Each row only sees results strictly before its own date, so the frame can
+    be used for training without leakage. Matches where either side has fewer
+    than `min_periods` prior games are dropped.
+    """
+    import numpy as np
+    import pandas as pd
+    df = df.sort_values('date', kind='stable').reset_index(drop=True)
+    home_goals = df['home_goals'].to_numpy()
+    away_goals = df['away_goals'].to_numpy()
+
+    long = pd.concat([
+        pd.DataFrame({'match': df.index, 'is_home': True, 'team': df['home'], 'gf': home_goals, 'ga': away_goals}),
+        pd.DataFrame({'match': df.index, 'is_home': False, 'team': df['away'], 'gf': away_goals, 'ga': home_goals}),
+    ], ignore_index=True).sort_values('match', kind='stable')
+    long['pts'] = np.select([long['gf'] > long['ga'], long['gf'] == long['ga']], [3, 1], 0)
+    long['cs'] = (long['ga'] == 0).astype(float)
+    stats = ['gf', 'ga', 'pts', 'cs']
+    # Corners are optional in the historical CSV
+    if {'home_corners', 'away_corners'} <= set(df.columns):
+        long['corners'] = np.where(long['is_home'], df['home_corners'].to_numpy()[long['match']],
+                                   df['away_corners'].to_numpy()[long['match']])
+        stats.append('corners')
+
+    rolled = long.groupby('team')[stats].transform(
+        lambda s: s.shift(1).rolling(window, min_periods=min_periods).mean()
+    )
+    rolled['match'] = long['match']
+    rolled['is_home'] = long['is_home']
+    home = rolled[rolled['is_home']].set_index('match')[stats].add_prefix('home_')
+    away = rolled[~rolled['is_home']].set_index('match')[stats].add_prefix('away_')
+
+    raw_columns = [c for c in ('date', 'home', 'away', 'home_goals', 'away_goals', 'home_corners', 'away_corners')
+                   if c in df.columns]
+    frame = df[raw_columns].rename(columns={'home_corners': 'home_corners_ft', 'away_corners': 'away_corners_ft'})
+    frame = frame.join(home).join(away)
+    frame['result'] = np.select([home_goals > away_goals, home_goals == away_goals], ['H', 'D'], 'A')
+    return frame.dropna(subset=MATCH_FEATURES).reset_index(drop=True)
+
+
+def search_match_model(X, y, n_jobs=1, param_grid=None, cv_splits=3):
+    """Grid search over GradientBoostingClassifier settings.
+
+    Candidates are scored on time-ordered folds and fitted in a process pool of
+    `n_jobs` workers (-1 = all cores). Returns (best_model, best_params, log_loss).
+    """
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.model_selection import GridSearchCV, TimeSeriesSplit
+    search = GridSearchCV(
+        GradientBoostingClassifier(random_state=1),
+        param_grid or DEFAULT_PARAM_GRID,
+        cv=TimeSeriesSplit(n_splits=cv_splits),
+        scoring='neg_log_loss',
+        n_jobs=n_jobs,
+    )
+    search.fit(X, y)
+    return search.best_estimator_, search.best_params_, -search.best_score_
+
+
+def train_match_model(csv_path: str, store: Optional[ModelStore] = None, n_jobs=1, param_grid=None) -> int:
+    """Full retrain of the match-result model from the historical store"""
+    store = store or ModelStore()
+    df = load_historical_matches(csv_path)
+    frame = build_match_features(df)
+    model, params, log_loss = search_match_model(frame[MATCH_FEATURES], frame['result'], n_jobs=n_jobs,
+                                                 param_grid=param_grid)
+    version = store.save(MATCH_MODEL, model, {
+        'mode': 'full',
+        'features': MATCH_FEATURES,
+        'params': params,
+        'cv_log_loss': round(float(log_loss), 4),
+        'n_samples': len(frame),
+        'trained_through': df['date'].max().isoformat(),
+    })
+    print(f"Saved {MATCH_MODEL} v{version} (log loss {log_loss:.4f}, {len(frame)} matches)")
+    return version
+
+
+def update_match_model(csv_path: str, store: Optional[ModelStore] = None, extra_estimators=25,
+                       context_rows=300, n_jobs=1) -> int:
+    """Warm-start the latest match-result model on results it has not seen.
+
+    New boosting stages are fitted on the new matches plus the `context_rows`
+    matches before them. Falls back to a full retrain when there is no prior
+    version or the batch does not cover every outcome class.
+    """
+    import pandas as pd
+    store = store or ModelStore()
+    latest = store.latest_version(MATCH_MODEL)
+    if latest is None:
+        return train_match_model(csv_path, store, n_jobs=n_jobs)
+
+    model, meta = store.load(MATCH_MODEL, latest)
+    df = load_historical_matches(csv_path)
+    frame = build_match_features(df)
+    is_new = frame['date'] > pd.Timestamp(meta['trained_through'])
+    if not is_new.any():
+        print(f"No results after {meta['trained_through']}; keeping v{latest}")
+        return latest
+
+    first_new = int(is_new.to_numpy().argmax())
+    batch = frame.iloc[max(0, first_new - context_rows):]
+    if set(batch['result']) != set(model.classes_):
+        print("Update batch is missing an outcome class; retraining from scratch")
+        return train_match_model(csv_path, store, n_jobs=n_jobs)
+
+    model.set_params(warm_start=True, n_estimators=model.n_estimators + extra_estimators)
+    model.fit(batch[MATCH_FEATURES], batch['result'])
+    version = store.save(MATCH_MODEL, model, dict(
+        meta,
+        mode='incremental',
+        parent_version=latest,
+        n_new_samples=int(is_new.sum()),
+        trained_through=df['date'].max().isoformat(),
+    ))
+    print(f"Saved {MATCH_MODEL} v{version} (+{extra_estimators} stages on {int(is_new.sum())} new matches)")
+    return version
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--out', '-o', default=MODEL_PATH)
     parser.add_argument('--n', type=int, default=2000)
+    parser.add_argument('--matches', help='historical matches CSV; trains the match-result model instead')
+    parser.add_argument('--update', action='store_true', help='warm-start the latest version on new results')
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--store', default=MODEL_DIR, help='versioned model store directory')
     args = parser.parse_args()
-    train_and_save(args.out, n=args.n)
+    if args.matches:
+        store = ModelStore(args.store)
+        if args.update:
+            update_match_model(args.matches, store, n_jobs=args.n_jobs)
+        else:
+            train_match_model(args.matches, store, n_jobs=args.n_jobs)
+    else:
+        train_and_save(args.out, n=args.n)
 
 
 if __name__ == '__main__':
@@ -53,7 +53,8 @@ export default function MatchSelector({ onSelectMatch, selectedMatch }){
     { code: 'PD', name: 'La Liga', display: 'ESP' },
     { code: 'BL1', name: 'Bundesliga', display: 'GER' },
     { code: 'SA', name: 'Serie A', display: 'ITA' },
-    { code: 'FL1', name: 'Ligue 1', display: 'FRA' }
+    { code: 'FL1', name: 'Ligue 1', display: 'FRA' },
+    { code: 'NBA', name: 'NBA', display: 'NBA' }
   ]
 
   return (
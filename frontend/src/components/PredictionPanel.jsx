@@ -6,6 +6,7 @@ export default function PredictionPanel({ selectedMatch, onAddLeg }){
   const [results, setResults] = useState([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState('')
+  const [degraded, setDegraded] = useState([])
   const [expandedMarket, setExpandedMarket] = useState('match-result')
 
   useEffect(() => {
@@ -24,8 +25,10 @@ export default function PredictionPanel({ selectedMatch, onAddLeg }){
     setError('')
     try{
       const context = { 
-        real_match_id: selectedMatch.id,
-        odds_data: {
+        // football-data ids only exist for football fixtures
+        real_match_id: selectedMatch.sport !== 'football' ? undefined : selectedMatch.id,
+        league: selectedMatch.league,
+        odds_data: selectedMatch.odds_data || {
           home_odds: selectedMatch.odds?.Home || selectedMatch.odds?.['1'] || 2.0,
           away_odds: selectedMatch.odds?.Away || selectedMatch.odds?.['2'] || 3.0
         }
@@ -38,9 +41,11 @@ export default function PredictionPanel({ selectedMatch, onAddLeg }){
         context
       )
       setResults(data.candidates || [])
+      setDegraded(data.degraded ? (data.degraded_reasons || []) : [])
     }catch(err){
       console.error('Prediction error:', err)
       setResults([])
+      setDegraded([])
       setError('Failed to generate predictions. Check backend connection.')
     }finally{
       setLoading(false)
@@ -122,6 +127,12 @@ export default function PredictionPanel({ selectedMatch, onAddLeg }){
 
       {error && <div className="error-message">{error}</div>}
 
+      {!loading && !error && degraded.length > 0 && (
+        <div className="degraded-message" title={degraded.join('\n')}>
+          Some data sources are unavailable; these predictions use fallback or cached data.
+        </div>
+      )}
+
       {!loading && !error && results.length > 0 && (
         <div className="markets-container">
           {Object.entries(markets).map(([key, market]) => {